@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Compare bee_count agreement and throughput of CPU backends against PyTorch.
+
+Example:
+    python backend_report.py --videos /data/sample_videos --backends onnx onnx:int8 openvino openvino:int8 \
+        --calibration /data/calibration_frames
+"""
+import os
+import sys
+import json
+import argparse
+import logging
+from backends import load_model, parse_backend
+from calibrate import collect_videos
+from tracking import FrameSampler, count_bees, load_tracker_args
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def run_backend(spec, args, videos, tracker_args):
+    backend, int8 = parse_backend(spec)
+    model = load_model(args.model, backend, int8, imgsz=args.imgsz, calib=args.calibration)
+    runs = {}
+    frames = 0
+    seconds = 0.0
+    for video in videos:
+        bee_ids, stats = count_bees(model, video, FrameSampler.from_spec(args.sampling), tracker_args, imgsz=args.imgsz)
+        runs[video] = len(bee_ids)
+        frames += stats["frames_processed"]
+        seconds += stats["seconds"]
+    return {"bee_counts": runs, "frames": frames, "seconds": round(seconds, 2),
+            "fps": round(frames / seconds, 2) if seconds else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare ONNX Runtime / OpenVINO backends against PyTorch')
+    parser.add_argument('--videos', nargs='+', required=True, help='Sample video files or directories')
+    parser.add_argument('--backends', nargs='+', default=['onnx', 'onnx:int8', 'openvino', 'openvino:int8'],
+                        help='Backends to compare against torch')
+    parser.add_argument('--model', default=os.getenv('MODEL_PATH', '/app/best.pt'), help='YOLO weights')
+    parser.add_argument('--calibration', default=os.getenv('MODEL_CALIBRATION'),
+                        help='INT8 calibration frames directory (ONNX) or dataset YAML (OpenVINO)')
+    parser.add_argument('--imgsz', type=int, default=640, help='Export image size')
+    parser.add_argument('--sampling', default=os.getenv('TRACK_SAMPLING', 'all'), help='Sampling mode')
+    parser.add_argument('--tracker', default=os.getenv('TRACKER_CONFIG', 'botsort.yaml'), help='Tracker YAML')
+    parser.add_argument('--json', help='Write the full report to this JSON file')
+    args = parser.parse_args()
+
+    videos = collect_videos(args.videos)
+    if not videos:
+        logger.error("No sample videos found")
+        sys.exit(1)
+    tracker_args = load_tracker_args(args.tracker)
+
+    report = {"torch": run_backend("torch", args, videos, tracker_args)}
+    reference = report["torch"]
+    for spec in args.backends:
+        try:
+            report[spec] = run_backend(spec, args, videos, tracker_args)
+        except Exception as e:
+            logger.error("Backend %s failed: %s", spec, str(e))
+            continue
+        counts = report[spec]["bee_counts"]
+        diffs = [abs(counts[v] - reference["bee_counts"][v]) for v in videos]
+        report[spec]["exact_agreement"] = round(sum(d == 0 for d in diffs) / len(diffs), 3)
+        report[spec]["mean_abs_error"] = round(sum(diffs) / len(diffs), 3)
+
+    print(f"{'backend':<16}{'fps':>8}{'speedup':>10}{'exact agree':>13}{'mean abs err':>14}")
+    for spec, entry in report.items():
+        speedup = entry["fps"] / reference["fps"] if entry["fps"] and reference["fps"] else 0.0
+        print(f"{spec:<16}{entry['fps'] or 0:>8}{speedup:>10.2f}{entry.get('exact_agreement', 1.0):>13}"
+              f"{entry.get('mean_abs_error', 0.0):>14}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info("Report written to %s", args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import os
+import glob
+import hashlib
+import shutil
+import logging
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+
+def parse_backend(spec):
+    """Split a backend spec such as 'onnx' or 'openvino:int8' into (backend, int8)."""
+    backend, _, option = (spec or "torch").strip().partition(":")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend: {backend}. Use one of {', '.join(BACKENDS)}")
+    if option not in ("", "int8"):
+        raise ValueError(f"Unknown backend option: {option}. Only 'int8' is supported")
+    if backend == "torch" and option:
+        raise ValueError("INT8 quantization is only available for the onnx and openvino backends")
+    return backend, option == "int8"
+
+
+def calibration_key(calib):
+    """Fingerprint of a calibration directory or dataset YAML: its path and each file's name, size and mtime."""
+    paths = [calib] if os.path.isfile(calib) else sorted(glob.glob(os.path.join(calib, "*")))
+    digest = hashlib.sha256(os.path.abspath(calib).encode())
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def _is_fresh(path, model_path, calib_key=None):
+    """An export is reused if it is newer than the weights and, for INT8, was calibrated on the same data."""
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(model_path):
+        return False
+    if calib_key is None:
+        return True
+    try:
+        with open(f"{path}.calib") as f:
+            return f.read().strip() == calib_key
+    except FileNotFoundError:
+        return False
+
+
+def _record_calibration(path, calib_key):
+    with open(f"{path}.calib", "w") as f:
+        f.write(calib_key)
+
+
+def letterbox(image, imgsz):
+    """Resize and pad a BGR image to a square the way ultralytics does, returning a 1x3xHxW float tensor."""
+    h, w = image.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    nh, nw = round(h * scale), round(w * scale)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top + nh, left:left + nw] = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    tensor = canvas[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+    return np.ascontiguousarray(tensor)
+
+
+def calibration_images(calib_dir, limit=200):
+    """Image files (or frames sampled from videos) used for static INT8 calibration."""
+    images = sorted(glob.glob(os.path.join(calib_dir, "*.jpg")) + glob.glob(os.path.join(calib_dir, "*.png")))
+    for path in images[:limit]:
+        yield cv2.imread(path)
+    remaining = limit - len(images)
+    for path in sorted(glob.glob(os.path.join(calib_dir, "*.mp4"))):
+        if remaining <= 0:
+            break
+        cap = cv2.VideoCapture(path)
+        step = max(1, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) // 20)
+        index = 0
+        while remaining > 0 and cap.grab():
+            if index % step == 0:
+                ok, frame = cap.retrieve()
+                if ok:
+                    remaining -= 1
+                    yield frame
+            index += 1
+        cap.release()
+
+
+def quantize_onnx(onnx_path, int8_path, imgsz, calib_dir):
+    """Post-training static INT8 quantization of an exported ONNX model, calibrated on frames from calib_dir."""
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            import onnxruntime
+            input_name = onnxruntime.InferenceSession(onnx_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+            self._batches = ({input_name: letterbox(image, imgsz)} for image in calibration_images(calib_dir)
+                             if image is not None)
+
+        def get_next(self):
+            return next(self._batches, None)
+
+    logger.info("Static INT8 quantization of %s with calibration data from %s", onnx_path, calib_dir)
+    quantize_static(onnx_path, int8_path, FrameReader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+    return int8_path
+
+
+def _move(exported, target):
+    """Move an ultralytics export to a name that records its settings."""
+    if os.path.abspath(exported) == os.path.abspath(target):
+        return target
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.replace(exported, target)
+    return target
+
+
+def export_model(model_path, backend, int8=False, imgsz=640, dynamic=False, calib=None):
+    """Export weights for a CPU runtime next to model_path, reusing an export newer than the weights.
+
+    INT8 needs calibration data (``calib``) from the hive cameras; an INT8
+    export is redone when that data changes.
+    """
+    if int8 and not calib:
+        raise ValueError("INT8 export needs calibration data; set MODEL_CALIBRATION to sample frames/videos "
+                         "(ONNX) or a dataset YAML (OpenVINO)")
+    if int8 and not os.path.exists(calib):
+        raise ValueError(f"Calibration data not found: {calib}")
+    calib_key = calibration_key(calib) if int8 else None
+    stem = os.path.splitext(model_path)[0]
+    # Exports with a fixed input shape cannot serve batches, so keep the two variants apart
+    tag = f"-{imgsz}" + ("-dynamic" if dynamic else "")
+    if backend == "onnx":
+        onnx_path = f"{stem}{tag}.onnx"
+        if not _is_fresh(onnx_path, model_path):
+            logger.info("Exporting %s to ONNX", model_path)
+            exported = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=dynamic, simplify=True)
+            _move(exported, onnx_path)
+        if not int8:
+            return onnx_path
+        int8_path = f"{stem}{tag}-int8.onnx"
+        if not _is_fresh(int8_path, model_path, calib_key):
+            quantize_onnx(onnx_path, int8_path, imgsz, calib)
+            _record_calibration(int8_path, calib_key)
+        return int8_path
+    if backend == "openvino":
+        export_dir = f"{stem}{tag}{'-int8' if int8 else ''}_openvino_model"
+        if not _is_fresh(export_dir, model_path, calib_key):
+            logger.info("Exporting %s to OpenVINO%s", model_path, " (INT8)" if int8 else "")
+            # OpenVINO INT8 calibrates on the dataset YAML in calib
+            kwargs = {"data": calib} if int8 else {}
+            exported = YOLO(model_path).export(format="openvino", imgsz=imgsz, dynamic=dynamic, int8=int8, **kwargs)
+            _move(exported, export_dir)
+            if int8:
+                _record_calibration(export_dir, calib_key)
+        return export_dir
+    raise ValueError(f"Nothing to export for backend {backend}")
+
+
+def load_model(model_path, backend="torch", int8=False, imgsz=640, dynamic=False, calib=None):
+    """Load the bee detector for the selected runtime.
+
+    ``torch`` loads and fuses the PyTorch weights as before. ``onnx`` and
+    ``openvino`` export the weights once (optionally INT8-quantized) and serve
+    the exported model through ultralytics' ONNX Runtime / OpenVINO backends.
+    Pass ``dynamic=True`` when frames are batched.
+    """
+    if backend == "torch":
+        model = YOLO(model_path)
+        model.fuse()
+        return model
+    exported = export_model(model_path, backend, int8, imgsz, dynamic, calib)
+    logger.info("Serving %s with the %s backend", exported, backend)
+    return YOLO(exported, task="detect")
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Cross-video frame batching for CPU inference.
+
+Several payload videos are decoded at once and their sampled frames are packed
+into fixed-size batches, so the fused model runs one forward pass per batch
+instead of one per frame. Each video keeps its own tracker.
+
+Compare against the one-frame-at-a-time path:
+    python batching.py --videos /data/sample_videos --batch-size 8 --max-videos 4 --threads 4
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import torch
+from tracking import DEFAULT_IMGSZ, DETECTION_CONF, FrameSampler, VideoTracker, count_bees, load_tracker_args
+from motion import MotionGate
+from roi import load_roi_config
+from decode import DecodeConfig
+
+logger = logging.getLogger(__name__)
+
+
+def set_torch_threads(threads):
+    """Pin PyTorch intra-op threads; 0 or None keeps the PyTorch default."""
+    if threads:
+        torch.set_num_threads(int(threads))
+    return torch.get_num_threads()
+
+
+class BatchEngine:
+    """Runs the detector on batches of frames drawn round-robin from several videos."""
+
+    def __init__(self, model, batch_size=8, max_videos=4, tracker_args=None, sampling="all", motion="off",
+                 roi_config=None, imgsz=DEFAULT_IMGSZ, decode="default"):
+        self.model = model
+        self.batch_size = max(1, int(batch_size))
+        self.max_videos = max(1, int(max_videos))
+        self.tracker_args = tracker_args or load_tracker_args("botsort.yaml")
+        self.sampling = sampling
+        self.motion = motion
+        self.roi_config = roi_config
+        self.imgsz = imgsz
+        self.decode = decode
+        self.frames = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    def run(self, sources):
+        """Track every source and return a list of (bee_ids, stats), one per source in input order.
+
+        Results are kept by position, so a source listed twice is tracked twice.
+        """
+        pending = list(enumerate(sources))
+        pending.reverse()
+        active = []
+        finished = [None] * len(pending)
+        started = time.perf_counter()
+
+        try:
+            while pending or active:
+                while pending and len(active) < self.max_videos:
+                    position, source = pending.pop()
+                    roi = self.roi_config.for_source(source) if self.roi_config else None
+                    decode = DecodeConfig.from_spec(self.decode)
+                    # One video may hold a whole batch of ring slots until the batch is tracked
+                    decode.slots = max(decode.slots, self.batch_size + 1)
+                    active.append((position, VideoTracker(source, FrameSampler.from_spec(self.sampling),
+                                                          self.tracker_args, MotionGate.from_spec(self.motion), roi,
+                                                          decode)))
+
+                # Fill one batch, taking one frame per video per round to keep the videos level
+                batch = []
+                while len(batch) < self.batch_size:
+                    added = False
+                    for _, video in active:
+                        if len(batch) == self.batch_size:
+                            break
+                        frame = video.next_frame()
+                        if frame is not None:
+                            batch.append((video, frame))
+                            added = True
+                    if not added:
+                        break
+
+                if batch:
+                    batch_started = time.perf_counter()
+                    results = self.model.predict([frame for _, frame in batch], conf=DETECTION_CONF,
+                                                 imgsz=self.imgsz, batch=len(batch), verbose=False)
+                    # Each frame is charged an equal share of the forward pass
+                    share = (time.perf_counter() - batch_started) / len(batch)
+                    for (video, frame), result in zip(batch, results):
+                        video.infer_s += share
+                        video.update(result, frame)
+                    self.frames += len(batch)
+                    self.batches += 1
+
+                for position, video in [(p, v) for p, v in active if v.done]:
+                    active.remove((position, video))
+                    finished[position] = (video.bee_ids, video.stats())
+                    logger.info("Tracked %s: %d/%d frames (batched)", video.source,
+                                video.processed, video.index)
+        finally:
+            for _, video in active:
+                video.close()
+
+        self.seconds += time.perf_counter() - started
+        return finished
+
+    @property
+    def fps(self):
+        return self.frames / self.seconds if self.seconds else 0.0
+
+
+def main():
+    from ultralytics import YOLO
+    from calibrate import collect_videos
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Compare batched inference throughput against per-frame inference')
+    parser.add_argument('--videos', nargs='+', required=True, help='Sample video files or directories')
+    parser.add_argument('--batch-size', type=int, default=8, help='Frames per forward pass')
+    parser.add_argument('--max-videos', type=int, default=4, help='Videos decoded at once')
+    parser.add_argument('--threads', type=int, default=0, help='PyTorch threads (0 = default)')
+    parser.add_argument('--sampling', default=os.getenv('TRACK_SAMPLING', 'all'), help='Sampling mode')
+    parser.add_argument('--motion', default=os.getenv('MOTION_GATE', 'off'), help='Motion gate (off or diff:RATIO)')
+    parser.add_argument('--roi', default=os.getenv('ROI_CONFIG'), help='Entrance ROI config (JSON)')
+    parser.add_argument('--imgsz', type=int, default=int(os.getenv('INFER_IMGSZ', str(DEFAULT_IMGSZ))),
+                        help='Detector input size')
+    parser.add_argument('--decode', default=os.getenv('DECODE_FRONTEND', 'default'),
+                        help='Decode frontend (default or threaded[:scale=F,slots=N,nonref])')
+    parser.add_argument('--model', default=os.getenv('MODEL_PATH', '/app/best.pt'), help='YOLO weights')
+    parser.add_argument('--tracker', default=os.getenv('TRACKER_CONFIG', 'botsort.yaml'), help='Tracker YAML')
+    args = parser.parse_args()
+
+    videos = collect_videos(args.videos)
+    if not videos:
+        logger.error("No sample videos found")
+        sys.exit(1)
+    logger.info("Using %d PyTorch threads", set_torch_threads(args.threads))
+    model = YOLO(args.model)
+    model.fuse()
+    tracker_args = load_tracker_args(args.tracker)
+    roi_config = load_roi_config(args.roi)
+
+    frames = 0
+    started = time.perf_counter()
+    single = {}
+    for video in videos:
+        bee_ids, stats = count_bees(model, video, FrameSampler.from_spec(args.sampling), tracker_args,
+                                    MotionGate.from_spec(args.motion),
+                                    roi_config.for_video(video) if roi_config else None, args.imgsz,
+                                    decode=DecodeConfig.from_spec(args.decode))
+        single[video] = len(bee_ids)
+        frames += stats["frames_processed"]
+    single_fps = frames / (time.perf_counter() - started)
+
+    engine = BatchEngine(model, args.batch_size, args.max_videos, tracker_args, args.sampling, args.motion,
+                         roi_config, args.imgsz, args.decode)
+    batched = engine.run(videos)
+    mismatches = sum(1 for video, (bee_ids, _) in zip(videos, batched) if len(bee_ids) != single[video])
+
+    print(f"per-frame: {single_fps:.2f} fps")
+    print(f"batched:   {engine.fps:.2f} fps (batch={args.batch_size}, videos={args.max_videos}, "
+          f"threads={torch.get_num_threads()}, speedup {engine.fps / single_fps:.2f}x)")
+    print(f"bee_count mismatches: {mismatches}/{len(videos)}")
+
+
+if __name__ == "__main__":
+    main()
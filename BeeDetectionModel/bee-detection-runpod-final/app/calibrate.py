@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Compare bee_count from reduced-rate tracking modes, motion gating, entrance ROIs and decode frontends
+against full-rate, full-frame tracking.
+
+Example:
+    python calibrate.py --videos /data/sample_videos --modes stride:2 stride:4 fps:5 budget:30 --motion diff:0.002
+    python calibrate.py --videos /data/sample_videos --modes --roi roi.json --imgsz 640 480 320
+    python calibrate.py --videos /data/sample_videos --modes --decode threaded threaded:scale=0.5
+"""
+import os
+import sys
+import json
+import argparse
+import logging
+from ultralytics import YOLO
+from tracking import DEFAULT_IMGSZ, FrameSampler, count_bees, load_tracker_args
+from motion import MotionGate
+from roi import load_roi_config
+from decode import DecodeConfig
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def collect_videos(paths):
+    """Expand files and directories into a sorted list of video files."""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    videos.append(os.path.join(path, name))
+        elif os.path.isfile(path):
+            videos.append(path)
+        else:
+            logger.warning("Skipping missing path %s", path)
+    return videos
+
+
+def summarize(reference, candidate):
+    """Count error and speedup of one configuration against the reference runs."""
+    abs_errors = []
+    rel_errors = []
+    ref_seconds = 0.0
+    seconds = 0.0
+    checked = 0
+    skipped = 0
+    frames = 0
+    for video, ref in reference.items():
+        run = candidate[video]
+        error = abs(run["bee_count"] - ref["bee_count"])
+        abs_errors.append(error)
+        rel_errors.append(error / ref["bee_count"] if ref["bee_count"] else float(error > 0))
+        ref_seconds += ref["seconds"]
+        seconds += run["seconds"]
+        skipped += run["frames_motion_skipped"]
+        checked += run["frames_processed"] + run["frames_motion_skipped"]
+        frames += run["frames_total"]
+    return {
+        "videos": len(abs_errors),
+        "mean_abs_error": round(sum(abs_errors) / len(abs_errors), 3),
+        "max_abs_error": max(abs_errors),
+        "mean_rel_error": round(sum(rel_errors) / len(rel_errors), 4),
+        "seconds": round(seconds, 2),
+        "speedup": round(ref_seconds / seconds, 2) if seconds else None,
+        "fps": round(frames / seconds, 2) if seconds else None,
+        "motion_skip_ratio": round(skipped / checked, 4) if checked else 0.0,
+    }
+
+
+def run_mode(model, videos, spec, tracker_args, motion="off", roi_config=None, imgsz=DEFAULT_IMGSZ, decode="default"):
+    runs = {}
+    for video in videos:
+        roi = roi_config.for_video(video) if roi_config else None
+        bee_ids, stats = count_bees(model, video, FrameSampler.from_spec(spec), tracker_args,
+                                    MotionGate.from_spec(motion), roi, imgsz,
+                                    decode=DecodeConfig.from_spec(decode))
+        stats.pop("traffic")
+        runs[video] = dict(stats, bee_count=len(bee_ids))
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate reduced-rate tracking against full-rate tracking')
+    parser.add_argument('--videos', nargs='+', required=True, help='Sample video files or directories')
+    parser.add_argument('--modes', nargs='*', default=['stride:2', 'stride:3', 'fps:5', 'fps:10'],
+                        help='Sampling modes to evaluate (stride:K, fps:F, budget:SECONDS)')
+    parser.add_argument('--motion', nargs='*', default=[],
+                        help='Motion gates to evaluate at full rate (diff:RATIO)')
+    parser.add_argument('--roi', help='Entrance ROI config (JSON) to evaluate at each --imgsz')
+    parser.add_argument('--imgsz', type=int, nargs='*', default=[],
+                        help=f'Detector input sizes to evaluate (the reference uses {DEFAULT_IMGSZ})')
+    parser.add_argument('--decode', nargs='*', default=[],
+                        help='Decode frontends to evaluate at full rate (threaded[:scale=F,slots=N,nonref])')
+    parser.add_argument('--model', default=os.getenv('MODEL_PATH', '/app/best.pt'), help='YOLO weights')
+    parser.add_argument('--tracker', default=os.getenv('TRACKER_CONFIG', 'botsort.yaml'), help='Tracker YAML')
+    parser.add_argument('--tracker-overrides', default=os.getenv('TRACKER_OVERRIDES', ''),
+                        help='Tracker settings replacing the YAML ones (key=value,...; e.g. max_lost_seconds=2)')
+    parser.add_argument('--json', help='Write the full report to this JSON file')
+    args = parser.parse_args()
+
+    videos = collect_videos(args.videos)
+    if not videos:
+        logger.error("No sample videos found")
+        sys.exit(1)
+
+    model = YOLO(args.model)
+    model.fuse()
+    tracker_args = load_tracker_args(args.tracker, args.tracker_overrides)
+    roi_config = load_roi_config(args.roi)
+
+    logger.info("Full-rate reference on %d videos", len(videos))
+    reference = run_mode(model, videos, "all", tracker_args)
+    report = {"reference": reference, "modes": {}}
+    for spec in args.modes:
+        logger.info("Evaluating sampling mode %s", spec)
+        runs = run_mode(model, videos, spec, tracker_args)
+        report["modes"][spec] = {"summary": summarize(reference, runs), "runs": runs}
+    for gate in args.motion:
+        logger.info("Evaluating motion gate %s", gate)
+        runs = run_mode(model, videos, "all", tracker_args, gate)
+        report["modes"][gate] = {"summary": summarize(reference, runs), "runs": runs}
+    for decode in args.decode:
+        logger.info("Evaluating decode frontend %s", decode)
+        runs = run_mode(model, videos, "all", tracker_args, decode=decode)
+        report["modes"][decode] = {"summary": summarize(reference, runs), "runs": runs}
+    for imgsz in args.imgsz or ([DEFAULT_IMGSZ] if roi_config else []):
+        label = f"{'roi' if roi_config else 'full'}@{imgsz}"
+        logger.info("Evaluating %s", label)
+        runs = run_mode(model, videos, "all", tracker_args, roi_config=roi_config, imgsz=imgsz)
+        report["modes"][label] = {"summary": summarize(reference, runs), "runs": runs}
+
+    print(f"{'mode':<14}{'mean abs err':>14}{'max abs err':>13}{'mean rel err':>14}{'speedup':>10}{'fps':>10}"
+          f"{'skipped':>10}")
+    for spec, entry in report["modes"].items():
+        s = entry["summary"]
+        print(f"{spec:<14}{s['mean_abs_error']:>14}{s['max_abs_error']:>13}{s['mean_rel_error']:>14}{s['speedup']:>10}"
+              f"{s['fps']:>10}{s['motion_skip_ratio']:>10.1%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info("Report written to %s", args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import os
+import time
+import pickle
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tracker attributes rebuilt by make_tracker() instead of being pickled (cv2 objects, ReID models)
+UNPICKLED_ATTRS = ("gmc", "encoder")
+
+
+def tracker_state(tracker):
+    """Picklable copy of a BYTETracker/BOTSORT's state."""
+    state = {k: v for k, v in vars(tracker).items() if k not in UNPICKLED_ATTRS}
+    gmc = getattr(tracker, "gmc", None)
+    state["gmc"] = None
+    if gmc is not None:
+        try:
+            # Sparse optical flow keeps only arrays; ORB/SIFT keep cv2 keypoints and start fresh instead
+            state["gmc"] = pickle.loads(pickle.dumps(vars(gmc)))
+        except (TypeError, pickle.PicklingError):
+            pass
+    return state
+
+
+def restore_tracker(tracker, state):
+    """Load a tracker_state() into a fresh tracker built with the same arguments."""
+    state = dict(state)
+    gmc = state.pop("gmc")
+    tracker.__dict__.update(state)
+    if gmc is not None and getattr(tracker, "gmc", None) is not None:
+        tracker.gmc.__dict__.update(gmc)
+
+
+class CheckpointStore:
+    """Periodic on-disk checkpoints of in-progress videos, so a restarted job resumes mid-video.
+
+    A checkpoint is only reused for the same video name, file size and
+    inference config; it is deleted once the video completes.
+    """
+
+    def __init__(self, directory, every_seconds=60.0, config=""):
+        self.directory = directory
+        self.every_seconds = every_seconds
+        self.config = config
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, video_name):
+        return os.path.join(self.directory, hashlib.sha1(video_name.encode()).hexdigest() + ".ckpt")
+
+    def exists(self, video_name):
+        return os.path.exists(self.path(video_name))
+
+    def open(self, video_name, size):
+        return VideoCheckpoint(self, video_name, size)
+
+
+class VideoCheckpoint:
+    """Checkpoint of one video: load on start, save when due, clear when done."""
+
+    def __init__(self, store, video_name, size):
+        self.store = store
+        self.video_name = video_name
+        self.size = size
+        self.path = store.path(video_name)
+        self.saves = 0
+        self.seconds = 0.0
+        self.resumed_from = 0
+        self._last = time.monotonic()
+
+    def load(self):
+        """Return the saved VideoTracker state, or None if there is no usable checkpoint."""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                saved = pickle.load(f)
+        except Exception as e:
+            logger.warning("Ignoring unreadable checkpoint for %s: %s", self.video_name, str(e))
+            return None
+        if (saved.get("video"), saved.get("size"), saved.get("config")) != (self.video_name, self.size,
+                                                                            self.store.config):
+            logger.info("Ignoring stale checkpoint for %s", self.video_name)
+            return None
+        self.resumed_from = saved["state"]["index"]
+        logger.info("Resuming %s from frame %d", self.video_name, self.resumed_from)
+        return saved["state"]
+
+    def due(self):
+        return self.store.every_seconds > 0 and time.monotonic() - self._last >= self.store.every_seconds
+
+    def save(self, state):
+        """Write a checkpoint atomically and time it."""
+        started = time.perf_counter()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"video": self.video_name, "size": self.size, "config": self.store.config, "state": state},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        self.saves += 1
+        self.seconds += time.perf_counter() - started
+        self._last = time.monotonic()
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def stats(self):
+        return {"checkpoints": self.saves, "checkpoint_s": round(self.seconds, 3), "resumed_from": self.resumed_from}
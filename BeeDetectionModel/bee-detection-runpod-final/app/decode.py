@@ -0,0 +1,297 @@
+import queue
+import logging
+import threading
+import cv2
+import av
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Frame arrays in a threaded decoder's ring; one is held by the tracker, the rest are decoded ahead
+DEFAULT_SLOTS = 8
+
+
+class FileCapture:
+    """Local video file decoded with OpenCV."""
+
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Cannot open video {path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def grab(self):
+        return self.cap.grab()
+
+    def seek(self, index):
+        """Position so the next grab() returns frame ``index``.
+
+        CAP_PROP_POS_FRAMES lands on the wrong frame for some files (B-frames,
+        variable frame rate), so the capture rewinds to the first frame and
+        grabs forward; this decodes the frames before ``index`` but never
+        converts them.
+        """
+        if self.cap.get(cv2.CAP_PROP_POS_FRAMES):
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        for _ in range(index):
+            if not self.cap.grab():
+                break
+
+    def retrieve(self):
+        return self.cap.retrieve()
+
+    def release(self):
+        self.cap.release()
+
+
+class StreamCapture:
+    """Video decoded with PyAV straight from a seekable file-like object (e.g. a remote stream)."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.container = av.open(fileobj, mode="r")
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"
+        self.fps = float(self.stream.average_rate or 0)
+        self.frame_count = int(self.stream.frames or 0)
+        self._frames = self.container.decode(self.stream)
+        self._frame = None
+        self._position = 0
+
+    def grab(self):
+        self._frame = next(self._frames, None)
+        if self._frame is None:
+            return False
+        self._position += 1
+        return True
+
+    def seek(self, index):
+        """Position so the next grab() returns frame ``index``.
+
+        Frames are counted from the start of the stream: timestamps only give
+        exact indices at a constant frame rate, and with B-frames or a gap in
+        the recording a timestamp seek lands on the wrong frame.
+        """
+        if index < self._position:
+            self.container.seek(0)
+            self._frames = self.container.decode(self.stream)
+            self._position = 0
+        while self._position < index and self.grab():
+            pass
+
+    def retrieve(self):
+        if self._frame is None:
+            return False, None
+        return True, self._frame.to_ndarray(format="bgr24")
+
+    def release(self):
+        self._frame = None
+        self.container.close()
+
+
+class DecodeConfig:
+    """Decode frontend, parsed from a 'mode[:option,...]' spec.
+
+      default                 OpenCV for local files, PyAV for streams, on the tracking thread
+      threaded                PyAV with FFmpeg frame threading on a background thread, into a
+                              ring of preallocated arrays; options:
+                                scale=F   decode at F times the source resolution
+                                slots=N   ring size (frames decoded ahead plus those held)
+                                nonref    skip non-reference frames when sampling with a stride
+    """
+
+    MODES = ("default", "threaded")
+
+    def __init__(self, mode="default", scale=1.0, slots=DEFAULT_SLOTS, nonref=False):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown decode mode '{mode}', expected one of {self.MODES}")
+        if not 0 < scale <= 1:
+            raise ValueError(f"Decode scale must be in (0, 1], got {scale}")
+        self.mode = mode
+        self.scale = scale
+        self.slots = max(2, int(slots))
+        self.nonref = nonref
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Build from a spec such as 'default', 'threaded' or 'threaded:scale=0.5,nonref'."""
+        if not spec or spec == "default":
+            return cls()
+        mode, _, options = spec.partition(":")
+        kwargs = {}
+        for option in filter(None, options.split(",")):
+            key, _, value = option.partition("=")
+            if key == "scale":
+                kwargs["scale"] = float(value)
+            elif key == "slots":
+                kwargs["slots"] = int(value)
+            elif key == "nonref":
+                kwargs["nonref"] = True
+            else:
+                raise ValueError(f"Unknown decode option '{key}' in '{spec}'")
+        return cls(mode, **kwargs)
+
+    @property
+    def spec(self):
+        if self.mode == "default":
+            return "default"
+        options = [f"scale={self.scale:g}"] if self.scale != 1 else []
+        options += [f"slots={self.slots}"] if self.slots != DEFAULT_SLOTS else []
+        options += ["nonref"] if self.nonref else []
+        return f"{self.mode}:{','.join(options)}" if options else self.mode
+
+    @property
+    def threaded(self):
+        return self.mode == "threaded"
+
+
+class ThreadedCapture:
+    """PyAV decoding on a background thread into a bounded ring of preallocated frame arrays.
+
+    Unlike the grab()/retrieve() captures, read() returns ``(index, slot, frame)``
+    for the next frame the sampler keeps; ``frame`` is a ring array that stays
+    valid until recycle(slot), so hand it back once the tracker has used it.
+    The decode thread blocks when every slot is in use, which bounds memory.
+
+    Frames the stride skips are still decoded (FFmpeg cannot grab without
+    decoding) but are never converted or copied. With ``nonref`` and a stride
+    above 1, FFmpeg skips decoding non-reference frames altogether and the
+    first decoded frame at or after each stride step is kept instead.
+    """
+
+    def __init__(self, source, config, sampler=None):
+        self.container = av.open(source, mode="r")
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"
+        self.fps = float(self.stream.average_rate or 0)
+        self.frame_count = int(self.stream.frames or 0)
+        self.sampler = sampler
+        context = self.stream.codec_context
+        self.width = max(2, int(context.width * config.scale) // 2 * 2)
+        self.height = max(2, int(context.height * config.scale) // 2 * 2)
+        self.scale = self.width / context.width
+        self.nonref = config.nonref and sampler is not None and sampler.mode != "all"
+        if self.nonref:
+            context.skip_frame = "NONREF"
+        self.buffers = np.empty((config.slots, self.height, self.width, 3), dtype=np.uint8)
+        self.frames = 0
+        self._free = queue.Queue()
+        self._ready = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_index = 0
+        self._reset()
+
+    def _reset(self):
+        self._free = queue.Queue()
+        for slot in range(len(self.buffers)):
+            self._free.put(slot)
+        self._ready = queue.Queue()
+        self._stop.clear()
+
+    def _stride(self):
+        return max(1, self.sampler.stride) if self.sampler is not None else 1
+
+    def _frame_index(self, frame, counter):
+        """Sequential index, or one derived from the timestamp when non-reference frames are skipped."""
+        if frame.pts is not None and (self.nonref or counter is None):
+            start = self.stream.start_time or 0
+            return round(float((frame.pts - start) * self.stream.time_base) * (self.fps or 30.0))
+        return self._start_index if counter is None else counter
+
+    def _take_slot(self):
+        while not self._stop.is_set():
+            try:
+                return self._free.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return None
+
+    def _decode(self):
+        counter = None if self.nonref and self._start_index else 0
+        target = self._start_index
+        try:
+            for frame in self.container.decode(self.stream):
+                if self._stop.is_set():
+                    return
+                index = self._frame_index(frame, counter)
+                counter = index + 1
+                self.frames = counter
+                if index < target:
+                    continue
+                stride = self._stride()
+                if self.nonref:
+                    target = (index // stride + 1) * stride
+                elif index % stride:
+                    continue
+                slot = self._take_slot()
+                if slot is None:
+                    return
+                # Convert and scale in one swscale pass, then copy the packed rows into the ring
+                image = frame.reformat(width=self.width, height=self.height, format="bgr24")
+                plane = image.planes[0]
+                rows = np.frombuffer(plane, dtype=np.uint8, count=self.height * plane.line_size)
+                self.buffers[slot] = rows.reshape(self.height, plane.line_size)[:, :self.width * 3].reshape(
+                    self.height, self.width, 3)
+                self._ready.put((index, slot))
+            self._ready.put((None, None))
+        except Exception as e:
+            self._ready.put((None, e))
+
+    def read(self):
+        """Return ``(index, slot, frame)`` for the next kept frame, or ``(None, None, None)`` at the end."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._decode, name="decode", daemon=True)
+            self._thread.start()
+        index, slot = self._ready.get()
+        if index is None:
+            if isinstance(slot, Exception):
+                raise slot
+            return None, None, None
+        return index, slot, self.buffers[slot]
+
+    def recycle(self, slot):
+        """Return a slot from read() to the ring."""
+        self._free.put(slot)
+
+    def seek(self, index):
+        """Position so the next read() starts at frame ``index``; frames held from earlier reads are dropped.
+
+        Frames are counted from the start of the stream, as in StreamCapture.seek;
+        with nonref the skipped frames leave only timestamps, so the decoder
+        starts at the keyframe before ``index`` instead.
+        """
+        self._join()
+        if self.nonref:
+            time_base = self.stream.time_base
+            start = self.stream.start_time or 0
+            self.container.seek(start + int(index / (self.fps or 30.0) / time_base), stream=self.stream,
+                                backward=True, any_frame=False)
+        else:
+            self.container.seek(0)
+        self._start_index = index
+        self._reset()
+
+    def _join(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def release(self):
+        self._join()
+        self.container.close()
+
+
+def open_capture(source, config=None, sampler=None):
+    """Open a source with the configured decode frontend.
+
+    By default a local path is decoded with OpenCV and any file-like object
+    with PyAV; a threaded config decodes either with ThreadedCapture.
+    """
+    if config is not None and config.threaded:
+        return ThreadedCapture(source, config, sampler)
+    if isinstance(source, str):
+        return FileCapture(source)
+    return StreamCapture(source)
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""Incremental video dispatcher for the hive server, replacing the find/jq loop in send_videos.sh.
+
+A persistent scan cursor stores each directory's mtime, its subdirectories and
+a high-watermark (newest file mtime already dispatched). A directory whose
+mtime is unchanged had no files added or removed, so only its subdirectories
+are visited; changed directories are listed and only files newer than their
+watermark become candidates. Candidates are checked against the ledger,
+chunked into bounded RunPod payloads and submitted with retry and backoff.
+
+Dispatched videos stay "queued" in the ledger until their record shows up in
+the worker's results.jsonl (read incrementally from an offset kept in the
+cursor). A video still queued after QUEUED_RETRY_SECONDS, because its payload
+failed or never ran, is marked failed, and failed videos are dispatched again
+on every tick.
+
+    python dispatcher.py run --video-dir /var/www/html/ademnea_website/public/hivevideo
+    python dispatcher.py bench --root /tmp/hivevideo-bench --files 1000000
+"""
+import os
+import sys
+import json
+import time
+import fcntl
+import random
+import argparse
+import logging
+import subprocess
+import urllib.error
+import urllib.request
+from datetime import datetime
+from ledger import Ledger
+
+logger = logging.getLogger(__name__)
+
+MONITOR_DIR = "/var/www/html/ademnea_website/public/bee-detection-model-video-monitoring"
+VIDEO_DIR = os.getenv('VIDEO_DIR', '/var/www/html/ademnea_website/public/hivevideo')
+CURSOR_FILE = os.getenv('DISPATCH_CURSOR', f'{MONITOR_DIR}/scan_cursor.json')
+LEDGER_PATH = os.getenv('LEDGER_PATH', f'{MONITOR_DIR}/processed.sqlite')
+LOCK_FILE = os.getenv('DISPATCH_LOCK', '/tmp/bee_detection.lock')
+RUNPOD_ENDPOINT = os.getenv('RUNPOD_ENDPOINT', 'https://api.runpod.ai/v2/{endpoint_id}/run')
+API_KEY_FILE = os.getenv('RUNPOD_API_KEY_FILE', '/home/hivemonitor/.runpod_api_key')
+# State of the old shell dispatcher; the first cursor starts from its last tick so no video is missed
+LAST_RUN_FILE = os.getenv('LAST_RUN_FILE', f'{MONITOR_DIR}/last_run.txt')
+START_TIME_FILE = os.getenv('START_TIME_FILE', f'{MONITOR_DIR}/start_time.txt')
+# Results appended by the worker (REMOTE_OUTPUT_PATH/results.jsonl)
+RESULTS_PATH = os.getenv('RESULTS_PATH', '/var/www/html/ademnea_website/public/results/results.jsonl')
+# Queued videos without a result after this long are dispatched again
+QUEUED_RETRY_SECONDS = float(os.getenv('QUEUED_RETRY_SECONDS', str(6 * 3600)))
+
+# Videos per payload, and a bound on the serialized payload size
+PAYLOAD_MAX_VIDEOS = int(os.getenv('PAYLOAD_MAX_VIDEOS', '50'))
+PAYLOAD_MAX_BYTES = int(os.getenv('PAYLOAD_MAX_BYTES', str(256 * 1024)))
+# Files modified this recently may still be uploading and are left for the next tick
+SETTLE_SECONDS = float(os.getenv('DISPATCH_SETTLE_SECONDS', '60'))
+SUBMIT_RETRIES = int(os.getenv('SUBMIT_RETRIES', '5'))
+SUBMIT_BACKOFF = float(os.getenv('SUBMIT_BACKOFF', '2.0'))
+SUBMIT_TIMEOUT = float(os.getenv('SUBMIT_TIMEOUT', '30'))
+
+
+class ScanCursor:
+    """Per-directory scan state persisted as JSON between dispatcher runs."""
+
+    def __init__(self, path, since=None):
+        self.path = path
+        self.dirs = {}
+        self.pending = []
+        # Bytes of the results file already read by reconcile()
+        self.results_offset = 0
+        # Watermark for directories seen for the first time
+        self.since = since if since is not None else time.time()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.dirs = state.get("dirs", {})
+            self.pending = state.get("pending", [])
+            self.since = state.get("since", self.since)
+            self.results_offset = state.get("results_offset", 0)
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"since": self.since, "dirs": self.dirs, "pending": self.pending,
+                       "results_offset": self.results_offset}, f)
+        os.replace(tmp_path, self.path)
+
+    def scan(self, root, pattern=".mp4", settle=SETTLE_SECONDS, now=None):
+        """Return new files under root, oldest first, and update the cursor.
+
+        Only directories whose mtime changed are listed. Files newer than
+        ``now - settle`` are not returned and their directory is rescanned
+        on the next call.
+        """
+        now = time.time() if now is None else now
+        cutoff = now - settle
+        found = []
+        stats = {"dirs": 0, "listed": 0, "files": 0}
+        seen = set()
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            seen.add(path)
+            stats["dirs"] += 1
+            entry = self.dirs.get(path)
+            if entry and entry["mtime"] == mtime and not entry.get("unsettled"):
+                stack.extend(entry["subdirs"])
+                continue
+
+            stats["listed"] += 1
+            watermark = entry["watermark"] if entry else self.since
+            newest = watermark
+            subdirs = []
+            unsettled = False
+            with os.scandir(path) as entries:
+                for item in entries:
+                    if item.is_dir(follow_symlinks=False):
+                        subdirs.append(item.path)
+                    elif item.name.endswith(pattern) and item.is_file(follow_symlinks=False):
+                        stats["files"] += 1
+                        file_mtime = item.stat().st_mtime
+                        if file_mtime <= watermark:
+                            continue
+                        if file_mtime > cutoff:
+                            unsettled = True
+                            continue
+                        found.append((file_mtime, item.path))
+                        newest = max(newest, file_mtime)
+            if unsettled:
+                # Settled files newer than a still-unsettled one are picked up again next time
+                # and filtered by the ledger, so the watermark never skips a late file
+                newest = watermark
+            self.dirs[path] = {"mtime": mtime, "watermark": newest, "subdirs": subdirs, "unsettled": unsettled}
+            stack.extend(subdirs)
+
+        # Forget directories that were removed
+        for path in [p for p in self.dirs if p not in seen and (p == root or p.startswith(root + os.sep))]:
+            del self.dirs[path]
+        found.sort()
+        logger.info("Scanned %d directories (%d listed, %d videos seen), %d new videos",
+                    stats["dirs"], stats["listed"], stats["files"], len(found))
+        return [path for _, path in found]
+
+
+def shell_since(last_run_file=LAST_RUN_FILE, start_time_file=START_TIME_FILE):
+    """Timestamp of the shell dispatcher's last tick (last_run.txt, else start_time.txt), or None."""
+    for path in (last_run_file, start_time_file):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except FileNotFoundError:
+            continue
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            logger.warning("Ignoring unreadable timestamp %r in %s", value, path)
+    return None
+
+
+def read_results(path, offset):
+    """Video names in the complete lines of a results JSONL after offset, and the offset to resume from."""
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return [], 0
+    if size < offset:
+        # The file was replaced or rotated; read it from the start
+        offset = 0
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(size - offset)
+    complete = data[:data.rfind(b"\n") + 1]
+    names = []
+    for line in complete.splitlines():
+        try:
+            names.append(json.loads(line)["video"])
+        except (ValueError, KeyError):
+            logger.warning("Skipping unreadable result line in %s", path)
+    return names, offset + len(complete)
+
+
+def reconcile(ledger, cursor, results_path, retry_after=QUEUED_RETRY_SECONDS, now=None):
+    """Mark queued videos processed once they have a result, and failed if they waited too long.
+
+    Returns the videos marked failed; dispatch() sends every failed video again.
+    """
+    now = time.time() if now is None else now
+    queued = {}
+    for path, queued_at in ledger.entries("queued"):
+        queued.setdefault(os.path.basename(path), []).append((path, queued_at))
+    names, cursor.results_offset = read_results(results_path, cursor.results_offset)
+    done = [path for name in names for path, _ in queued.pop(name, [])]
+    ledger.mark(done, "processed")
+
+    cutoff = datetime.fromtimestamp(now - retry_after).isoformat()
+    stale = [path for entries in queued.values() for path, queued_at in entries if (queued_at or "") < cutoff]
+    ledger.mark(stale, "failed")
+    logger.info("%d queued videos got results, %d had none after %.0fs", len(done), len(stale), retry_after)
+    return stale
+
+
+def chunk_payloads(videos, max_videos=PAYLOAD_MAX_VIDEOS, max_bytes=PAYLOAD_MAX_BYTES):
+    """Split videos into lists that each fit in one payload."""
+    chunks = []
+    chunk = []
+    size = 0
+    for video in videos:
+        video_size = len(json.dumps(video)) + 2
+        if chunk and (len(chunk) >= max_videos or size + video_size > max_bytes):
+            chunks.append(chunk)
+            chunk = []
+            size = 0
+        chunk.append(video)
+        size += video_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def make_payload(videos):
+    return {"input": {"videos": videos, "timestamp": datetime.now().astimezone().isoformat(timespec="seconds")}}
+
+
+def submit(payload, endpoint, api_key, retries=SUBMIT_RETRIES, backoff=SUBMIT_BACKOFF, timeout=SUBMIT_TIMEOUT):
+    """POST a payload to RunPod, retrying connection errors, 429 and 5xx with exponential backoff."""
+    data = json.dumps(payload).encode()
+    for attempt in range(1, retries + 1):
+        request = urllib.request.Request(endpoint, data=data, method="POST", headers={
+            "Content-Type": "application/json", "Authorization": f"Bearer {api_key}"})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            if e.code != 429 and e.code < 500:
+                raise
+            error = f"HTTP {e.code}"
+        except (urllib.error.URLError, OSError) as e:
+            error = str(e)
+        if attempt == retries:
+            raise RuntimeError(f"Submission failed after {retries} attempts: {error}")
+        delay = backoff * 2 ** (attempt - 1) * (1 + random.random() * 0.1)
+        logger.warning("Submission attempt %d/%d failed (%s); retrying in %.1fs", attempt, retries, error, delay)
+        time.sleep(delay)
+
+
+def dispatch(args):
+    """One dispatcher tick: scan, filter through the ledger, submit chunks, persist the cursor."""
+    lock = open(args.lock, "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        logger.error("Dispatcher is already running")
+        sys.exit(1)
+
+    with open(args.api_key_file) as f:
+        api_key = f.read().strip()
+    # A new cursor starts where the shell dispatcher left off; a saved cursor keeps its own state
+    cursor = ScanCursor(args.cursor, since=shell_since(args.last_run, args.start_time))
+    ledger = Ledger(args.ledger)
+    try:
+        started = time.perf_counter()
+        reconcile(ledger, cursor, args.results, args.retry_after)
+        # Failed videos are found again through the ledger, as the scan watermark has moved past them
+        failed = [path for path, _ in ledger.entries("failed")]
+        candidates = list(dict.fromkeys(cursor.pending + failed + cursor.scan(args.video_dir, settle=args.settle)))
+        videos = ledger.filter_unprocessed(candidates)
+        logger.info("Scan took %.3fs; %d videos to dispatch", time.perf_counter() - started, len(videos))
+
+        cursor.pending = list(videos)
+        for chunk in chunk_payloads(videos, args.max_videos, args.max_bytes):
+            # The worker takes basenames, as the shell dispatcher sent them
+            names = [os.path.basename(path) for path in chunk]
+            if args.dry_run:
+                logger.info("Would submit %d videos", len(names))
+                continue
+            try:
+                response = submit(make_payload(names), args.endpoint, api_key)
+            except Exception as e:
+                # Unsent videos stay pending in the cursor and are retried on the next tick
+                logger.error("Failed to submit %d videos: %s", len(names), str(e))
+                break
+            logger.info("Submitted %d videos: %s", len(names), response.get("id", response))
+            ledger.mark(chunk, "queued")
+            sent = set(chunk)
+            cursor.pending = [p for p in cursor.pending if p not in sent]
+        if not args.dry_run:
+            cursor.save()
+    finally:
+        ledger.close()
+        lock.close()
+
+
+def build_tree(root, files, dirs_per_level=32, files_per_dir=1000):
+    """Create a synthetic hivevideo tree of empty .mp4 files (hive/day/file), skipping existing files."""
+    created = 0
+    hive = 0
+    while created < files:
+        for day in range(dirs_per_level):
+            path = os.path.join(root, f"hive{hive:03d}", f"day{day:03d}")
+            os.makedirs(path, exist_ok=True)
+            for i in range(min(files_per_dir, files - created)):
+                open(os.path.join(path, f"video_{i:05d}.mp4"), "a").close()
+                created += 1
+            if created >= files:
+                break
+        hive += 1
+    return created
+
+
+def time_find(root, since):
+    started = time.perf_counter()
+    output = subprocess.run(["find", root, "-type", "f", "-newermt", f"@{since}", "-name", "*.mp4"],
+                            capture_output=True, text=True, check=True).stdout
+    return time.perf_counter() - started, len(output.splitlines())
+
+
+def bench(args):
+    """Compare find -newermt against the cursor scan on a synthetic tree."""
+    if not os.path.isdir(args.root) or args.rebuild:
+        logger.info("Creating %d files under %s", build_tree(args.root, args.files), args.root)
+    cursor_path = os.path.join(args.root, ".bench_cursor.json")
+    if os.path.exists(cursor_path):
+        os.remove(cursor_path)
+    since = time.time()
+    time.sleep(1.1)
+
+    cursor = ScanCursor(cursor_path, since=0)
+    started = time.perf_counter()
+    cursor.scan(args.root, settle=0)
+    cold = time.perf_counter() - started
+    cursor.since = since
+
+    # A tick's worth of new videos in a few directories
+    new_dir = os.path.join(args.root, "hive000", "day000")
+    for i in range(args.new):
+        open(os.path.join(new_dir, f"new_{i:05d}.mp4"), "a").close()
+
+    find_s, find_count = time_find(args.root, since)
+    started = time.perf_counter()
+    found = cursor.scan(args.root, settle=0)
+    warm = time.perf_counter() - started
+
+    result = {"files": args.files, "new": args.new, "find_s": round(find_s, 3), "find_found": find_count,
+              "cursor_cold_s": round(cold, 3), "cursor_s": round(warm, 3), "cursor_found": len(found),
+              "speedup": round(find_s / warm, 1) if warm else None}
+    print(json.dumps(result, indent=2))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Dispatch new hive videos to the RunPod worker')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='Scan for new videos and submit them')
+    run_parser.add_argument('--video-dir', default=VIDEO_DIR)
+    run_parser.add_argument('--cursor', default=CURSOR_FILE)
+    run_parser.add_argument('--ledger', default=LEDGER_PATH)
+    run_parser.add_argument('--lock', default=LOCK_FILE)
+    run_parser.add_argument('--endpoint', default=RUNPOD_ENDPOINT)
+    run_parser.add_argument('--api-key-file', default=API_KEY_FILE)
+    run_parser.add_argument('--last-run', default=LAST_RUN_FILE, help='Shell dispatcher last_run.txt (first run only)')
+    run_parser.add_argument('--start-time', default=START_TIME_FILE,
+                            help='Shell dispatcher start_time.txt, used when last_run.txt is missing (first run only)')
+    run_parser.add_argument('--results', default=RESULTS_PATH, help='Worker results.jsonl')
+    run_parser.add_argument('--retry-after', type=float, default=QUEUED_RETRY_SECONDS,
+                            help='Dispatch queued videos again if they have no result after this many seconds')
+    run_parser.add_argument('--max-videos', type=int, default=PAYLOAD_MAX_VIDEOS, help='Videos per payload')
+    run_parser.add_argument('--max-bytes', type=int, default=PAYLOAD_MAX_BYTES, help='Bytes of video names per payload')
+    run_parser.add_argument('--settle', type=float, default=SETTLE_SECONDS, help='Skip files modified this recently')
+    run_parser.add_argument('--dry-run', action='store_true', help='Scan and chunk without submitting')
+    bench_parser = commands.add_parser('bench', help='Compare scan time against find on a synthetic tree')
+    bench_parser.add_argument('--root', default='/tmp/hivevideo-bench')
+    bench_parser.add_argument('--files', type=int, default=1000000)
+    bench_parser.add_argument('--new', type=int, default=20, help='Files added between scans')
+    bench_parser.add_argument('--rebuild', action='store_true', help='Add missing files to an existing tree')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        dispatch(args)
+    else:
+        bench(args)
+
+
+if __name__ == "__main__":
+    main()
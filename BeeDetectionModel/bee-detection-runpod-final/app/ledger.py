@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Indexed ledger of dispatched and processed videos, shared by the dispatcher scripts and the worker.
+
+Replaces grepping processed.log for every candidate video. Each path is one
+row keyed by its full path, so "is it processed?" is a single index lookup.
+
+    python ledger.py --db processed.sqlite import processed.log
+    find "$VIDEO_DIR" -name '*.mp4' | python ledger.py --db processed.sqlite filter
+    printf '%s\\n' "${PATHS[@]}" | python ledger.py --db processed.sqlite mark --status queued
+    python ledger.py --db processed.sqlite check /path/to/video.mp4
+"""
+import os
+import sys
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+STATUSES = ("queued", "processed", "failed")
+
+# Rows per executemany / IN (...) query
+BATCH_SIZE = 500
+
+
+class Ledger:
+    """SQLite table of video paths with status, timestamps and content digest."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL lets the dispatcher read while the worker writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS videos ("
+            " path TEXT PRIMARY KEY, status TEXT NOT NULL, queued_at TEXT, processed_at TEXT, digest TEXT)"
+        )
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def status(self, path):
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM videos WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def is_processed(self, path):
+        """True if the video was already dispatched or processed (failed videos are retried)."""
+        return self.status(path) in ("queued", "processed")
+
+    def filter_unprocessed(self, paths):
+        """Return the paths that have not been dispatched or processed, in input order."""
+        paths = list(paths)
+        seen = set()
+        with self._lock:
+            for i in range(0, len(paths), BATCH_SIZE):
+                batch = paths[i:i + BATCH_SIZE]
+                query = ("SELECT path FROM videos WHERE status IN ('queued', 'processed') AND path IN (%s)"
+                         % ",".join("?" * len(batch)))
+                seen.update(row[0] for row in self._conn.execute(query, batch))
+        return [path for path in paths if path not in seen]
+
+    def entries(self, status):
+        """Return (path, queued_at) for every video with the given status."""
+        with self._lock:
+            return self._conn.execute("SELECT path, queued_at FROM videos WHERE status = ?", (status,)).fetchall()
+
+    def mark(self, paths, status, digests=None):
+        """Set the status of paths, recording when they were queued or processed."""
+        if status not in STATUSES:
+            raise ValueError(f"Unknown status: {status}. Use one of {', '.join(STATUSES)}")
+        digests = digests or {}
+        now = datetime.now().isoformat()
+        column = "queued_at" if status == "queued" else "processed_at"
+        rows = [(path, status, now, digests.get(path)) for path in paths]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT INTO videos (path, status, {column}, digest) VALUES (?, ?, ?, ?) "
+                f"ON CONFLICT(path) DO UPDATE SET status = excluded.status, {column} = excluded.{column}, "
+                "digest = COALESCE(excluded.digest, videos.digest)",
+                rows,
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def import_log(self, log_path, status="processed"):
+        """Import a processed.log (one path per line); existing rows are left untouched."""
+        imported = 0
+        mtime = datetime.fromtimestamp(os.path.getmtime(log_path)).isoformat()
+        column = "queued_at" if status == "queued" else "processed_at"
+        with open(log_path) as f, self._lock:
+            batch = []
+            for line in f:
+                path = line.strip()
+                if path:
+                    batch.append((path, status, mtime))
+                if len(batch) >= BATCH_SIZE:
+                    imported += self._insert_ignore(batch, column)
+                    batch = []
+            imported += self._insert_ignore(batch, column)
+            self._conn.commit()
+        return imported
+
+    def _insert_ignore(self, rows, column):
+        before = self._conn.total_changes
+        self._conn.executemany(f"INSERT OR IGNORE INTO videos (path, status, {column}) VALUES (?, ?, ?)", rows)
+        return self._conn.total_changes - before
+
+
+def read_paths(args):
+    paths = args.paths or [line.strip() for line in sys.stdin]
+    return [path for path in paths if path]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Processed-video ledger')
+    parser.add_argument('--db', default=os.getenv('LEDGER_PATH', 'processed.sqlite'), help='Ledger database file')
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help='Import processed.log files')
+    import_parser.add_argument('logs', nargs='+')
+    import_parser.add_argument('--status', default='processed', choices=STATUSES)
+    commands.add_parser('filter', help='Print the paths read from stdin that are not yet processed')
+    mark_parser = commands.add_parser('mark', help='Mark paths (arguments or stdin) with a status')
+    mark_parser.add_argument('paths', nargs='*')
+    mark_parser.add_argument('--status', default='processed', choices=STATUSES)
+    check_parser = commands.add_parser('check', help='Exit 0 if the path is processed, 1 otherwise')
+    check_parser.add_argument('path')
+    args = parser.parse_args()
+
+    ledger = Ledger(args.db)
+    try:
+        if args.command == 'import':
+            for log_path in args.logs:
+                print(f"Imported {ledger.import_log(log_path, args.status)} paths from {log_path}", file=sys.stderr)
+        elif args.command == 'filter':
+            for path in ledger.filter_unprocessed(line.strip() for line in sys.stdin if line.strip()):
+                print(path)
+        elif args.command == 'mark':
+            ledger.mark(read_paths(args), args.status)
+        elif args.command == 'check':
+            sys.exit(0 if ledger.is_processed(args.path) else 1)
+    finally:
+        ledger.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,29 @@
 import os
 import json
-import csv
-import paramiko
+import base64
+import time
 from datetime import datetime
-from ultralytics import YOLO
 from dotenv import load_dotenv
 import sys
 import logging
-import subprocess
+import threading
+from transport import LocalTransport, SSHTransport
+from pipeline import run_pipeline
+from tracking import FrameSampler, count_bees, load_tracker_args
+from motion import MotionGate
+from decode import DecodeConfig
+from roi import load_roi_config
+from pool import WorkerPool, fit_processes
+from traffic import from_npy_bytes, to_npy_bytes
+from checkpoint import CheckpointStore
+from batching import BatchEngine, set_torch_threads
+from backends import calibration_key, export_model, load_model, parse_backend
+from resources import PeakMonitor
+from results_sink import ResultSink
+from server import serve
+from metrics import MetricsRecorder, SlowestProfile
+from result_cache import ResultCache, file_digest, remote_digests
+from ledger import Ledger
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -30,153 +46,574 @@ for var, name in [(REMOTE_HOST, 'REMOTE_HOST'), (REMOTE_USER, 'REMOTE_USER'),
         sys.exit(1)
 
 # Configuration - Container-local paths
-MODEL_PATH = "/app/best.pt"
-LOCAL_VIDEO_DIR = "/tmp/videos"
-LOCAL_OUTPUT_DIR = "/tmp/output"
-PROCESSED_LOG = "/app/processed.log"
-LAST_RUN_FILE = "/app/last_run.txt"
+MODEL_PATH = os.getenv('MODEL_PATH', '/app/best.pt')
+# Inference runtime: torch, onnx, onnx:int8, openvino or openvino:int8 (see backends.py).
+# MODEL_CALIBRATION (required for INT8) is a directory of sample frames/videos for ONNX or a dataset YAML for OpenVINO.
+MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'torch')
+MODEL_CALIBRATION = os.getenv('MODEL_CALIBRATION')
+LOCAL_VIDEO_DIR = os.getenv('LOCAL_VIDEO_DIR', '/tmp/videos')
+LOCAL_OUTPUT_DIR = os.getenv('LOCAL_OUTPUT_DIR', '/tmp/output')
+PROCESSED_LOG = os.getenv('PROCESSED_LOG', '/app/processed.log')
+# Indexed processed-video ledger; an existing PROCESSED_LOG is imported into it on first start
+LEDGER_PATH = os.getenv('LEDGER_PATH', '/app/processed.sqlite')
+LAST_RUN_FILE = os.getenv('LAST_RUN_FILE', '/app/last_run.txt')
+TRANSPORT_RETRIES = int(os.getenv('TRANSPORT_RETRIES', '3'))
+# REMOTE_HOST=local serves REMOTE_VIDEO_PATH/REMOTE_OUTPUT_PATH from this machine (benchmarks, local runs),
+# with an optional simulated per-operation latency in seconds
+LOCAL_TRANSPORT_LATENCY = float(os.getenv('LOCAL_TRANSPORT_LATENCY', '0'))
+# Videos downloaded ahead of inference (0 disables pipelining) and results waiting for upload.
+# Each prefetched video holds a file in LOCAL_VIDEO_DIR and each queued result stays in memory,
+# so keep these small to fit the container mem_limit.
+PIPELINE_PREFETCH = int(os.getenv('PIPELINE_PREFETCH', '1'))
+PIPELINE_UPLOAD_QUEUE = int(os.getenv('PIPELINE_UPLOAD_QUEUE', '2'))
+# Frame sampling for tracking: all, stride:K, fps:F or budget:SECONDS (see tracking.FrameSampler)
+TRACK_SAMPLING = os.getenv('TRACK_SAMPLING', 'all')
+TRACKER_CONFIG = os.getenv('TRACKER_CONFIG', 'botsort.yaml')
+# Tracker settings replacing those in TRACKER_CONFIG, as key=value,... (e.g. track_buffer=60,match_thresh=0.8);
+# max_lost_seconds=S keeps lost tracks for S seconds whatever the frame rate and sampling stride
+TRACKER_OVERRIDES = os.getenv('TRACKER_OVERRIDES', '')
+# Skip sampled frames without motion before the detector: off or diff:RATIO (see motion.MotionGate)
+MOTION_GATE = os.getenv('MOTION_GATE', 'off')
+# Per-hive entrance ROIs keyed by video-name prefix (JSON, see roi.RoiConfig) and the detector input size
+ROI_CONFIG = os.getenv('ROI_CONFIG')
+INFER_IMGSZ = int(os.getenv('INFER_IMGSZ', '640'))
+# Decode frontend: default (on the tracking thread) or threaded[:scale=F,slots=N,nonref] to decode ahead on a
+# background thread into preallocated frames, optionally at reduced resolution (see decode.DecodeConfig)
+DECODE_FRONTEND = os.getenv('DECODE_FRONTEND', 'default')
+# Upload a per-second traffic series (.npy) per video to REMOTE_OUTPUT_PATH/traffic
+TRAFFIC_SERIES = os.getenv('TRAFFIC_SERIES', '1') == '1'
+# Checkpoint in-progress videos every CHECKPOINT_EVERY seconds (0, the default, disables) so a restarted container
+# resumes mid-video; applies to per-video tracking (not batching or the pool). Only useful with CHECKPOINT_DIR on a
+# volume that outlives the container; the container's own filesystem is gone after a restart.
+CHECKPOINT_DIR = os.getenv('CHECKPOINT_DIR', '/app/checkpoints')
+CHECKPOINT_EVERY = float(os.getenv('CHECKPOINT_EVERY', '0'))
+# Frames per forward pass (1 keeps per-frame inference) and videos decoded together when batching
+INFER_BATCH_SIZE = int(os.getenv('INFER_BATCH_SIZE', '1'))
+INFER_BATCH_VIDEOS = int(os.getenv('INFER_BATCH_VIDEOS', '4'))
+# Video input: "file" downloads to LOCAL_VIDEO_DIR first, "stream" decodes from a remote read-ahead
+# stream (falling back to a download if streaming fails)
+VIDEO_INPUT_MODE = os.getenv('VIDEO_INPUT_MODE', 'file')
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', str(1 << 20)))
+STREAM_READ_AHEAD = int(os.getenv('STREAM_READ_AHEAD', '8'))
+# PyTorch intra-op threads (0 keeps the PyTorch default)
+TORCH_THREADS = int(os.getenv('TORCH_THREADS', '0'))
+# Multi-process inference: worker processes (0 = track in this process, "auto" = as many as cores and the
+# memory limit allow) and PyTorch threads per worker; see pool.py sweep to pick the split
+POOL_PROCESSES = os.getenv('POOL_PROCESSES', '0')
+POOL_THREADS = int(os.getenv('POOL_THREADS', '2'))
+
+# Results are appended to REMOTE_OUTPUT_PATH/results.jsonl every RESULT_FLUSH_EVERY videos,
+# every RESULT_FLUSH_INTERVAL seconds and at the end of the payload
+RESULT_FLUSH_EVERY = int(os.getenv('RESULT_FLUSH_EVERY', '20'))
+RESULT_FLUSH_INTERVAL = float(os.getenv('RESULT_FLUSH_INTERVAL', '60'))
+
+# Worker mode: "stdin" handles one payload and exits, "server" (or --serve) keeps the model loaded
+# and accepts {"input": {...}} jobs on POST /run over HTTP, or over a Unix socket if SERVER_SOCKET is set
+WORKER_MODE = os.getenv('WORKER_MODE', 'stdin')
+SERVER_HOST = os.getenv('SERVER_HOST', '127.0.0.1')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '8000'))
+SERVER_SOCKET = os.getenv('SERVER_SOCKET')
+SERVER_MAX_QUEUED = int(os.getenv('SERVER_MAX_QUEUED', '100'))
+
+# Per-video metrics as JSON lines and a Prometheus text file (unset to disable either);
+# PROFILE_DIR enables cProfile and keeps the profile of each payload's slowest video
+METRICS_JSONL = os.getenv('METRICS_JSONL', '/tmp/output/metrics.jsonl')
+METRICS_PROM = os.getenv('METRICS_PROM')
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+
+# Content-addressed cache of results (sqlite); set to an empty string to disable
+RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH', '/app/result_cache.sqlite')
+
+# Shared SSH/SFTP session, opened on first use and kept for the whole payload
+transport = None
+# Result sink for the payload being processed
+result_sink = None
+metrics = MetricsRecorder(METRICS_JSONL, METRICS_PROM)
+profiler = SlowestProfile(PROFILE_DIR)
 
 # Initialize YOLO model
-logger.info("Loading YOLO model from %s", MODEL_PATH)
+logger.info("Loading YOLO model from %s (backend=%s)", MODEL_PATH, MODEL_BACKEND)
 try:
-    model = YOLO(MODEL_PATH)
-    model.fuse()
+    logger.info("Using %d PyTorch threads", set_torch_threads(TORCH_THREADS))
+    backend, int8 = parse_backend(MODEL_BACKEND)
+    if POOL_PROCESSES != "0":
+        # Pool workers each load their own copy; export once here so they do not race on the cache
+        model = None
+        if backend != "torch":
+            export_model(MODEL_PATH, backend, int8, INFER_IMGSZ, calib=MODEL_CALIBRATION)
+    else:
+        model = load_model(MODEL_PATH, backend, int8, imgsz=INFER_IMGSZ, dynamic=INFER_BATCH_SIZE > 1,
+                           calib=MODEL_CALIBRATION)
 except Exception as e:
     logger.error("Failed to load YOLO model: %s", str(e))
     sys.exit(1)
 
+# Validate tracking configuration before any video is downloaded
+try:
+    tracker_args = load_tracker_args(TRACKER_CONFIG, TRACKER_OVERRIDES)
+    FrameSampler.from_spec(TRACK_SAMPLING)
+    MotionGate.from_spec(MOTION_GATE)
+    DecodeConfig.from_spec(DECODE_FRONTEND)
+    roi_config = load_roi_config(ROI_CONFIG)
+except Exception as e:
+    logger.error("Invalid tracking configuration: %s", str(e))
+    sys.exit(1)
+
+# Payload video -> content digest, for videos that went to inference
+video_digests = {}
+# Result cache, opened on first use when RESULT_CACHE_PATH is set
+result_cache = None
+# Processed-video ledger, opened in main()
+ledger = None
+# Inference worker pool, started on first use when POOL_PROCESSES is set
+pool = None
+# Remote directories already created for traffic series
+traffic_dirs = set()
+# Video checkpoints, opened on first use when CHECKPOINT_EVERY > 0
+checkpoints = None
+
+def get_transport():
+    """Return the shared SSH/SFTP transport, creating it on first use."""
+    global transport
+    if transport is None and REMOTE_HOST == "local":
+        transport = LocalTransport(LOCAL_TRANSPORT_LATENCY)
+    if transport is None:
+        transport = SSHTransport(REMOTE_HOST, REMOTE_USER, password=REMOTE_PASS, key_path=SSH_KEY_PATH,
+                                 retries=TRANSPORT_RETRIES)
+    return transport
+
 def ssh_command(command):
     """Execute SSH command on remote server."""
-    client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
     try:
-        logger.info("Executing SSH command: %s", command)
-        if SSH_KEY_PATH and os.path.exists(SSH_KEY_PATH):
-            logger.info("Using SSH key authentication")
-            client.connect(
-                hostname=REMOTE_HOST,
-                username=REMOTE_USER,
-                key_filename=SSH_KEY_PATH,
-                timeout=10
-            )
-        else:
-            logger.warning("Falling back to password-based authentication")
-            if not REMOTE_PASS:
-                logger.error("REMOTE_PASS not set for password authentication")
-                sys.exit(1)
-            client.connect(
-                hostname=REMOTE_HOST,
-                username=REMOTE_USER,
-                password=REMOTE_PASS,
-                timeout=10
-            )
-        stdin, stdout, stderr = client.exec_command(command)
-        output = stdout.read().decode()
-        error = stderr.read().decode()
-        if error:
-            logger.error("SSH command error: %s", error)
+        output = get_transport().run(command)
         logger.info("SSH command output: %s", output)
         return output
     except Exception as e:
         logger.error("SSH Error: %s", str(e))
         raise
+
+def sftp_download(remote_path, local_path):
+    """Download file over the shared SFTP session."""
+    try:
+        get_transport().download(remote_path, local_path)
+    except Exception as e:
+        logger.error("SFTP download error: %s", str(e))
+        raise
+
+def download_video(video_name):
+    """Fetch a payload video as a local file, or open it as a remote stream in stream input mode."""
+    remote_path = os.path.join(REMOTE_VIDEO_PATH, video_name)
+    if VIDEO_INPUT_MODE == "stream":
+        try:
+            return get_transport().open_stream(remote_path, STREAM_CHUNK_SIZE, STREAM_READ_AHEAD)
+        except Exception as e:
+            logger.warning("Cannot stream %s (%s); falling back to download", remote_path, str(e))
+    return download_file(video_name)
+
+def download_file(video_name):
+    """Download a payload video into the local scratch directory."""
+    remote_path = os.path.join(REMOTE_VIDEO_PATH, video_name)
+    local_path = os.path.join(LOCAL_VIDEO_DIR, video_name)
+    store = get_checkpoints()
+    if store is not None and store.exists(video_name) and os.path.exists(local_path) \
+            and os.path.getsize(local_path) == get_transport().size(remote_path):
+        logger.info("Reusing %s left by an interrupted run", local_path)
+        return local_path
+    logger.info("Downloading %s to %s", remote_path, local_path)
+    started = time.perf_counter()
+    try:
+        sftp_download(remote_path, local_path)
+    except Exception:
+        remove_local(local_path)
+        raise
+    metrics.update(video_name, transfer_bytes=os.path.getsize(local_path), transfer_s=time.perf_counter() - started)
+    return local_path
+
+def analyze_video(video_name, source):
+    """Run YOLO tracking on a downloaded or streamed video and return its result record."""
+    try:
+        logger.info("Running YOLO model on %s (sampling=%s, motion gate=%s, imgsz=%d)", source, TRACK_SAMPLING,
+                    MOTION_GATE, INFER_IMGSZ)
+        with PeakMonitor() as monitor, profiler.profile(video_name):
+            try:
+                bee_ids, stats = track_video(video_name, source)
+            except Exception as e:
+                if is_local(source):
+                    raise
+                logger.warning("Streaming %s failed (%s); falling back to download", video_name, str(e))
+                release_source(source)
+                source = download_file(video_name)
+                bee_ids, stats = track_video(video_name, source)
+        upload_traffic(video_name, stats.pop("traffic"))
+        record_metrics(video_name, source, stats, monitor.peak_rss)
+        return cache_result(make_result(video_name, bee_ids))
     finally:
-        client.close()
+        release_source(source)
+
+def track_video(video_name, source):
+    """Count bees in one video with the configured sampling, motion gate, ROI and input size."""
+    roi = roi_config.for_video(video_name) if roi_config else None
+    store = get_checkpoints()
+    checkpoint = None
+    if store is not None:
+        checkpoint = store.open(video_name, os.path.getsize(source) if is_local(source) else source.size)
+    return count_bees(model, source, FrameSampler.from_spec(TRACK_SAMPLING), tracker_args,
+                      MotionGate.from_spec(MOTION_GATE), roi, INFER_IMGSZ, checkpoint,
+                      DecodeConfig.from_spec(DECODE_FRONTEND))
+
+def get_checkpoints():
+    """Return the checkpoint store, opening it on first use; None when checkpointing is disabled."""
+    global checkpoints
+    if checkpoints is None and CHECKPOINT_EVERY > 0:
+        checkpoints = CheckpointStore(CHECKPOINT_DIR, CHECKPOINT_EVERY, inference_config())
+    return checkpoints
 
-def scp_download(remote_path, local_path):
-    """Download file via SCP."""
-    logger.info("Downloading from %s to %s", remote_path, local_path)
-    if SSH_KEY_PATH and os.path.exists(SSH_KEY_PATH):
-        command = f"scp -i {SSH_KEY_PATH} {REMOTE_USER}@{REMOTE_HOST}:{remote_path} {local_path}"
+def is_local(source):
+    return isinstance(source, str)
+
+def release_source(source):
+    """Delete a downloaded file or close a remote stream."""
+    if is_local(source):
+        remove_local(source)
     else:
-        if not REMOTE_PASS:
-            logger.error("REMOTE_PASS not set for password authentication")
-            sys.exit(1)
-        command = f"SSHPASS={REMOTE_PASS} sshpass -e scp {REMOTE_USER}@{REMOTE_HOST}:{remote_path} {local_path}"
+        source.close()
+
+def record_metrics(video_name, source, stats, peak_rss):
+    """Log resource use for a tracked video and write its metrics record."""
+    disk = os.path.getsize(source) if is_local(source) and os.path.exists(source) else 0
+    logger.info("Resources for %s: input=%s peak_rss=%.1f MiB peak_disk=%.1f MiB",
+                video_name, "file" if is_local(source) else "stream",
+                peak_rss / 2**20, disk / 2**20)
+    if not is_local(source):
+        metrics.update(video_name, transfer_bytes=source.bytes_fetched, transfer_s=source.fetch_seconds)
+    metrics.update(video_name, input="file" if is_local(source) else "stream", peak_rss_bytes=peak_rss,
+                   peak_disk_bytes=disk, frames_decoded=stats["frames_total"], frames_inferred=stats["frames_processed"],
+                   decode_s=stats["decode_s"], infer_s=stats["infer_s"], track_s=stats["track_s"],
+                   infer_ms_per_frame=stats["infer_ms_per_frame"], track_ms_per_frame=stats["track_ms_per_frame"],
+                   track_seconds=stats["seconds"], sampling=stats["sampling"], decode=stats["decode"], motion_gate=stats["motion_gate"],
+                   frames_motion_skipped=stats["frames_motion_skipped"], motion_skip_ratio=stats["motion_skip_ratio"],
+                   roi=stats["roi"], detections_outside_roi=stats["detections_outside_roi"],
+                   checkpoints=stats.get("checkpoints", 0), checkpoint_s=stats.get("checkpoint_s", 0.0),
+                   resumed_from=stats.get("resumed_from", 0))
+    metrics.finish(video_name)
+
+def upload_traffic(video_name, series):
+    """Upload a video's per-second traffic series as .npy next to the results; failures are only logged."""
+    if not TRAFFIC_SERIES:
+        return
+    remote_path = f"{REMOTE_OUTPUT_PATH}/traffic/{os.path.splitext(video_name)[0]}.npy"
     try:
-        subprocess.run(command, shell=True, check=True)
-    except subprocess.CalledProcessError as e:
-        logger.error("SCP download error: %s", str(e))
-        raise
+        remote_dir = os.path.dirname(remote_path)
+        if remote_dir not in traffic_dirs:
+            get_transport().makedirs(remote_dir)
+            traffic_dirs.add(remote_dir)
+        get_transport().upload(to_npy_bytes(series), remote_path)
+    except Exception as e:
+        logger.warning("Failed to upload traffic series for %s: %s", video_name, str(e))
+
+def make_result(video_name, bee_ids):
+    """Build the result record uploaded for a video."""
+    timestamp = datetime.now().isoformat()
+    result = {
+        "video": video_name,
+        "timestamp": timestamp,
+        "bee_count": len(bee_ids),
+        "bee_ids": list(bee_ids)
+    }
+    logger.info("YOLO results: %s", result)
+    return result
+
+def inference_config():
+    """Everything besides the video bytes that affects bee_count, used to key the result cache."""
+    roi = file_digest(ROI_CONFIG) if ROI_CONFIG else "full-frame"
+    tracker = f"{TRACKER_CONFIG}:{TRACKER_OVERRIDES}" if TRACKER_OVERRIDES else TRACKER_CONFIG
+    parts = [file_digest(MODEL_PATH), MODEL_BACKEND, TRACK_SAMPLING, tracker, MOTION_GATE, roi, str(INFER_IMGSZ)]
+    # The default decoder leaves keys cached before the decode frontend existed valid
+    decode = DecodeConfig.from_spec(DECODE_FRONTEND).spec
+    if decode != "default":
+        parts.append(decode)
+    # An INT8 model recalibrated on other data counts bees differently
+    if parse_backend(MODEL_BACKEND)[1]:
+        parts.append(calibration_key(MODEL_CALIBRATION))
+    return "|".join(parts)
 
-def scp_upload(content, remote_path):
-    """Upload content via SCP."""
-    local_temp = "/tmp/temp_result.json"
-    logger.info("Uploading to %s", remote_path)
+def get_result_cache():
+    """Return the result cache, opening it on first use; None when caching is disabled."""
+    global result_cache
+    if result_cache is None and RESULT_CACHE_PATH:
+        result_cache = ResultCache(RESULT_CACHE_PATH, inference_config())
+    return result_cache
+
+def skip_cached(videos):
+    """Publish cached results for videos whose content was already processed; return the rest."""
+    if get_result_cache() is None:
+        return videos
+    remote_paths = {video: os.path.join(REMOTE_VIDEO_PATH, video) for video in videos}
     try:
-        with open(local_temp, "w") as f:
-            f.write(content)
-        if SSH_KEY_PATH and os.path.exists(SSH_KEY_PATH):
-            command = f"scp -i {SSH_KEY_PATH} {local_temp} {REMOTE_USER}@{REMOTE_HOST}:{remote_path}"
-        else:
-            if not REMOTE_PASS:
-                logger.error("REMOTE_PASS not set for password authentication")
-                sys.exit(1)
-            command = f"SSHPASS={REMOTE_PASS} sshpass -e scp {local_temp} {REMOTE_USER}@{REMOTE_HOST}:{remote_path}"
-        subprocess.run(command, shell=True, check=True)
-    except subprocess.CalledProcessError as e:
-        logger.error("SCP upload error: %s", str(e))
+        digests = remote_digests(get_transport(), list(remote_paths.values()))
+    except Exception as e:
+        logger.warning("Cannot hash payload videos (%s); processing all of them", str(e))
+        return videos
+    remaining = []
+    for video in videos:
+        digest = digests.get(remote_paths[video])
+        if digest is None:
+            remaining.append(video)
+            continue
+        video_digests[video] = digest
+        cached = result_cache.get(digest)
+        if cached is None:
+            remaining.append(video)
+            continue
+        logger.info("Cache hit for %s (sha256 %s), skipping download and inference", video, digest[:12])
+        metrics.update(video, cache_hit=True)
+        metrics.finish(video)
+        publish_result(make_result(video, cached[1]))
+    return remaining
+
+def cache_result(result):
+    """Store a fresh result under its video's content digest."""
+    digest = video_digests.get(result["video"])
+    if result_cache is not None and digest:
+        result_cache.put(digest, result)
+    return result
+
+def download_group(videos):
+    """Fetch a group of videos that will be batched together."""
+    sources = []
+    try:
+        for video in videos:
+            sources.append(download_video(video))
+    except Exception:
+        discard_group(videos, sources)
         raise
+    return sources
+
+def analyze_group(videos, sources):
+    """Track a group of downloaded or streamed videos with cross-video frame batching."""
+    try:
+        logger.info("Running batched YOLO on %d videos (batch=%d)", len(videos), INFER_BATCH_SIZE)
+        with PeakMonitor() as monitor, profiler.profile(",".join(videos)):
+            try:
+                tracked = run_batch(sources)
+            except Exception as e:
+                if all(is_local(source) for source in sources):
+                    raise
+                logger.warning("Streaming batch failed (%s); falling back to download", str(e))
+                discard_group(videos, sources)
+                sources = []
+                for video in videos:
+                    sources.append(download_file(video))
+                tracked = run_batch(sources)
+        for video, source, (_, stats) in zip(videos, sources, tracked):
+            upload_traffic(video, stats.pop("traffic"))
+            record_metrics(video, source, stats, monitor.peak_rss)
+        return [cache_result(make_result(video, bee_ids)) for video, (bee_ids, _) in zip(videos, tracked)]
     finally:
-        if os.path.exists(local_temp):
-            os.remove(local_temp)
+        discard_group(videos, sources)
+
+def run_batch(sources):
+    engine = BatchEngine(model, INFER_BATCH_SIZE, INFER_BATCH_VIDEOS, tracker_args, TRACK_SAMPLING, MOTION_GATE,
+                         roi_config, INFER_IMGSZ, DECODE_FRONTEND)
+    tracked = engine.run(sources)
+    logger.info("Batched inference: %d frames in %d batches, %.2f fps", engine.frames, engine.batches, engine.fps)
+    return tracked
+
+def publish_group(results):
+    for result in results:
+        publish_result(result)
+
+def discard_group(videos, sources):
+    for source in sources:
+        release_source(source)
+
+def publish_result(result):
+    """Hand a result to the payload's result sink; it is uploaded on the next flush."""
+    result_sink.add(result)
+
+def mark_processed(results):
+    """Record flushed videos in the processed-video ledger."""
+    paths = {os.path.join(REMOTE_VIDEO_PATH, result["video"]): result["video"] for result in results}
+    digests = {path: video_digests[video] for path, video in paths.items() if video in video_digests}
+    ledger.mark(paths, "processed", digests)
+    for result in results:
+        logger.info("Video %s processed successfully", result["video"])
+
+def mark_failed(videos):
+    """Record payload videos that did not get a result as failed."""
+    paths = [os.path.join(REMOTE_VIDEO_PATH, video) for video in videos]
+    failed = [path for path in paths if ledger.status(path) != "processed"]
+    ledger.mark(failed, "failed")
+    logger.info("Marked %d videos without a result as failed", len(failed))
+
+def remove_local(local_path):
+    if os.path.exists(local_path):
+        os.remove(local_path)
 
 def process_video(video_name):
     """Process a single video and upload results."""
     try:
         logger.info("Processing video: %s", video_name)
-        remote_path = os.path.join(REMOTE_VIDEO_PATH, video_name)
-        local_path = os.path.join(LOCAL_VIDEO_DIR, video_name)
-
-        # Download video
-        logger.info("Downloading %s to %s", remote_path, local_path)
-        scp_download(remote_path, local_path)
-
-        # Process with YOLO
-        logger.info("Running YOLO model on %s", local_path)
-        results = model.track(local_path, stream=True, persist=True)
-        bee_ids = {int(box.id[0]) for r in results for box in r.boxes if box.id is not None}
-
-        # Prepare output
-        timestamp = datetime.now().isoformat()
-        result = {
-            "video": video_name,
-            "timestamp": timestamp,
-            "bee_count": len(bee_ids),
-            "bee_ids": list(bee_ids)
-        }
-        logger.info("YOLO results: %s", result)
-
-        # Save results locally to CSV
-        os.makedirs(LOCAL_OUTPUT_DIR, exist_ok=True)
-        csv_path = f"{LOCAL_OUTPUT_DIR}/results.csv"
-        with open(csv_path, "a") as f:
-            writer = csv.writer(f)
-            writer.writerow([result["video"], timestamp, result["bee_count"], ",".join(map(str, bee_ids))])
-
-        # Upload to remote server
-        logger.info("Uploading results to %s", REMOTE_OUTPUT_PATH)
-        ssh_command(f"mkdir -p {REMOTE_OUTPUT_PATH}")
-        scp_upload(json.dumps(result), f"{REMOTE_OUTPUT_PATH}/results.json")
-
-        # Update logs
-        with open(PROCESSED_LOG, "a") as f:
-            f.write(f"{remote_path}\n")
-        logger.info("Video %s processed successfully", video_name)
-
+        source = download_video(video_name)
+        publish_result(analyze_video(video_name, source))
     except Exception as e:
         logger.error("Error processing video %s: %s", video_name, str(e))
         raise
+
+def process_videos(videos):
+    """Process a payload; buffered results are flushed even if a video fails."""
+    global result_sink
+    result_sink = ResultSink(get_transport(), f"{REMOTE_OUTPUT_PATH}/results.jsonl", f"{LOCAL_OUTPUT_DIR}/results.csv",
+                             flush_every=RESULT_FLUSH_EVERY, flush_interval=RESULT_FLUSH_INTERVAL,
+                             on_flushed=mark_processed)
+    try:
+        try:
+            run_stages(skip_cached(videos))
+        finally:
+            result_sink.close()
+    except Exception:
+        mark_failed(videos)
+        raise
+    finally:
+        profiler.dump()
+        video_digests.clear()
+        if result_cache is not None:
+            result_cache.log_stats()
+
+def get_pool():
+    """Return the inference worker pool, (re)starting it if needed."""
+    global pool
+    if pool is not None and not pool.alive:
+        logger.warning("A pool worker died; restarting the pool")
+        pool.close()
+        pool = None
+    if pool is None:
+        processes = fit_processes(0 if POOL_PROCESSES == "auto" else int(POOL_PROCESSES), POOL_THREADS)
+        pool = WorkerPool(processes, POOL_THREADS, {
+            "model_path": MODEL_PATH, "backend": MODEL_BACKEND, "calib": MODEL_CALIBRATION, "imgsz": INFER_IMGSZ,
+            "sampling": TRACK_SAMPLING, "tracker": TRACKER_CONFIG, "motion": MOTION_GATE, "roi": ROI_CONFIG,
+            "decode": DECODE_FRONTEND, "tracker_overrides": TRACKER_OVERRIDES})
+    return pool
+
+def close_pool():
+    global pool
+    if pool is not None:
+        pool.close()
+        pool = None
+
+def run_pooled(videos):
+    """Track videos on the worker pool; this process downloads ahead and publishes results.
+
+    At most one video per worker plus PIPELINE_PREFETCH are on local disk at once.
+    """
+    workers = get_pool()
+    slots = threading.Semaphore(len(workers) + max(PIPELINE_PREFETCH, 0))
+    stopped = threading.Event()
+    downloaded = {}
+
+    def tasks():
+        for video in videos:
+            while not slots.acquire(timeout=1):
+                if stopped.is_set():
+                    return
+            if stopped.is_set():
+                return
+            downloaded[video] = download_file(video)
+            try:
+                yield {"video": video, "path": downloaded[video]}
+            except GeneratorExit:
+                # The pool stopped before this video was queued
+                remove_local(downloaded.pop(video))
+                raise
+
+    logger.info("Tracking %d videos on %d pool workers", len(videos), len(workers))
+    try:
+        for reply in workers.map(tasks()):
+            video = reply["video"]
+            source = downloaded.pop(video)
+            try:
+                if "error" in reply:
+                    raise RuntimeError(f"Pool worker failed on {video}: {reply['error']}")
+                upload_traffic(video, from_npy_bytes(base64.b64decode(reply["stats"].pop("traffic"))))
+                record_metrics(video, source, reply["stats"], reply["peak_rss"])
+                publish_result(cache_result(make_result(video, reply["bee_ids"])))
+            finally:
+                remove_local(source)
+                slots.release()
+    except Exception as e:
+        logger.error("Error processing videos on the pool: %s", str(e))
+        raise
     finally:
-        if os.path.exists(local_path):
-            os.remove(local_path)
+        stopped.set()
+        for source in list(downloaded.values()):
+            remove_local(source)
+
+def run_stages(videos):
+    """Run the payload stages, overlapping downloads and uploads with inference when pipelining is enabled.
+
+    With INFER_BATCH_SIZE > 1 the pipeline moves groups of INFER_BATCH_VIDEOS
+    videos instead of single videos, so each group is batched together. With
+    POOL_PROCESSES set, videos are tracked in parallel by the worker pool.
+    """
+    if POOL_PROCESSES != "0":
+        run_pooled(videos)
+        return
+    if INFER_BATCH_SIZE > 1:
+        items = [tuple(videos[i:i + INFER_BATCH_VIDEOS]) for i in range(0, len(videos), INFER_BATCH_VIDEOS)]
+        stages = (download_group, analyze_group, publish_group, discard_group)
+    else:
+        items = videos
+        stages = (download_video, analyze_video, publish_result, lambda video, source: release_source(source))
+    download, infer, upload, discard = stages
+
+    if PIPELINE_PREFETCH <= 0:
+        for item in items:
+            try:
+                logger.info("Processing: %s", item)
+                upload(infer(item, download(item)))
+            except Exception as e:
+                logger.error("Error processing %s: %s", item, str(e))
+                raise
+        return
+    logger.info("Pipelining %d items (prefetch=%d, upload queue=%d)", len(items), PIPELINE_PREFETCH, PIPELINE_UPLOAD_QUEUE)
+    run_pipeline(items, download, infer, upload,
+                 prefetch_depth=PIPELINE_PREFETCH, upload_depth=PIPELINE_UPLOAD_QUEUE, discard=discard)
+
+def run_payload(input_data):
+    """Process the "input" object of a payload and update the last run time."""
+    videos = input_data.get("videos", [])
+    if not videos:
+        logger.warning("No videos in payload")
+        return
+
+    try:
+        process_videos(videos)
+    finally:
+        if transport is not None:
+            transport.log_stats()
+
+    # Update last run time
+    with open(LAST_RUN_FILE, "w") as f:
+        f.write(datetime.now().isoformat())
 
 def main():
     """Main function to handle JSON payload."""
+    global ledger
     # Initialize files
-    for f in [PROCESSED_LOG, LAST_RUN_FILE]:
-        if not os.path.exists(f):
-            open(f, 'w').close()
+    if not os.path.exists(LAST_RUN_FILE):
+        open(LAST_RUN_FILE, 'w').close()
+    new_ledger = not os.path.exists(LEDGER_PATH)
+    ledger = Ledger(LEDGER_PATH)
+    if new_ledger and os.path.exists(PROCESSED_LOG):
+        logger.info("Imported %d paths from %s into the ledger", ledger.import_log(PROCESSED_LOG), PROCESSED_LOG)
+
+    if WORKER_MODE == "server" or "--serve" in sys.argv[1:]:
+        # Keep the model loaded and the SSH session open across jobs
+        serve(run_payload, SERVER_HOST, SERVER_PORT, SERVER_SOCKET, SERVER_MAX_QUEUED)
+        close_pool()
+        if transport is not None:
+            transport.close()
+        return
 
     # Read JSON payload from stdin
     try:
@@ -193,18 +630,12 @@ def main():
         logger.info('echo \'{"input": {"videos": ["sample.mp4"], "timestamp": "2025-06-26T09:12:00Z"}}\' | python main.py')
         sys.exit(0)
 
-    # Process videos in the payload
-    videos = input_data.get("videos", [])
-    if not videos:
-        logger.warning("No videos in payload")
-        return
-
-    for video in videos:
-        process_video(video)
-
-    # Update last run time
-    with open(LAST_RUN_FILE, "w") as f:
-        f.write(datetime.now().isoformat())
+    try:
+        run_payload(input_data)
+    finally:
+        close_pool()
+        if transport is not None:
+            transport.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
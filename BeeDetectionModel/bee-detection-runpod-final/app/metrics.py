@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import cProfile
+import pstats
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Per-video fields summed into Prometheus counters: field -> (metric name, help)
+COUNTERS = {
+    "transfer_bytes": ("bee_worker_transfer_bytes_total", "Bytes of video transferred from the hive server"),
+    "transfer_s": ("bee_worker_transfer_seconds_total", "Seconds spent transferring video"),
+    "frames_decoded": ("bee_worker_frames_decoded_total", "Frames decoded"),
+    "frames_inferred": ("bee_worker_frames_inferred_total", "Frames sent to the detector"),
+    "frames_motion_skipped": ("bee_worker_frames_motion_skipped_total", "Sampled frames skipped by the motion gate"),
+    "decode_s": ("bee_worker_decode_seconds_total", "Seconds spent decoding frames"),
+    "infer_s": ("bee_worker_inference_seconds_total", "Seconds spent in detector forward passes"),
+    "track_s": ("bee_worker_tracker_seconds_total", "Seconds spent in tracker updates"),
+    "checkpoint_s": ("bee_worker_checkpoint_seconds_total", "Seconds spent writing video checkpoints"),
+}
+
+
+class MetricsRecorder:
+    """Collects per-video metrics, appends them as JSON lines and keeps a Prometheus text file current.
+
+    Either output path may be None to disable it. Fields for a video can be
+    added from several stages (download, inference) before ``finish()`` writes
+    the record.
+    """
+
+    def __init__(self, jsonl_path=None, prom_path=None):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        for path in (jsonl_path, prom_path):
+            if path and os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._videos = {}
+        self._totals = {field: 0.0 for field in COUNTERS}
+        self._count = 0
+        self._peak_rss = 0
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def update(self, video, **fields):
+        with self._lock:
+            self._videos.setdefault(video, {"video": video}).update(fields)
+
+    def finish(self, video):
+        """Write the record for a video and fold it into the Prometheus totals."""
+        with self._lock:
+            record = self._videos.pop(video, {"video": video})
+            record["finished"] = time.time()
+            for field in COUNTERS:
+                self._totals[field] += record.get(field, 0) or 0
+            self._count += 1
+            self._peak_rss = max(self._peak_rss, record.get("peak_rss_bytes", 0))
+            self._last = record
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+            if self.prom_path:
+                self._write_prometheus()
+        return record
+
+    def _write_prometheus(self):
+        lines = ["# HELP bee_worker_videos_total Videos processed",
+                 "# TYPE bee_worker_videos_total counter",
+                 f"bee_worker_videos_total {self._count}"]
+        for field, (name, help_text) in COUNTERS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {self._totals[field]:g}"]
+        gauges = {
+            "bee_worker_peak_rss_bytes": ("Peak resident memory seen while processing a video", self._peak_rss),
+            "bee_worker_last_inference_ms_per_frame": ("Detector ms/frame of the last video",
+                                                       self._last.get("infer_ms_per_frame", 0)),
+            "bee_worker_last_tracker_ms_per_frame": ("Tracker ms/frame of the last video",
+                                                     self._last.get("track_ms_per_frame", 0)),
+        }
+        for name, (help_text, value) in gauges.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value:g}"]
+        # Write then rename so node_exporter never reads a partial file
+        tmp_path = f"{self.prom_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prom_path)
+
+
+class SlowestProfile:
+    """Profiles each video and keeps only the profile of the slowest one for the payload."""
+
+    def __init__(self, output_dir=None):
+        self.output_dir = output_dir
+        self.slowest = None
+
+    @property
+    def enabled(self):
+        return bool(self.output_dir)
+
+    @contextmanager
+    def profile(self, name):
+        if not self.enabled:
+            yield
+            return
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            if self.slowest is None or elapsed > self.slowest[1]:
+                self.slowest = (name, elapsed, pstats.Stats(profiler))
+
+    def dump(self):
+        """Write the slowest video's profile (loadable with pstats/snakeviz) and reset."""
+        if not self.slowest:
+            return None
+        name, elapsed, stats = self.slowest
+        self.slowest = None
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%dT%H%M%S')}_{os.path.basename(name)}.prof")
+        stats.dump_stats(path)
+        logger.info("Profile of slowest video %s (%.2fs) written to %s", name, elapsed, path)
+        return path
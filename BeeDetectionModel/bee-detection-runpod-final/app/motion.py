@@ -0,0 +1,96 @@
+import time
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Cheap pre-filter that skips sampled frames with no motion before they reach the detector.
+
+    Each frame is shrunk to a small blurred grayscale image and compared with
+    the last frame sent to the detector; the frame is kept when the fraction of
+    pixels that changed by more than ``pixel_delta`` reaches ``threshold``.
+    Comparing against the last kept frame (rather than the previous frame) lets
+    slow movement accumulate until it triggers.
+
+    To keep track IDs stable a few frames after motion are always kept
+    (``hangover``), and one frame is kept after ``max_skip`` skipped frames in a
+    row so the tracker keeps seeing bees resting in view.
+
+    Modes:
+      off           every sampled frame goes to the detector
+      diff:RATIO    keep frames where at least RATIO of the pixels changed (e.g. diff:0.002)
+    """
+
+    MODES = ("off", "diff")
+
+    def __init__(self, mode="off", threshold=None, pixel_delta=25, width=160, max_skip=15, hangover=3):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown motion gate mode: {mode}. Use one of {', '.join(self.MODES)}")
+        if mode != "off" and (threshold is None or not 0 < float(threshold) < 1):
+            raise ValueError(f"Motion gate mode '{mode}' needs a ratio between 0 and 1")
+        self.mode = mode
+        self.threshold = float(threshold) if threshold is not None else None
+        self.pixel_delta = pixel_delta
+        self.width = width
+        self.max_skip = max_skip
+        self.hangover = hangover
+        self.checked = 0
+        self.skipped = 0
+        self.seconds = 0.0
+        self._reference = None
+        self._run = 0
+        self._hold = 0
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Build a gate from an 'off' or 'diff:RATIO' string."""
+        spec = (spec or "off").strip()
+        mode, _, value = spec.partition(":")
+        return cls(mode, value or None)
+
+    @property
+    def spec(self):
+        if self.mode == "off":
+            return "off"
+        return f"{self.mode}:{self.threshold:g}"
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def _thumbnail(self, frame):
+        height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (self.width, height), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def keep(self, frame):
+        """Return True if the frame should be sent to the detector."""
+        if not self.enabled:
+            return True
+        started = time.perf_counter()
+        self.checked += 1
+        thumbnail = self._thumbnail(frame)
+        if self._reference is None:
+            moving = True
+        else:
+            changed = np.count_nonzero(cv2.absdiff(thumbnail, self._reference) > self.pixel_delta)
+            moving = changed >= self.threshold * thumbnail.size
+        if moving:
+            self._hold = self.hangover
+        elif self._hold > 0:
+            self._hold -= 1
+            moving = True
+        keep = moving or self._run >= self.max_skip
+        if keep:
+            self._reference = thumbnail
+            self._run = 0
+        else:
+            self._run += 1
+            self.skipped += 1
+        self.seconds += time.perf_counter() - started
+        return keep
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.checked if self.checked else 0.0
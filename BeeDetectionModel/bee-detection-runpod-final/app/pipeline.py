@@ -0,0 +1,145 @@
+import queue
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class StageTimings:
+    """Collects per-stage wall-clock durations for a payload."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+
+    def record(self, stage, item, seconds):
+        logger.info("Stage %s for %s took %.2fs", stage, item, seconds)
+        with self._lock:
+            self.stages.setdefault(stage, []).append(seconds)
+
+    def log_summary(self, wall_seconds):
+        busy = 0.0
+        for stage, durations in self.stages.items():
+            total = sum(durations)
+            busy += total
+            logger.info("Stage %s: %d items, total=%.2fs mean=%.2fs max=%.2fs",
+                        stage, len(durations), total, total / len(durations), max(durations))
+        if wall_seconds > 0:
+            logger.info("Pipeline wall time %.2fs for %.2fs of stage work (overlap %.2fx)",
+                        wall_seconds, busy, busy / wall_seconds)
+
+
+def _put(q, value, stop):
+    """Put into a bounded queue without blocking forever once the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            q.put(value, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    while True:
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            if stop.is_set():
+                return _DONE
+
+
+def run_pipeline(items, download, infer, upload, prefetch_depth=1, upload_depth=2, discard=None):
+    """Run download -> infer -> upload with the three stages overlapping.
+
+    ``download(item)`` runs in a background thread and may run up to
+    ``prefetch_depth`` items ahead of inference. ``infer(item, downloaded)``
+    runs on the calling thread, and ``upload(result)`` runs in a second
+    background thread with at most ``upload_depth`` results waiting. The first
+    exception from any stage stops the pipeline and is re-raised here;
+    ``discard(item, downloaded)`` is called for downloads that were never inferred.
+    """
+    timings = StageTimings()
+    stop = threading.Event()
+    errors = []
+    download_q = queue.Queue(maxsize=max(1, prefetch_depth))
+    upload_q = queue.Queue(maxsize=max(1, upload_depth))
+
+    def fail(e):
+        errors.append(e)
+        stop.set()
+
+    def downloader():
+        try:
+            for item in items:
+                if stop.is_set():
+                    break
+                started = time.perf_counter()
+                downloaded = download(item)
+                timings.record("download", item, time.perf_counter() - started)
+                if not _put(download_q, (item, downloaded), stop):
+                    if discard:
+                        discard(item, downloaded)
+                    break
+        except Exception as e:
+            logger.error("Download stage failed: %s", str(e))
+            fail(e)
+        finally:
+            _put(download_q, _DONE, stop)
+
+    def uploader():
+        while True:
+            entry = _get(upload_q, stop)
+            if entry is _DONE:
+                return
+            item, result = entry
+            try:
+                started = time.perf_counter()
+                upload(result)
+                timings.record("upload", item, time.perf_counter() - started)
+            except Exception as e:
+                logger.error("Upload stage failed for %s: %s", item, str(e))
+                fail(e)
+                return
+
+    started_wall = time.perf_counter()
+    download_thread = threading.Thread(target=downloader, name="pipeline-download", daemon=True)
+    upload_thread = threading.Thread(target=uploader, name="pipeline-upload", daemon=True)
+    download_thread.start()
+    upload_thread.start()
+
+    try:
+        while True:
+            entry = _get(download_q, stop)
+            if entry is _DONE:
+                break
+            item, downloaded = entry
+            started = time.perf_counter()
+            result = infer(item, downloaded)
+            timings.record("infer", item, time.perf_counter() - started)
+            if not _put(upload_q, (item, result), stop):
+                break
+    except Exception as e:
+        logger.error("Inference stage failed: %s", str(e))
+        fail(e)
+    finally:
+        _put(upload_q, _DONE, stop)
+        upload_thread.join()
+        stop.set()
+        download_thread.join()
+        # Drop anything that was prefetched but never processed
+        while discard:
+            try:
+                entry = download_q.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _DONE:
+                discard(*entry)
+        timings.log_summary(time.perf_counter() - started_wall)
+
+    if errors:
+        raise errors[0]
+    return timings
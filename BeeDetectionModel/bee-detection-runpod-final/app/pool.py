@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Multi-process CPU inference pool.
+
+Each worker is a separate Python process running this file, holding its own
+fused model and a fixed PyTorch thread budget, so several videos are tracked
+at once instead of one process leaving cores idle on single-frame batches.
+Workers never import main.py; they talk to the parent over JSON lines on
+stdin/stdout and only track local files, so downloads, uploads and results
+stay in the parent.
+
+Pick a processes x threads split for this host:
+    python pool.py sweep --videos /data/sample_videos --cores 8
+"""
+import os
+import sys
+import json
+import base64
+import time
+import queue
+import argparse
+import threading
+import logging
+import subprocess
+from resources import current_rss, memory_limit
+
+logger = logging.getLogger(__name__)
+
+# Assumed resident memory of one worker (model, decoder and tracker state) when sizing the pool
+WORKER_MEMORY_MB = int(os.getenv('POOL_WORKER_MEMORY_MB', '1024'))
+
+
+def fit_processes(requested, threads, worker_bytes=WORKER_MEMORY_MB << 20, reserve_bytes=None):
+    """Number of workers that fit the host's cores and the container memory limit.
+
+    ``requested`` of 0 means as many as the cores allow at ``threads`` each. The
+    parent's own RSS is reserved before dividing the remaining memory.
+    """
+    by_cpu = max(1, (os.cpu_count() or 1) // max(1, threads))
+    processes = requested or by_cpu
+    limit = memory_limit()
+    if limit:
+        reserve = current_rss() if reserve_bytes is None else reserve_bytes
+        by_memory = max(1, (limit - reserve) // worker_bytes)
+        if by_memory < processes:
+            logger.warning("Memory limit %.0f MiB fits only %d of %d workers", limit / 2**20, by_memory, processes)
+            processes = by_memory
+    return int(processes)
+
+
+class PoolWorker:
+    """One worker process and its JSON-lines channel."""
+
+    def __init__(self, index, threads, settings):
+        self.index = index
+        env = dict(os.environ, OMP_NUM_THREADS=str(threads), MKL_NUM_THREADS=str(threads))
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "worker", "--threads", str(threads),
+             "--settings", json.dumps(settings)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1, env=env,
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    def wait_ready(self):
+        line = self.process.stdout.readline()
+        if not line:
+            raise RuntimeError(f"Pool worker {self.index} exited during start-up (code {self.process.wait()})")
+        return json.loads(line)
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def run(self, task):
+        """Send one task and wait for its reply; a dead worker yields an error reply."""
+        try:
+            self.process.stdin.write(json.dumps(task) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except (BrokenPipeError, ValueError):
+            line = ""
+        if not line:
+            return {"video": task["video"], "error": f"pool worker {self.index} exited"}
+        return json.loads(line)
+
+    def close(self, timeout=30):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class WorkerPool:
+    """Fixed set of worker processes pulling tasks from one shared queue.
+
+    ``settings`` is the tracking configuration every worker loads once:
+    model_path, backend, calib, imgsz, sampling, tracker, tracker_overrides, motion, roi and decode.
+    """
+
+    def __init__(self, processes, threads, settings):
+        self.threads = threads
+        self.settings = settings
+        self.workers = [PoolWorker(i, threads, settings) for i in range(processes)]
+        try:
+            for worker in self.workers:
+                worker.wait_ready()
+        except Exception:
+            self.close()
+            raise
+        logger.info("Worker pool ready: %d processes x %d threads", processes, threads)
+
+    def __len__(self):
+        return len(self.workers)
+
+    @property
+    def alive(self):
+        return all(worker.alive for worker in self.workers)
+
+    def map(self, tasks):
+        """Run {"video", "path"} tasks, yielding worker replies as they finish.
+
+        ``tasks`` is consumed lazily by a feeder thread, so it may block (e.g.
+        to bound how many videos are downloaded ahead). An exception raised
+        while producing tasks is re-raised here.
+        """
+        todo = queue.Queue(maxsize=len(self.workers))
+        done = queue.Queue()
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    todo.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def feed():
+            iterator = iter(tasks)
+            try:
+                for task in iterator:
+                    if not put(task):
+                        # Let a generator clean up the task it just produced
+                        getattr(iterator, "close", lambda: None)()
+                        return
+            except Exception as e:
+                done.put(("error", e))
+            finally:
+                for _ in self.workers:
+                    put(None)
+
+        def drive(worker):
+            try:
+                while (task := todo.get()) is not None:
+                    if not stop.is_set():
+                        done.put(("reply", worker.run(task)))
+            finally:
+                done.put(("exit", None))
+
+        feeder = threading.Thread(target=feed, name="pool-feed", daemon=True)
+        drivers = [threading.Thread(target=drive, args=(worker,), name=f"pool-drive-{worker.index}", daemon=True)
+                   for worker in self.workers]
+        feeder.start()
+        for thread in drivers:
+            thread.start()
+        running = len(self.workers)
+        try:
+            while running:
+                kind, value = done.get()
+                if kind == "exit":
+                    running -= 1
+                elif kind == "error":
+                    raise value
+                else:
+                    yield value
+        finally:
+            # Workers finish their current video and queued tasks are dropped. The feeder
+            # may be blocked inside ``tasks`` and is not waited for; it stops at its next put.
+            stop.set()
+            for _ in drivers:
+                todo.put(None)
+            for thread in drivers:
+                thread.join()
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+
+def worker_main(args):
+    """Worker process: load the model once, then track one local video per stdin line."""
+    # Keep stdout for replies; anything else printing to stdout goes to stderr
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - %(levelname)s - [worker {os.getpid()}] %(message)s')
+
+    from batching import set_torch_threads
+    from backends import load_model, parse_backend
+    from decode import DecodeConfig
+    from motion import MotionGate
+    from resources import PeakMonitor
+    from roi import load_roi_config
+    from tracking import FrameSampler, count_bees, load_tracker_args
+    from traffic import to_npy_bytes
+
+    settings = json.loads(args.settings)
+    set_torch_threads(args.threads)
+    backend, int8 = parse_backend(settings.get("backend", "torch"))
+    model = load_model(settings["model_path"], backend, int8, imgsz=settings.get("imgsz", 640),
+                       calib=settings.get("calib"))
+    tracker_args = load_tracker_args(settings.get("tracker", "botsort.yaml"), settings.get("tracker_overrides"))
+    roi_config = load_roi_config(settings.get("roi"))
+    replies.write(json.dumps({"ready": os.getpid()}) + "\n")
+
+    for line in sys.stdin:
+        task = json.loads(line)
+        try:
+            roi = roi_config.for_video(task["video"]) if roi_config else None
+            with PeakMonitor() as monitor:
+                bee_ids, stats = count_bees(model, task["path"], FrameSampler.from_spec(settings.get("sampling")),
+                                            tracker_args, MotionGate.from_spec(settings.get("motion")), roi,
+                                            settings.get("imgsz", 640),
+                                            decode=DecodeConfig.from_spec(settings.get("decode")))
+            # The traffic series travels as base64 .npy bytes
+            stats["traffic"] = base64.b64encode(to_npy_bytes(stats["traffic"])).decode()
+            reply = {"video": task["video"], "bee_ids": sorted(bee_ids), "stats": stats,
+                     "peak_rss": monitor.peak_rss, "pid": os.getpid()}
+        except Exception as e:
+            logger.error("Failed on %s: %s", task["video"], str(e))
+            reply = {"video": task["video"], "error": str(e)}
+        replies.write(json.dumps(reply) + "\n")
+
+
+def sweep(args):
+    """Time every processes x threads split that uses at most --cores cores on the sample videos."""
+    from calibrate import collect_videos
+
+    videos = collect_videos(args.videos)
+    if not videos:
+        logger.error("No sample videos found")
+        sys.exit(1)
+    settings = {"model_path": args.model, "backend": args.backend, "imgsz": args.imgsz, "sampling": args.sampling,
+                "tracker": args.tracker, "tracker_overrides": args.tracker_overrides, "motion": args.motion, "roi": args.roi, "decode": args.decode}
+    splits = [(p, args.cores // p) for p in range(1, args.cores + 1) if args.cores % p == 0]
+    results = []
+    for processes, threads in splits:
+        fitted = fit_processes(processes, threads)
+        if fitted < processes:
+            logger.info("Skipping %dx%d: does not fit in memory", processes, threads)
+            continue
+        pool = WorkerPool(processes, threads, settings)
+        try:
+            frames = 0
+            started = time.perf_counter()
+            for reply in pool.map({"video": os.path.basename(v), "path": v} for v in videos):
+                if "error" in reply:
+                    raise RuntimeError(f"{reply['video']}: {reply['error']}")
+                frames += reply["stats"]["frames_total"]
+            seconds = time.perf_counter() - started
+        finally:
+            pool.close()
+        results.append({"processes": processes, "threads": threads, "seconds": round(seconds, 2),
+                        "fps": round(frames / seconds, 2), "videos_per_minute": round(60 * len(videos) / seconds, 2)})
+        logger.info("%dx%d: %.2f fps", processes, threads, frames / seconds)
+
+    print(f"{'processes':>10}{'threads':>9}{'seconds':>10}{'fps':>10}{'videos/min':>12}")
+    for r in results:
+        print(f"{r['processes']:>10}{r['threads']:>9}{r['seconds']:>10}{r['fps']:>10}{r['videos_per_minute']:>12}")
+    if results:
+        best = max(results, key=lambda r: r["fps"])
+        print(f"best: POOL_PROCESSES={best['processes']} POOL_THREADS={best['threads']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-process inference pool')
+    commands = parser.add_subparsers(dest='command', required=True)
+    worker_parser = commands.add_parser('worker', help='Run as a pool worker (started by WorkerPool)')
+    worker_parser.add_argument('--threads', type=int, default=1)
+    worker_parser.add_argument('--settings', required=True, help='Tracking settings as JSON')
+    sweep_parser = commands.add_parser('sweep', help='Find the fastest processes x threads split')
+    sweep_parser.add_argument('--videos', nargs='+', required=True, help='Sample video files or directories')
+    sweep_parser.add_argument('--cores', type=int, default=os.cpu_count(), help='Cores to divide between workers')
+    sweep_parser.add_argument('--model', default=os.getenv('MODEL_PATH', '/app/best.pt'), help='YOLO weights')
+    sweep_parser.add_argument('--backend', default=os.getenv('MODEL_BACKEND', 'torch'), help='Inference backend')
+    sweep_parser.add_argument('--imgsz', type=int, default=int(os.getenv('INFER_IMGSZ', '640')))
+    sweep_parser.add_argument('--sampling', default=os.getenv('TRACK_SAMPLING', 'all'))
+    sweep_parser.add_argument('--tracker', default=os.getenv('TRACKER_CONFIG', 'botsort.yaml'))
+    sweep_parser.add_argument('--tracker-overrides', default=os.getenv('TRACKER_OVERRIDES', ''))
+    sweep_parser.add_argument('--motion', default=os.getenv('MOTION_GATE', 'off'))
+    sweep_parser.add_argument('--roi', default=os.getenv('ROI_CONFIG'))
+    sweep_parser.add_argument('--decode', default=os.getenv('DECODE_FRONTEND', 'default'))
+    sweep_parser.add_argument('--json', help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        worker_main(args)
+    else:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        sweep(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import resource
+import threading
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def current_rss():
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        # ru_maxrss is in KiB on Linux; only the peak is available without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakMonitor:
+    """Samples process RSS in the background and keeps the peak.
+
+    Use as a context manager around the work being measured. RSS is process-wide,
+    so work overlapping in other threads is included.
+    """
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        self.peak_rss = max(self.peak_rss, current_rss())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name="peak-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+def memory_limit():
+    """Memory available to this container in bytes: the cgroup limit if one is set, else physical memory."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # cgroup v2 reports "max" and v1 a huge number when unlimited
+        if value != "max" and int(value) < 1 << 60:
+            return int(value)
+    with open("/proc/meminfo") as f:
+        for line in f:
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) * 1024
+    return None
@@ -0,0 +1,86 @@
+import json
+import shlex
+import sqlite3
+import threading
+import hashlib
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Videos hashed per remote sha256sum call, to keep the command line short
+DIGEST_BATCH = 100
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """sha256 of a local file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def remote_digests(transport, paths):
+    """sha256 of remote files, computed on the hive server so nothing is downloaded.
+
+    Returns {path: digest}; files that could not be hashed are left out.
+    """
+    digests = {}
+    for i in range(0, len(paths), DIGEST_BATCH):
+        batch = paths[i:i + DIGEST_BATCH]
+        output = transport.run("sha256sum -- " + " ".join(shlex.quote(p) for p in batch) + " 2>/dev/null || true")
+        for line in output.splitlines():
+            digest, _, path = line.partition("  ")
+            if len(digest) == 64 and path:
+                digests[path] = digest
+    return digests
+
+
+class ResultCache:
+    """Persistent map from (video content digest, inference config) to a stored bee_count/bee_ids.
+
+    The config string should change whenever the weights, backend, sampling or
+    tracker change, so cached counts are only reused for identical processing.
+    """
+
+    def __init__(self, path, config):
+        self.path = path
+        self.config = config
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " digest TEXT NOT NULL, config TEXT NOT NULL, bee_count INTEGER NOT NULL, bee_ids TEXT NOT NULL,"
+            " video TEXT, created_at TEXT, PRIMARY KEY (digest, config))"
+        )
+        self._conn.commit()
+
+    def get(self, digest):
+        """Return (bee_count, bee_ids) for a digest, or None; counts hits and misses."""
+        with self._lock:
+            row = self._conn.execute("SELECT bee_count, bee_ids FROM results WHERE digest = ? AND config = ?",
+                                     (digest, self.config)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0], json.loads(row[1])
+
+    def put(self, digest, result):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                               (digest, self.config, result["bee_count"], json.dumps(result["bee_ids"]),
+                                result["video"], datetime.now().isoformat()))
+            self._conn.commit()
+
+    def log_stats(self):
+        total = self.hits + self.misses
+        logger.info("Result cache: %d hits, %d misses (%.0f%% hit rate)",
+                    self.hits, self.misses, 100.0 * self.hits / total if total else 0.0)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
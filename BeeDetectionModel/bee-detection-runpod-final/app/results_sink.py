@@ -0,0 +1,130 @@
+import os
+import csv
+import json
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ResultSink:
+    """Buffers per-video results and appends them to a remote JSONL file in batches.
+
+    Records are keyed by video name; readers should take the last record per
+    video. A flush happens every ``flush_every`` results, every
+    ``flush_interval`` seconds, and on ``close()``. Each flush remembers the
+    remote file size it started from and sends every attempt from there: the
+    complete lines that already landed are kept, any torn line is truncated
+    away and only the rest is re-sent. If every attempt fails, the next flush
+    repairs from the same offset before appending. The local CSV is only written for records the remote file has,
+    so the two stay consistent.
+    """
+
+    def __init__(self, transport, remote_path, local_csv, flush_every=20, flush_interval=60.0, on_flushed=None):
+        self.transport = transport
+        self.remote_path = remote_path
+        self.local_csv = local_csv
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.on_flushed = on_flushed
+        self.flushed = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._remote_ready = False
+        self._start = None
+        self._timer = None
+        if flush_interval and flush_interval > 0:
+            self._timer = threading.Thread(target=self._flush_periodically, name="result-sink", daemon=True)
+            self._timer.start()
+
+    def add(self, result):
+        """Buffer a result, flushing if the batch is full."""
+        with self._lock:
+            # A later result for the same video replaces the buffered one
+            self._pending[result["video"]] = result
+            full = len(self._pending) >= self.flush_every
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Append all buffered results to the remote file and the local CSV."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            records = list(self._pending.values())
+            self._append(records)
+            self._write_csv(records)
+            self._pending.clear()
+            self.flushed += len(records)
+        logger.info("Flushed %d results to %s", len(records), self.remote_path)
+        if self.on_flushed:
+            self.on_flushed(records)
+        return len(records)
+
+    def close(self):
+        """Stop the periodic flush and write out anything still buffered."""
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join()
+        self.flush()
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                # Results stay buffered and are retried on the next flush
+                logger.error("Periodic result flush failed: %s", str(e))
+
+    def _append(self, records):
+        if not self._remote_ready:
+            self.transport.makedirs(os.path.dirname(self.remote_path))
+            self._remote_ready = True
+        if self._start is None:
+            self._start = self.transport.size(self.remote_path)
+            remaining = records
+        else:
+            # An earlier flush failed part-way; pick up from where it started
+            remaining = self._repair(records)
+        attempts = self.transport.retries
+        for attempt in range(1, attempts + 1):
+            if not remaining:
+                break
+            try:
+                # One try only: the transport's own retry would resend after a torn tail
+                self.transport.append(_encode(remaining), self.remote_path, retry=False)
+                break
+            except Exception as e:
+                if attempt == attempts:
+                    raise
+                logger.warning("Append to %s failed (attempt %d/%d: %s); repairing and retrying",
+                               self.remote_path, attempt, attempts, str(e))
+                time.sleep(self.transport.retry_delay * attempt)
+                remaining = self._repair(records)
+        self._start = None
+
+    def _repair(self, records):
+        """Drop any torn line after the flush's start offset and return the records still to send."""
+        try:
+            landed = self.transport.read_from(self.remote_path, self._start)
+        except FileNotFoundError:
+            return records
+        complete = landed[:landed.rfind(b"\n") + 1]
+        if len(complete) != len(landed):
+            self.transport.truncate(self.remote_path, self._start + len(complete))
+        done = set(complete.splitlines())
+        return [record for record in records if json.dumps(record).encode() not in done]
+
+    def _write_csv(self, records):
+        os.makedirs(os.path.dirname(self.local_csv), exist_ok=True)
+        with open(self.local_csv, "a") as f:
+            writer = csv.writer(f)
+            for result in records:
+                writer.writerow([result["video"], result["timestamp"], result["bee_count"],
+                                 ",".join(map(str, result["bee_ids"]))])
+
+
+def _encode(records):
+    return "".join(json.dumps(record) + "\n" for record in records).encode()
@@ -0,0 +1,96 @@
+import os
+import json
+import cv2
+import numpy as np
+
+
+class Roi:
+    """Hive entrance region: frames are cropped to its bounding box and detections outside it are dropped."""
+
+    def __init__(self, points, rect=False, line=0.5):
+        self.points = np.array(points, dtype=np.int32).reshape(-1, 2)
+        if len(self.points) < 3 and not rect:
+            raise ValueError("An ROI polygon needs at least 3 points")
+        self.x1, self.y1 = (int(v) for v in self.points.min(axis=0))
+        self.x2, self.y2 = (int(v) + 1 for v in self.points.max(axis=0))
+        self.rect = rect
+        self.line = line
+        self._mask = None
+        if not rect:
+            self._mask = np.zeros((self.y2 - self.y1, self.x2 - self.x1), dtype=np.uint8)
+            cv2.fillPoly(self._mask, [self.points - (self.x1, self.y1)], 1)
+
+    @classmethod
+    def from_dict(cls, entry):
+        """Build from {"rect": [x1, y1, x2, y2]} or {"polygon": [[x, y], ...]} in source pixels.
+
+        An optional "line" gives the entrance line used for crossing counts, as a
+        fraction of the cropped height (default 0.5).
+        """
+        line = float(entry.get("line", 0.5))
+        if "rect" in entry:
+            x1, y1, x2, y2 = entry["rect"]
+            if x2 <= x1 or y2 <= y1:
+                raise ValueError(f"Invalid ROI rect: {entry['rect']}")
+            return cls([(x1, y1), (x2 - 1, y2 - 1)], rect=True, line=line)
+        if "polygon" in entry:
+            return cls(entry["polygon"], line=line)
+        raise ValueError("An ROI entry needs a 'rect' or a 'polygon'")
+
+    def scaled(self, factor):
+        """The same ROI for frames decoded at ``factor`` times the source resolution."""
+        if factor == 1:
+            return self
+        if self.rect:
+            return Roi([(self.x1 * factor, self.y1 * factor), ((self.x2 - 1) * factor, (self.y2 - 1) * factor)],
+                       rect=True, line=self.line)
+        return Roi(self.points * factor, line=self.line)
+
+    def crop(self, frame):
+        """Return the ROI's bounding box of a frame as a view (no copy)."""
+        return frame[self.y1:self.y2, self.x1:self.x2]
+
+    def inside(self, xywh):
+        """Boolean mask of boxes (in cropped-frame coordinates) whose centre lies inside the ROI."""
+        if self._mask is None or not len(xywh):
+            return np.ones(len(xywh), dtype=bool)
+        h, w = self._mask.shape
+        cx = np.clip(xywh[:, 0].astype(np.int64), 0, w - 1)
+        cy = np.clip(xywh[:, 1].astype(np.int64), 0, h - 1)
+        return self._mask[cy, cx] > 0
+
+
+class RoiConfig:
+    """Per-hive entrance ROIs keyed by video-name prefix; the longest matching prefix wins.
+
+    Example JSON (an empty "" key applies to every other video):
+        {"hive12_": {"rect": [420, 300, 1500, 820], "line": 0.4},
+         "hive3_": {"polygon": [[100, 400], [1800, 380], [1820, 900], [80, 940]]}}
+    """
+
+    def __init__(self, rois):
+        self.rois = rois
+        self._prefixes = sorted(rois, key=len, reverse=True)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            config = json.load(f)
+        return cls({prefix: Roi.from_dict(entry) for prefix, entry in config.items()})
+
+    def for_video(self, name):
+        """Return the ROI for a video name or path, or None for full-frame processing."""
+        name = os.path.basename(name)
+        for prefix in self._prefixes:
+            if name.startswith(prefix):
+                return self.rois[prefix]
+        return None
+
+    def for_source(self, source):
+        """ROI for a local path or a remote stream (matched on its remote file name)."""
+        return self.for_video(source if isinstance(source, str) else getattr(source, "name", ""))
+
+
+def load_roi_config(path):
+    """Load an ROI config file, or return None when no path is configured."""
+    return RoiConfig.load(path) if path else None
@@ -0,0 +1,157 @@
+import os
+import json
+import uuid
+import queue
+import socketserver
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept for /status lookups
+MAX_FINISHED_JOBS = 1000
+
+
+class JobQueue:
+    """Runs submitted payloads one at a time on a worker thread and tracks their status."""
+
+    def __init__(self, handler, max_queued=100):
+        self.handler = handler
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="job-worker", daemon=True)
+        self.ready = False
+
+    def start(self):
+        self._worker.start()
+        self.ready = True
+
+    @property
+    def alive(self):
+        return self._worker.is_alive()
+
+    def submit(self, input_data):
+        """Queue a payload's input and return its job record; raises queue.Full when saturated."""
+        job = {"id": uuid.uuid4().hex, "status": "IN_QUEUE", "submitted": datetime.now().isoformat(),
+               "videos": len(input_data.get("videos", []))}
+        with self._lock:
+            self._queue.put_nowait((job["id"], input_data))
+            self._jobs[job["id"]] = job
+        return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def counts(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return counts
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+            finished = [jid for jid, job in self._jobs.items() if job["status"] in ("COMPLETED", "FAILED")]
+            for jid in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self._jobs[jid]
+
+    def _run(self):
+        while True:
+            job_id, input_data = self._queue.get()
+            self._update(job_id, status="IN_PROGRESS", started=datetime.now().isoformat())
+            try:
+                self.handler(input_data)
+                self._update(job_id, status="COMPLETED", finished=datetime.now().isoformat())
+            except BaseException as e:
+                # SystemExit from the payload code must not kill the worker thread
+                logger.error("Job %s failed: %s", job_id, str(e))
+                self._update(job_id, status="FAILED", error=str(e), finished=datetime.now().isoformat())
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """POST /run with {"input": {...}}; GET /status/<id>, /health and /ready."""
+
+    jobs = None
+
+    def _reply(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200 if self.jobs.alive else 503, {"status": "ok" if self.jobs.alive else "worker stopped"})
+        elif self.path == "/ready":
+            ready = self.jobs.ready and self.jobs.alive
+            self._reply(200 if ready else 503, {"ready": ready, "jobs": self.jobs.counts()})
+        elif self.path.startswith("/status/"):
+            job = self.jobs.get(self.path[len("/status/"):])
+            self._reply(200 if job else 404, job or {"error": "unknown job"})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/run":
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            input_data = payload.get("input")
+        except (ValueError, AttributeError) as e:
+            self._reply(400, {"error": f"Invalid JSON payload: {e}"})
+            return
+        if not input_data:
+            self._reply(400, {"error": "No 'input' key in payload"})
+            return
+        try:
+            job = self.jobs.submit(input_data)
+        except queue.Full:
+            self._reply(429, {"error": "job queue is full"})
+            return
+        logger.info("Queued job %s with %d videos", job["id"], job["videos"])
+        self._reply(202, job)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(handler, host="127.0.0.1", port=8000, socket_path=None, max_queued=100):
+    """Serve jobs over HTTP on host:port, or on a Unix socket if socket_path is set, until interrupted."""
+    jobs = JobQueue(handler, max_queued)
+    request_handler = type("BoundJobRequestHandler", (JobRequestHandler,), {"jobs": jobs})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        httpd = UnixHTTPServer(socket_path, request_handler)
+        logger.info("Serving jobs on unix socket %s", socket_path)
+    else:
+        httpd = ThreadingHTTPServer((host, port), request_handler)
+        logger.info("Serving jobs on http://%s:%d", host, port)
+    jobs.start()
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down job server")
+    finally:
+        httpd.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,388 @@
+import math
+from collections import deque
+import time
+import logging
+import yaml
+from ultralytics.utils import IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.trackers.bot_sort import BOTSORT
+from ultralytics.trackers.basetrack import BaseTrack
+from decode import DecodeConfig, open_capture
+from motion import MotionGate
+from traffic import TrafficSeries
+from checkpoint import restore_tracker, tracker_state
+
+logger = logging.getLogger(__name__)
+
+TRACKER_MAP = {"bytetrack": BYTETracker, "botsort": BOTSORT}
+
+# Detection confidence used by model.track(); kept so every mode feeds the tracker the same boxes
+DETECTION_CONF = 0.1
+
+# Detector input size; frames (or their ROI crop) are resized to this once by the model's letterbox
+DEFAULT_IMGSZ = 640
+
+# Never sample slower than this, even when a time budget is nearly spent
+MIN_EFFECTIVE_FPS = 0.5
+
+# Removed tracks kept by a tracker; ultralytics only needs the recent ones to prune its lost list
+MAX_REMOVED_TRACKS = 100
+
+
+class FrameSampler:
+    """Decides which decoded frames are sent to the detector and tracker.
+
+    Modes:
+      all           every frame (full-rate reference)
+      stride:K      every K-th frame
+      fps:F         every frame needed for an effective rate of F frames/second
+      budget:S      adapt the stride so a video finishes in about S seconds of wall time
+    """
+
+    MODES = ("all", "stride", "fps", "budget")
+
+    def __init__(self, mode="all", value=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown sampling mode: {mode}. Use one of {', '.join(self.MODES)}")
+        if mode != "all" and (value is None or float(value) <= 0):
+            raise ValueError(f"Sampling mode '{mode}' needs a positive value")
+        self.mode = mode
+        self.value = float(value) if value is not None else None
+        self.stride = 1
+        self.source_fps = 30.0
+        self.total_frames = 0
+        self.max_stride = 1
+        self._started = None
+        self._processed = 0
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Build a sampler from a 'mode[:value]' string such as 'stride:3' or 'budget:60'."""
+        spec = (spec or "all").strip()
+        mode, _, value = spec.partition(":")
+        return cls(mode, value or None)
+
+    @property
+    def spec(self):
+        if self.mode == "all":
+            return "all"
+        return f"{self.mode}:{self.value:g}"
+
+    def start(self, source_fps, total_frames):
+        """Reset for a new video and return the initial stride."""
+        self.source_fps = source_fps if source_fps and source_fps > 0 else 30.0
+        self.total_frames = max(int(total_frames or 0), 0)
+        self.max_stride = max(1, int(self.source_fps / MIN_EFFECTIVE_FPS))
+        self._started = time.perf_counter()
+        self._processed = 0
+        if self.mode == "stride":
+            self.stride = max(1, int(self.value))
+        elif self.mode == "fps":
+            self.stride = max(1, round(self.source_fps / self.value))
+        else:
+            self.stride = 1
+        return self.stride
+
+    @property
+    def effective_fps(self):
+        return self.source_fps / self.stride
+
+    def keep(self, index):
+        return index % self.stride == 0
+
+    def observe(self, index):
+        """Record that frame ``index`` was processed; returns True if the stride changed."""
+        self._processed += 1
+        if self.mode != "budget" or not self.total_frames:
+            return False
+        elapsed = time.perf_counter() - self._started
+        per_frame = elapsed / self._processed
+        remaining_frames = self.total_frames - index - 1
+        remaining_budget = self.value - elapsed
+        if remaining_frames <= 0:
+            return False
+        if remaining_budget <= 0:
+            stride = self.max_stride
+        else:
+            stride = math.ceil(remaining_frames * per_frame / remaining_budget)
+        stride = min(max(stride, 1), self.max_stride)
+        if stride != self.stride:
+            self.stride = stride
+            return True
+        return False
+
+
+def parse_overrides(spec):
+    """Parse 'key=value,...' tracker overrides; values are read as YAML scalars."""
+    overrides = {}
+    for item in filter(None, (spec or "").split(",")):
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid tracker override '{item}', expected key=value")
+        overrides[key.strip()] = yaml.safe_load(value)
+    return overrides
+
+
+def load_tracker_args(tracker_cfg, overrides=None):
+    """Load an ultralytics tracker YAML (e.g. 'botsort.yaml') into a namespace.
+
+    ``overrides`` ('key=value,...' or a dict) replaces YAML settings, e.g.
+    'track_buffer=60,match_thresh=0.8'. The extra key ``max_lost_seconds``
+    fixes how long a lost track is kept regardless of frame rate and stride;
+    without it a lost track is kept for ``track_buffer`` source frames, as
+    ``model.track`` does at its default 30 fps, whatever the video's frame rate.
+    """
+    with open(check_yaml(tracker_cfg), errors="ignore") as f:
+        config = yaml.safe_load(f)
+    config.update(overrides if isinstance(overrides, dict) else parse_overrides(overrides))
+    args = IterableSimpleNamespace(**config)
+    if args.tracker_type not in TRACKER_MAP:
+        raise ValueError(f"Only 'bytetrack' and 'botsort' are supported, got '{args.tracker_type}'")
+    return args
+
+
+def make_tracker(tracker_args, frame_rate):
+    """Create a fresh tracker tuned for the rate frames will actually arrive at."""
+    args = IterableSimpleNamespace(**vars(tracker_args))
+    tracker = TRACKER_MAP[args.tracker_type](args=args, frame_rate=max(1, round(frame_rate)))
+    tracker.base_match_thresh = tracker_args.match_thresh
+    return tracker
+
+
+def tune_tracker(tracker, source_fps, stride):
+    """Adapt a tracker to a new sampling stride.
+
+    Lost tracks are kept for the same stretch of video regardless of stride, and
+    the IoU matching threshold is loosened because bees move further between
+    sampled frames. At stride 1 without ``max_lost_seconds`` this is what
+    ``model.track`` did before sampling existed.
+    """
+    max_lost_seconds = tracker.args.get("max_lost_seconds")
+    if max_lost_seconds is not None:
+        tracker.max_time_lost = max(1, int(source_fps / stride * float(max_lost_seconds)))
+    else:
+        # model.track runs the tracker at frame_rate=30, so track_buffer counts source frames
+        tracker.max_time_lost = max(1, int(tracker.args.track_buffer / stride))
+    tracker.args.match_thresh = min(0.95, tracker.base_match_thresh + 0.05 * math.log2(stride))
+
+
+class VideoTracker:
+    """Decode, sampling and tracker state for one video (a local path or a remote stream).
+
+    Frames are pulled with ``next_frame()`` and the detector output for each is
+    handed back through ``update()``, so callers decide how frames are batched.
+    Skipped frames are grabbed but not retrieved: grab() still decodes them,
+    so a larger stride saves the colour conversion and copy of each skipped
+    frame and its inference, not its decode.
+    Sampled frames rejected by the motion gate are decoded but never reach the
+    detector or the tracker. With an ROI, frames are cropped to the entrance
+    before the gate and the detector, and detections whose centre falls
+    outside the entrance polygon are dropped before tracking.
+
+    Each update is also folded into a per-second TrafficSeries; detector
+    results are not kept once the tracker has consumed them.
+
+    With a threaded DecodeConfig, frames are decoded ahead on a background
+    thread into a ring of preallocated arrays (see decode.ThreadedCapture);
+    each frame's slot goes back to the ring once the tracker has used it.
+
+    Every video gets its own tracker and its own track-ID sequence starting at
+    1, even when several videos are tracked together, and the tracker is
+    released as soon as the video's last frame has been tracked, so nothing
+    carries over from one video to the next.
+    """
+
+    def __init__(self, source, sampler=None, tracker_args=None, gate=None, roi=None, decode=None):
+        self.source = source
+        self.sampler = sampler or FrameSampler()
+        self.gate = gate or MotionGate()
+        self.decode = decode or DecodeConfig()
+        self.rejected = 0
+        self.cap = open_capture(source, self.decode, self.sampler)
+        self.threaded = self.decode.threaded
+        # ROIs are in source pixels; match a reduced decode resolution
+        self.roi = roi.scaled(self.cap.scale) if roi is not None and self.threaded else roi
+        self.sampler.start(self.cap.fps, self.cap.frame_count)
+        self.tracker = make_tracker(tracker_args or load_tracker_args("botsort.yaml"), self.sampler.effective_fps)
+        tune_tracker(self.tracker, self.sampler.source_fps, self.sampler.stride)
+        # ultralytics numbers tracks from a class-wide counter; keep one per video instead
+        self._next_id = 0
+        self.bee_ids = set()
+        self.traffic = TrafficSeries(self.sampler.source_fps, self.cap.frame_count, roi.line if roi else 0.5)
+        self._recycle = self.cap.recycle if self.threaded else None
+        self.index = 0
+        self.processed = 0
+        self.started = time.perf_counter()
+        self.decode_s = 0.0
+        self.infer_s = 0.0
+        self.track_s = 0.0
+        self._pending = deque()
+
+    def next_frame(self):
+        """Return the next frame to run the detector on, or None at the end of the video."""
+        if self.cap is None:
+            return None
+        started = time.perf_counter()
+        try:
+            if self.threaded:
+                return self._next_decoded()
+            while self.cap.grab():
+                index = self.index
+                self.index += 1
+                if self.sampler.keep(index):
+                    ok, frame = self.cap.retrieve()
+                    if not ok:
+                        break
+                    if self.roi is not None:
+                        frame = self.roi.crop(frame)
+                    if not self.gate.keep(frame):
+                        continue
+                    self._pending.append(index)
+                    return frame
+            self.close()
+            return None
+        finally:
+            self.decode_s += time.perf_counter() - started
+
+    def _next_decoded(self):
+        """next_frame() for a ThreadedCapture; decode_s is then the time spent waiting for frames."""
+        while True:
+            index, slot, frame = self.cap.read()
+            if frame is None:
+                self.index = max(self.index, self.cap.frames)
+                self.close()
+                return None
+            self.index = index + 1
+            if self.roi is not None:
+                frame = self.roi.crop(frame)
+            if not self.gate.keep(frame):
+                self._recycle(slot)
+                continue
+            self._pending.append((index, slot))
+            return frame
+
+    def update(self, result, frame):
+        """Feed the detector result for the oldest frame returned by next_frame() and not yet updated."""
+        started = time.perf_counter()
+        index, slot = self._pending.popleft() if self.threaded else (self._pending.popleft(), None)
+        boxes = result.boxes.cpu().numpy()
+        if self.roi is not None:
+            inside = self.roi.inside(boxes.xywh)
+            self.rejected += int(len(inside) - inside.sum())
+            boxes = boxes[inside]
+        BaseTrack._count = self._next_id
+        tracks = self.tracker.update(boxes, frame)
+        self._next_id = BaseTrack._count
+        removed = self.tracker.removed_stracks
+        if len(removed) > MAX_REMOVED_TRACKS:
+            del removed[:-MAX_REMOVED_TRACKS]
+        ids = {int(track_id) for track_id in tracks[:, 4]} if len(tracks) else set()
+        new_ids = len(ids - self.bee_ids)
+        self.bee_ids.update(ids)
+        self.traffic.add(index, tracks, new_ids, frame.shape[0])
+        if slot is not None:
+            self._recycle(slot)
+        self.track_s += time.perf_counter() - started
+        self.processed += 1
+        if self.sampler.observe(index):
+            tune_tracker(self.tracker, self.sampler.source_fps, self.sampler.stride)
+        if self.done:
+            self._release_tracker()
+
+    def state(self):
+        """Everything needed to continue tracking from the next frame; call only between updates."""
+        if self._pending:
+            raise RuntimeError("Cannot checkpoint while frames are awaiting update()")
+        return {"index": self.index, "processed": self.processed, "rejected": self.rejected,
+                "bee_ids": self.bee_ids, "stride": self.sampler.stride, "sampler_processed": self.sampler._processed,
+                "gate": self.gate, "traffic": self.traffic, "tracker": tracker_state(self.tracker),
+                "next_id": self._next_id, "timings": (self.decode_s, self.infer_s, self.track_s)}
+
+    def restore(self, state):
+        """Continue from a state(): seek the capture and load the tracker, IDs and series."""
+        self.cap.seek(state["index"])
+        self.index = state["index"]
+        self.processed = state["processed"]
+        self.rejected = state["rejected"]
+        self.bee_ids = state["bee_ids"]
+        self.sampler.stride = state["stride"]
+        self.sampler._processed = state["sampler_processed"]
+        self.gate = state["gate"]
+        self.traffic = state["traffic"]
+        restore_tracker(self.tracker, state["tracker"])
+        self._next_id = state["next_id"]
+        self.decode_s, self.infer_s, self.track_s = state["timings"]
+
+    @property
+    def done(self):
+        """True once the video is fully decoded and every returned frame has been updated."""
+        return self.cap is None and not self._pending
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        if not self._pending:
+            self._release_tracker()
+
+    def _release_tracker(self):
+        """Drop the tracker and its track lists once no frame is left to update."""
+        if self.tracker is not None:
+            self.tracker.reset()
+            self.tracker = None
+
+    def stats(self):
+        per_frame = 1000.0 / self.processed if self.processed else 0.0
+        return {
+            "sampling": self.sampler.spec,
+            "decode": self.decode.spec,
+            "motion_gate": self.gate.spec,
+            "frames_motion_skipped": self.gate.skipped,
+            "motion_skip_ratio": round(self.gate.skip_ratio, 4),
+            "motion_s": round(self.gate.seconds, 3),
+            "roi": self.roi is not None,
+            "detections_outside_roi": self.rejected,
+            "frames_total": self.index,
+            "frames_processed": self.processed,
+            "final_stride": self.sampler.stride,
+            "tracks_started": self._next_id,
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "decode_s": round(self.decode_s, 3),
+            "infer_s": round(self.infer_s, 3),
+            "track_s": round(self.track_s, 3),
+            "infer_ms_per_frame": round(self.infer_s * per_frame, 2),
+            "track_ms_per_frame": round(self.track_s * per_frame, 2),
+            "traffic": self.traffic.series,
+        }
+
+
+def count_bees(model, source, sampler=None, tracker_args=None, gate=None, roi=None, imgsz=DEFAULT_IMGSZ,
+               checkpoint=None, decode=None):
+    """Track bees in a video one frame at a time and return (bee_ids, stats).
+
+    With a VideoCheckpoint, tracking resumes from a saved checkpoint and the
+    state is saved whenever one is due; the checkpoint is removed on success.
+    """
+    video = VideoTracker(source, sampler, tracker_args, gate, roi, decode)
+    try:
+        saved = checkpoint.load() if checkpoint is not None else None
+        if saved is not None:
+            video.restore(saved)
+        while (frame := video.next_frame()) is not None:
+            started = time.perf_counter()
+            result = model.predict(frame, conf=DETECTION_CONF, imgsz=imgsz, verbose=False)[0]
+            video.infer_s += time.perf_counter() - started
+            video.update(result, frame)
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save(video.state())
+    finally:
+        video.close()
+    stats = video.stats()
+    if checkpoint is not None:
+        checkpoint.clear()
+        stats.update(checkpoint.stats())
+    logger.info("Tracked %s: %d/%d frames in %.2fs (sampling=%s, final stride=%d, motion skipped %.0f%%)",
+                source, stats["frames_processed"], stats["frames_total"], stats["seconds"],
+                stats["sampling"], stats["final_stride"], 100 * stats["motion_skip_ratio"])
+    return video.bee_ids, stats
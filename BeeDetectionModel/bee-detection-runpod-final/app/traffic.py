@@ -0,0 +1,78 @@
+import io
+import math
+import numpy as np
+
+# One row per second of video; 8 bytes per row
+SERIES_DTYPE = np.dtype([("active", "<u2"), ("new_ids", "<u2"), ("crossings_in", "<u2"), ("crossings_out", "<u2")])
+
+# Tracks unseen for this many seconds are dropped from the crossing state
+FORGET_SECONDS = 10
+
+
+class TrafficSeries:
+    """Per-second bee traffic built incrementally from tracker output.
+
+    Columns: ``active`` (most bees tracked at once during the second),
+    ``new_ids`` (track IDs first seen), ``crossings_in`` / ``crossings_out``
+    (track centres crossing the entrance line downwards / upwards). The line is
+    horizontal at ``line`` times the frame height of the (ROI-cropped) frame.
+
+    Rows are preallocated from the container's duration and only the last
+    position of recently seen tracks is kept, so memory does not grow with the
+    number of frames.
+    """
+
+    def __init__(self, source_fps, total_frames, line=0.5):
+        self.source_fps = source_fps if source_fps and source_fps > 0 else 30.0
+        seconds = math.ceil(total_frames / self.source_fps) + 1 if total_frames else 60
+        self.rows = np.zeros(seconds, dtype=SERIES_DTYPE)
+        self.line = line
+        self.length = 0
+        self._last = {}
+        self._pruned = 0
+
+    def _row(self, second):
+        if second >= len(self.rows):
+            # Streams may not report a frame count; grow geometrically
+            grown = np.zeros(max(second + 1, 2 * len(self.rows)), dtype=SERIES_DTYPE)
+            grown[:len(self.rows)] = self.rows
+            self.rows = grown
+        self.length = max(self.length, second + 1)
+        return self.rows[second]
+
+    def add(self, index, tracks, new_ids, frame_height):
+        """Fold the tracks of frame ``index`` into its second; ``tracks`` rows are x1, y1, x2, y2, id, ..."""
+        second = int(index / self.source_fps)
+        row = self._row(second)
+        row["active"] = max(int(row["active"]), len(tracks))
+        row["new_ids"] += new_ids
+        line_y = self.line * frame_height
+        for track in tracks:
+            track_id = int(track[4])
+            below = (track[1] + track[3]) / 2 >= line_y
+            previous = self._last.get(track_id)
+            if previous is not None and previous[0] != below:
+                if below:
+                    row["crossings_in"] += 1
+                else:
+                    row["crossings_out"] += 1
+            self._last[track_id] = (below, second)
+        # Sampling and the motion gate skip frames, so prune whenever a new second starts
+        if second > self._pruned:
+            self._last = {k: v for k, v in self._last.items() if second - v[1] <= FORGET_SECONDS}
+            self._pruned = second
+
+    @property
+    def series(self):
+        return self.rows[:self.length]
+
+
+def to_npy_bytes(series):
+    """Serialize a series as a .npy file (structured array, one named column per field)."""
+    buffer = io.BytesIO()
+    np.save(buffer, series, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def from_npy_bytes(data):
+    return np.load(io.BytesIO(data), allow_pickle=False)
@@ -0,0 +1,448 @@
+import io
+import os
+import shutil
+import socket
+import stat
+import subprocess
+import threading
+import time
+import logging
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the connection dropped, so the operation is retried on a fresh channel. Other I/O errors
+# (a full disk, a missing file, an SFTP "Failure") would fail again and are raised straight away.
+RECONNECT_ERRORS = (paramiko.SSHException, EOFError, ConnectionError, socket.timeout)
+
+
+class SSHTransport:
+    """One authenticated SSH session shared by downloads, uploads and remote commands.
+
+    The session is opened lazily and kept for the whole payload. Each thread gets
+    its own SFTP channel on top of the shared session, so the pipeline stages can
+    transfer concurrently. Operations that lose the connection reconnect and retry.
+    """
+
+    def __init__(self, host, user, password=None, key_path=None, timeout=10, retries=3, retry_delay=2.0):
+        self.host = host
+        self.user = user
+        self.password = password
+        self.key_path = key_path
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._client = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def connect(self):
+        """Open the SSH session if it is not already active."""
+        with self._lock:
+            if self._client is not None:
+                transport = self._client.get_transport()
+                if transport is not None and transport.is_active():
+                    return self._client
+                self._close_client()
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            started = time.perf_counter()
+            if self.key_path and os.path.exists(self.key_path):
+                logger.info("Connecting to %s with SSH key authentication", self.host)
+                client.connect(hostname=self.host, username=self.user,
+                               key_filename=self.key_path, timeout=self.timeout)
+            else:
+                logger.warning("Falling back to password-based authentication")
+                if not self.password:
+                    raise ValueError("REMOTE_PASS not set for password authentication")
+                client.connect(hostname=self.host, username=self.user,
+                               password=self.password, timeout=self.timeout)
+            # Keep idle sessions alive between videos
+            client.get_transport().set_keepalive(30)
+            self._record("connect", time.perf_counter() - started)
+            self._client = client
+            self._generation += 1
+            return client
+
+    def close(self):
+        """Close the SSH session and all SFTP channels."""
+        with self._lock:
+            self._close_client()
+
+    def _close_client(self):
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception as e:
+                logger.warning("Error closing SSH session: %s", str(e))
+            self._client = None
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _sftp(self):
+        """Return this thread's SFTP channel, opening one on the current session if needed."""
+        client = self.connect()
+        sftp = getattr(self._local, "sftp", None)
+        if sftp is None or self._local.generation != self._generation:
+            sftp = client.open_sftp()
+            self._local.sftp = sftp
+            self._local.generation = self._generation
+        return sftp
+
+    def _invalidate(self):
+        """Drop this thread's SFTP channel, and the session too if it is no longer active.
+
+        Other threads keep their channels on a live session, so their transfers are not cut off.
+        """
+        sftp = getattr(self._local, "sftp", None)
+        self._local.sftp = None
+        if sftp is not None:
+            try:
+                sftp.close()
+            except Exception as e:
+                logger.warning("Error closing SFTP channel: %s", str(e))
+        with self._lock:
+            if self._client is not None:
+                transport = self._client.get_transport()
+                if transport is None or not transport.is_active():
+                    self._close_client()
+
+    def _call(self, op, func, *args, retries=None):
+        """Run an operation, reconnecting and retrying on connection errors."""
+        retries = retries or self.retries
+        for attempt in range(1, retries + 1):
+            started = time.perf_counter()
+            try:
+                result = func(*args)
+                self._record(op, time.perf_counter() - started)
+                return result
+            except RECONNECT_ERRORS as e:
+                self._record(op, time.perf_counter() - started, error=True)
+                if attempt == retries:
+                    logger.error("%s failed after %d attempts: %s", op, attempt, str(e))
+                    # The next operation starts on a fresh channel
+                    self._invalidate()
+                    raise
+                logger.warning("%s failed (attempt %d/%d): %s; reconnecting", op, attempt, retries, str(e))
+                self._invalidate()
+                time.sleep(self.retry_delay * attempt)
+
+    def run(self, command):
+        """Execute a command on the remote server and return its stdout."""
+        logger.info("Executing SSH command: %s", command)
+        return self._call("command", self._run, command)
+
+    def _run(self, command):
+        stdin, stdout, stderr = self.connect().exec_command(command, timeout=self.timeout * 6)
+        output = stdout.read().decode()
+        error = stderr.read().decode()
+        if error:
+            logger.error("SSH command error: %s", error)
+        return output
+
+    def download(self, remote_path, local_path):
+        """Download a remote file to a local path."""
+        logger.info("Downloading from %s to %s", remote_path, local_path)
+        return self._call("download", self._download, remote_path, local_path)
+
+    def _download(self, remote_path, local_path):
+        self._sftp().get(remote_path, local_path)
+        size = os.path.getsize(local_path)
+        self._record_bytes("download", size)
+        return size
+
+    def upload(self, content, remote_path):
+        """Write string or bytes content to a remote file."""
+        logger.info("Uploading to %s", remote_path)
+        if isinstance(content, str):
+            content = content.encode()
+        return self._call("upload", self._upload, content, remote_path)
+
+    def _upload(self, content, remote_path):
+        with self._sftp().open(remote_path, "wb") as f:
+            f.write(content)
+        self._record_bytes("upload", len(content))
+        return len(content)
+
+    def append(self, content, remote_path, retry=True):
+        """Append bytes to a remote file, creating it if needed.
+
+        A failed append may already have written part of the data, so with
+        ``retry=False`` it is tried only once and the caller repairs the file
+        before sending again.
+        """
+        return self._call("append", self._append, content, remote_path, retries=None if retry else 1)
+
+    def _append(self, content, remote_path):
+        with self._sftp().open(remote_path, "ab") as f:
+            f.write(content)
+        self._record_bytes("append", len(content))
+        return len(content)
+
+    def size(self, remote_path):
+        """Size of a remote file in bytes, or 0 if it does not exist."""
+        try:
+            return self._call("stat", lambda: self._sftp().stat(remote_path).st_size)
+        except FileNotFoundError:
+            return 0
+
+    def read_from(self, remote_path, offset):
+        """Read a remote file from offset to the end."""
+        return self._call("read", self._read_from, remote_path, offset)
+
+    def _read_from(self, remote_path, offset):
+        with self._sftp().open(remote_path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        self._record_bytes("read", len(data))
+        return data
+
+    def truncate(self, remote_path, size):
+        """Truncate a remote file to size bytes."""
+        return self._call("truncate", lambda: self._sftp().truncate(remote_path, size))
+
+    def open_stream(self, remote_path, chunk_size=1 << 20, depth=8):
+        """Open a remote file for sequential reading with bounded background read-ahead."""
+        logger.info("Streaming %s (read-ahead %d x %d KiB)", remote_path, depth, chunk_size >> 10)
+        size = self._call("stat", lambda: self._sftp().stat(remote_path).st_size)
+        return ReadAheadFile(self, remote_path, size, chunk_size, depth)
+
+    def makedirs(self, remote_path):
+        """Create a remote directory and its parents (like mkdir -p)."""
+        return self._call("mkdir", self._makedirs, remote_path)
+
+    def _makedirs(self, remote_path):
+        sftp = self._sftp()
+        parts = [p for p in remote_path.split("/") if p]
+        current = "/" if remote_path.startswith("/") else ""
+        for part in parts:
+            current = os.path.join(current, part)
+            try:
+                if stat.S_ISDIR(sftp.stat(current).st_mode):
+                    continue
+            except IOError:
+                sftp.mkdir(current)
+
+    def _record(self, op, seconds, error=False):
+        with self._stats_lock:
+            entry = self._stats.setdefault(op, {"count": 0, "errors": 0, "total_s": 0.0, "max_s": 0.0, "bytes": 0})
+            entry["count"] += 1
+            entry["total_s"] += seconds
+            entry["max_s"] = max(entry["max_s"], seconds)
+            if error:
+                entry["errors"] += 1
+
+    def _record_bytes(self, op, size):
+        with self._stats_lock:
+            self._stats.setdefault(op, {"count": 0, "errors": 0, "total_s": 0.0, "max_s": 0.0, "bytes": 0})
+            self._stats[op]["bytes"] += size
+
+    def stats(self):
+        """Return per-operation latency counters (count, errors, total/mean/max seconds, bytes)."""
+        with self._stats_lock:
+            snapshot = {}
+            for op, entry in self._stats.items():
+                snapshot[op] = dict(entry)
+                snapshot[op]["mean_s"] = entry["total_s"] / entry["count"] if entry["count"] else 0.0
+            return snapshot
+
+    def log_stats(self):
+        for op, entry in sorted(self.stats().items()):
+            logger.info("Transport %s: count=%d errors=%d mean=%.3fs max=%.3fs total=%.2fs bytes=%d",
+                        op, entry["count"], entry["errors"], entry["mean_s"], entry["max_s"],
+                        entry["total_s"], entry["bytes"])
+
+
+class LocalSFTP:
+    """Local-filesystem stand-in for the paramiko SFTP calls the transport makes."""
+
+    def get(self, remote_path, local_path):
+        shutil.copyfile(remote_path, local_path)
+
+    def open(self, path, mode="r"):
+        return open(path, mode)
+
+    def stat(self, path):
+        return os.stat(path)
+
+    def truncate(self, path, size):
+        os.truncate(path, size)
+
+    def mkdir(self, path):
+        os.mkdir(path)
+
+
+class LocalTransport(SSHTransport):
+    """SSHTransport that serves "remote" paths from the local filesystem.
+
+    Stands in for the hive server in benchmarks and local runs (REMOTE_HOST=local).
+    Commands run in a local shell, and ``latency`` adds a fixed delay to every
+    operation to approximate a network round trip.
+    """
+
+    def __init__(self, latency=0.0, retries=1):
+        super().__init__("local", "local", retries=retries, retry_delay=0.0)
+        self.latency = latency
+
+    def connect(self):
+        return None
+
+    def close(self):
+        pass
+
+    def _sftp(self):
+        return LocalSFTP()
+
+    def _call(self, op, func, *args, retries=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return super()._call(op, func, *args, retries=retries)
+
+    def _run(self, command):
+        completed = subprocess.run(command, shell=True, capture_output=True, text=True)
+        if completed.stderr:
+            logger.error("Local command error: %s", completed.stderr)
+        return completed.stdout
+
+
+class ReadAheadFile(io.RawIOBase):
+    """Seekable read-only view of a remote file, fetched in chunks by a background thread.
+
+    The thread keeps up to ``depth`` chunks ahead of the read position, so the
+    decoder rarely waits on the network while memory stays bounded at roughly
+    ``(depth + 2) * chunk_size`` bytes. Seeks (e.g. to an MP4 index at the end
+    of the file) just move the read-ahead window.
+    """
+
+    def __init__(self, transport, remote_path, size, chunk_size=1 << 20, depth=8):
+        super().__init__()
+        self.transport = transport
+        self.name = remote_path
+        self.size = size
+        self.chunk_size = chunk_size
+        self.depth = max(1, depth)
+        self._pos = 0
+        self.bytes_fetched = 0
+        self.fetch_seconds = 0.0
+        self._chunks = {}
+        self._error = None
+        self._closing = False
+        self._handle = None
+        self._generation = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._fetch_loop, name="read-ahead", daemon=True)
+        self._thread.start()
+
+    def __repr__(self):
+        return f"<ReadAheadFile {self.name}>"
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        with self._cond:
+            self._pos = max(0, pos)
+            self._cond.notify_all()
+        return self._pos
+
+    def readinto(self, buffer):
+        if self._pos >= self.size:
+            return 0
+        index, offset = divmod(self._pos, self.chunk_size)
+        with self._cond:
+            self._cond.notify_all()
+            while index not in self._chunks:
+                if self._error is not None:
+                    raise self._error
+                if self._closing:
+                    raise ValueError("I/O operation on closed stream")
+                self._cond.wait()
+            chunk = self._chunks[index]
+        count = min(len(buffer), len(chunk) - offset)
+        buffer[:count] = chunk[offset:offset + count]
+        with self._cond:
+            self._pos += count
+            self._cond.notify_all()
+        return count
+
+    def close(self):
+        with self._cond:
+            self._closing = True
+            self._chunks.clear()
+            self._cond.notify_all()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+        super().close()
+
+    def _wanted(self):
+        """Next chunk to fetch inside the read-ahead window, evicting chunks that fell behind."""
+        first = self._pos // self.chunk_size
+        last = min(first + self.depth, (self.size - 1) // self.chunk_size)
+        for index in list(self._chunks):
+            if index < first - 1 or index > last:
+                del self._chunks[index]
+        for index in range(first, last + 1):
+            if index not in self._chunks:
+                return index
+        return None
+
+    def _fetch(self, index):
+        if self._handle is None or self._generation != self.transport._generation:
+            self._handle = self.transport._sftp().open(self.name, "rb")
+            self._generation = self.transport._generation
+        try:
+            self._handle.seek(index * self.chunk_size)
+            return self._handle.read(self.chunk_size)
+        except RECONNECT_ERRORS:
+            self._handle = None
+            raise
+
+    def _fetch_loop(self):
+        try:
+            while True:
+                with self._cond:
+                    while not self._closing and (index := self._wanted()) is None:
+                        self._cond.wait()
+                    if self._closing:
+                        return
+                started = time.perf_counter()
+                data = self.transport._call("stream", self._fetch, index)
+                self.fetch_seconds += time.perf_counter() - started
+                self.bytes_fetched += len(data)
+                self.transport._record_bytes("stream", len(data))
+                with self._cond:
+                    self._chunks[index] = data
+                    self._cond.notify_all()
+        except Exception as e:
+            logger.error("Read-ahead of %s failed: %s", self.name, str(e))
+            with self._cond:
+                self._error = e
+                self._cond.notify_all()
+        finally:
+            if self._handle is not None:
+                try:
+                    self._handle.close()
+                except Exception:
+                    pass
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Generate synthetic hive-entrance videos for benchmarking.
+
+Each video has a fixed textured background and bee-like ellipses crossing the
+frame, with idle stretches where nothing moves (as at a real entrance).
+
+    python make_videos.py --out /tmp/bench_videos --count 20 --seconds 30
+"""
+import os
+import argparse
+import logging
+import cv2
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def make_background(rng, width, height):
+    noise = rng.integers(60, 160, size=(height // 8, width // 8, 3), dtype=np.uint8)
+    background = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+    return cv2.GaussianBlur(background, (9, 9), 0)
+
+
+def make_bees(rng, count, frames, width, height, idle):
+    """Random straight paths; each bee is visible for part of the video outside the idle stretch."""
+    active_frames = max(1, int(frames * (1 - idle)))
+    bees = []
+    for _ in range(count):
+        start = int(rng.integers(0, active_frames))
+        duration = int(rng.integers(active_frames // 4 + 1, active_frames + 1))
+        x0, x1 = rng.uniform(0, width, size=2)
+        bees.append({"start": start, "end": min(frames, start + duration),
+                     "from": (x0, -20.0), "to": (x1, height + 20.0),
+                     "size": (int(rng.integers(10, 18)), int(rng.integers(6, 10)))})
+    return bees
+
+
+def write_video(path, rng, seconds, fps, width, height, bees, idle):
+    frames = int(seconds * fps)
+    background = make_background(rng, width, height)
+    paths = make_bees(rng, bees, frames, width, height, idle)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    try:
+        for index in range(frames):
+            frame = background.copy()
+            for bee in paths:
+                if not bee["start"] <= index < bee["end"]:
+                    continue
+                t = (index - bee["start"]) / max(1, bee["end"] - bee["start"])
+                x = bee["from"][0] + t * (bee["to"][0] - bee["from"][0])
+                y = bee["from"][1] + t * (bee["to"][1] - bee["from"][1])
+                angle = np.degrees(np.arctan2(bee["to"][1] - bee["from"][1], bee["to"][0] - bee["from"][0]))
+                cv2.ellipse(frame, (int(x), int(y)), bee["size"], angle, 0, 360, (20, 150, 210), -1)
+                cv2.ellipse(frame, (int(x), int(y)), (bee["size"][0] // 2, bee["size"][1]), angle, 0, 360,
+                            (20, 20, 20), 2)
+            writer.write(frame)
+    finally:
+        writer.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic bee videos')
+    parser.add_argument('--out', required=True, help='Output directory')
+    parser.add_argument('--count', type=int, default=10, help='Number of videos')
+    parser.add_argument('--seconds', type=float, default=30, help='Length of each video')
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--bees', type=int, default=8, help='Bees crossing per video')
+    parser.add_argument('--idle', type=float, default=0.4, help='Fraction of each video without bees')
+    parser.add_argument('--hives', type=int, default=2, help='Videos are named hiveNN_... round-robin')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    rng = np.random.default_rng(args.seed)
+    for i in range(args.count):
+        path = os.path.join(args.out, f"hive{i % args.hives:02d}_{i:04d}.mp4")
+        write_video(path, rng, args.seconds, args.fps, args.width, args.height, args.bees, args.idle)
+        logger.info("Wrote %s", path)
+
+
+if __name__ == "__main__":
+    main()
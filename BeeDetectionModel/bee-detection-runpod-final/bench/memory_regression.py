@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Check that worker memory stays flat and no tracker state leaks across a long payload.
+
+Tracks a small set of videos over and over in one process, as a worker does
+for a 1,000-video payload, recording RSS after every video. Fails (exit 1) if
+RSS after the warm-up grows by more than --max-growth-mb, or if a repeated video
+gets a different bee_count or starts a different number of tracks than on its
+first run. Unconfirmed tracks use up IDs too, so the lowest bee ID may be above
+1; a video whose ID counter did not reset would start numbering later and
+count more tracks than it did the first time.
+
+    python make_videos.py --out /tmp/bench_videos --count 5 --seconds 10
+    python memory_regression.py --videos /tmp/bench_videos --count 1000 --model /app/best.pt
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "app"))
+
+from ultralytics import YOLO  # noqa: E402
+from calibrate import collect_videos  # noqa: E402
+from decode import DecodeConfig  # noqa: E402
+from resources import current_rss  # noqa: E402
+from tracking import FrameSampler, count_bees, load_tracker_args  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# RSS is compared between windows of this many videos, to smooth allocator noise
+WINDOW = 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory and tracker-state regression over a long payload')
+    parser.add_argument('--videos', nargs='+', required=True, help='Sample video files or directories')
+    parser.add_argument('--count', type=int, default=1000, help='Videos to track (the samples are repeated)')
+    parser.add_argument('--warmup', type=int, default=50, help='Videos tracked before the RSS baseline')
+    parser.add_argument('--max-growth-mb', type=float, default=32.0, help='Allowed RSS growth after the warm-up')
+    parser.add_argument('--model', default=os.getenv('MODEL_PATH', '/app/best.pt'), help='YOLO weights')
+    parser.add_argument('--tracker', default=os.getenv('TRACKER_CONFIG', 'botsort.yaml'), help='Tracker YAML')
+    parser.add_argument('--tracker-overrides', default=os.getenv('TRACKER_OVERRIDES', ''), help='key=value,...')
+    parser.add_argument('--sampling', default=os.getenv('TRACK_SAMPLING', 'all'), help='Sampling mode')
+    parser.add_argument('--decode', default=os.getenv('DECODE_FRONTEND', 'default'), help='Decode frontend')
+    parser.add_argument('--json', help='Write the RSS series and failures to this JSON file')
+    args = parser.parse_args()
+
+    videos = collect_videos(args.videos)
+    if not videos:
+        logger.error("No sample videos found")
+        sys.exit(1)
+    if args.count < args.warmup + 2 * WINDOW:
+        logger.error("--count must be at least --warmup + %d", 2 * WINDOW)
+        sys.exit(1)
+    model = YOLO(args.model)
+    model.fuse()
+    tracker_args = load_tracker_args(args.tracker, args.tracker_overrides)
+
+    counts = {}
+    rss = []
+    failures = []
+    started = time.perf_counter()
+    for i in range(args.count):
+        video = videos[i % len(videos)]
+        bee_ids, stats = count_bees(model, video, FrameSampler.from_spec(args.sampling), tracker_args,
+                                    decode=DecodeConfig.from_spec(args.decode))
+        # IDs are handed out from 1 up to the number of tracks started in this video
+        if bee_ids and max(bee_ids) > stats["tracks_started"]:
+            failures.append(f"video {i} ({video}): track ID {max(bee_ids)} above the {stats['tracks_started']} "
+                            "tracks started, so the ID counter did not reset")
+        expected = counts.setdefault(video, (len(bee_ids), stats["tracks_started"]))
+        if (len(bee_ids), stats["tracks_started"]) != expected:
+            failures.append(f"video {i} ({video}): bee_count {len(bee_ids)} and {stats['tracks_started']} tracks "
+                            f"started, first run gave {expected[0]} and {expected[1]}")
+        rss.append(current_rss())
+        if (i + 1) % 100 == 0:
+            logger.info("%d/%d videos, RSS %.1f MiB", i + 1, args.count, rss[-1] / 2**20)
+
+    baseline = statistics.median(rss[args.warmup:args.warmup + WINDOW])
+    final = statistics.median(rss[-WINDOW:])
+    growth_mb = (final - baseline) / 2**20
+    if growth_mb > args.max_growth_mb:
+        failures.append(f"RSS grew {growth_mb:.1f} MiB after the warm-up (limit {args.max_growth_mb} MiB)")
+
+    print(f"videos: {args.count} in {time.perf_counter() - started:.0f}s")
+    print(f"RSS baseline {baseline / 2**20:.1f} MiB, final {final / 2**20:.1f} MiB, growth {growth_mb:+.1f} MiB")
+    for failure in failures[:20]:
+        print(f"FAIL {failure}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"rss_bytes": rss, "growth_mb": round(growth_mb, 2), "failures": failures}, f, indent=2)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Benchmark the detection worker end to end without the hive server or RunPod.
+
+Each configuration runs app/main.py on one payload of synthetic videos with
+REMOTE_HOST=local, so "remote" reads and writes go to local directories. The
+result cache is disabled so every run does the full work. Reported per
+configuration: videos/hour, per-stage latency percentiles from the metrics
+JSONL, and peak memory of the worker and its pool processes.
+
+    python make_videos.py --out /tmp/bench_videos --count 20
+    python run_bench.py --videos /tmp/bench_videos --model /app/best.pt --only baseline batch8 pool2x2
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import logging
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+
+# Per-video metrics fields reported as latency percentiles
+STAGES = ("transfer_s", "decode_s", "infer_s", "track_s", "checkpoint_s", "track_seconds")
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def read_jsonl(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_config(config, videos, args):
+    """Run one payload under a configuration and return its report entry."""
+    workdir = tempfile.mkdtemp(prefix=f"bench-{config['name']}-")
+    remote_output = os.path.join(workdir, "remote")
+    for path in (remote_output, os.path.join(workdir, "videos"), os.path.join(workdir, "output")):
+        os.makedirs(path)
+    env = dict(os.environ,
+               REMOTE_HOST="local", REMOTE_USER="bench", REMOTE_VIDEO_PATH=os.path.abspath(args.videos),
+               REMOTE_OUTPUT_PATH=remote_output, LOCAL_VIDEO_DIR=os.path.join(workdir, "videos"),
+               LOCAL_OUTPUT_DIR=os.path.join(workdir, "output"), METRICS_JSONL=os.path.join(workdir, "metrics.jsonl"),
+               RESULT_CACHE_PATH="", LEDGER_PATH=os.path.join(workdir, "ledger.sqlite"),
+               PROCESSED_LOG=os.path.join(workdir, "processed.log"), LAST_RUN_FILE=os.path.join(workdir, "last_run"),
+               CHECKPOINT_DIR=os.path.join(workdir, "checkpoints"), MODEL_PATH=args.model, WORKER_MODE="stdin")
+    # INT8 configs calibrate on the benchmark videos unless MODEL_CALIBRATION is set
+    env.setdefault("MODEL_CALIBRATION", os.path.abspath(args.videos))
+    env.update(config.get("env", {}))
+    payload = json.dumps({"input": {"videos": videos, "timestamp": datetime.now().isoformat()}})
+
+    logger.info("Running %s on %d videos", config["name"], len(videos))
+    with open(os.path.join(workdir, "worker.log"), "w") as log:
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, "main.py"], cwd=APP_DIR, env=env, stdin=subprocess.PIPE,
+                                   stdout=log, stderr=subprocess.STDOUT, text=True)
+        process.stdin.write(payload)
+        process.stdin.close()
+        # wait4 gives the worker's rusage, including pool processes it waited for
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    records = read_jsonl(os.path.join(workdir, "metrics.jsonl"))
+    results = read_jsonl(os.path.join(remote_output, "results.jsonl"))
+    stages = {}
+    for stage in STAGES:
+        values = [r[stage] for r in records if r.get(stage) is not None]
+        if values:
+            stages[stage] = {f"p{p}": round(percentile(values, p), 3) for p in PERCENTILES}
+    peak_rss = max([usage.ru_maxrss * 1024] + [r.get("peak_rss_bytes", 0) for r in records])
+    entry = {
+        "name": config["name"],
+        "env": config.get("env", {}),
+        "exit_code": process.returncode,
+        "videos": len(videos),
+        "videos_completed": len(results),
+        "wall_s": round(wall, 2),
+        "videos_per_hour": round(3600 * len(results) / wall, 1) if wall else 0.0,
+        "frames_per_second": round(sum(r.get("frames_decoded", 0) for r in records) / wall, 2) if wall else 0.0,
+        "stages": stages,
+        "peak_rss_bytes": peak_rss,
+        "log": os.path.join(workdir, "worker.log"),
+    }
+    if process.returncode != 0:
+        logger.warning("%s exited with %d; see %s", config["name"], process.returncode, entry["log"])
+    elif not args.keep:
+        shutil.copy(os.path.join(workdir, "worker.log"), os.path.join(args.output, f"{config['name']}.log"))
+        entry["log"] = os.path.join(args.output, f"{config['name']}.log")
+        shutil.rmtree(workdir, ignore_errors=True)
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end benchmark of the detection worker')
+    parser.add_argument('--videos', required=True, help='Directory of (synthetic) videos served as REMOTE_VIDEO_PATH')
+    parser.add_argument('--model', default=os.getenv('MODEL_PATH', '/app/best.pt'), help='YOLO weights')
+    parser.add_argument('--configs', default=os.path.join(BENCH_DIR, 'configs.json'), help='Configurations (JSON)')
+    parser.add_argument('--only', nargs='*', help='Run only these configuration names')
+    parser.add_argument('--limit', type=int, help='Use at most this many videos')
+    parser.add_argument('--output', default=os.path.join(BENCH_DIR, 'results'), help='Directory for result JSON')
+    parser.add_argument('--keep', action='store_true', help='Keep each run\'s working directory')
+    args = parser.parse_args()
+
+    videos = sorted(name for name in os.listdir(args.videos) if name.lower().endswith('.mp4'))[:args.limit]
+    if not videos:
+        logger.error("No videos in %s", args.videos)
+        sys.exit(1)
+    with open(args.configs) as f:
+        configs = [c for c in json.load(f) if not args.only or c["name"] in args.only]
+    os.makedirs(args.output, exist_ok=True)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "host": {"machine": platform.machine(), "cpus": os.cpu_count(), "python": platform.python_version()},
+        "videos_dir": os.path.abspath(args.videos),
+        "configs": [run_config(config, videos, args) for config in configs],
+    }
+    path = os.path.join(args.output, f"bench_{time.strftime('%Y%m%dT%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'config':<14}{'exit':>5}{'videos/h':>10}{'fps':>9}{'infer p50':>11}{'infer p99':>11}{'peak MiB':>10}")
+    for c in report["configs"]:
+        infer = c["stages"].get("infer_s", {})
+        print(f"{c['name']:<14}{c['exit_code']:>5}{c['videos_per_hour']:>10}{c['frames_per_second']:>9}"
+              f"{infer.get('p50', '-'):>11}{infer.get('p99', '-'):>11}{c['peak_rss_bytes'] / 2**20:>10.0f}")
+    logger.info("Report written to %s", path)
+
+
+if __name__ == "__main__":
+    main()
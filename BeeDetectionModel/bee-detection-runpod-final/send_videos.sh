@@ -1,72 +1,30 @@
 #!/bin/bash
 
+# Incremental dispatcher: only directories changed since the last tick are listed,
+# videos already in the ledger are skipped, and large backlogs are split into
+# several RunPod payloads (see app/dispatcher.py).
+
 # Paths
-START_TIME_FILE=/var/www/html/ademnea_website/public/bee-detection-model-video-monitoring/start_time.txt
-LAST_RUN_FILE=/var/www/html/ademnea_website/public/bee-detection-model-video-monitoring/last_run.txt
-PROCESSED_LOG=/var/www/html/ademnea_website/public/bee-detection-model-video-monitoring/processed.log
-VIDEO_DIR=/var/www/html/ademnea_website/public/hivevideo
+MONITOR_DIR=/var/www/html/ademnea_website/public/bee-detection-model-video-monitoring
+export VIDEO_DIR=/var/www/html/ademnea_website/public/hivevideo
+export LEDGER_PATH=$MONITOR_DIR/processed.sqlite
+export DISPATCH_CURSOR=$MONITOR_DIR/scan_cursor.json
+# Worker results (REMOTE_OUTPUT_PATH/results.jsonl); queued videos without a result here are retried
+export RESULTS_PATH=/var/www/html/ademnea_website/public/results/results.jsonl
+PROCESSED_LOG=$MONITOR_DIR/processed.log
 
 # RunPod Endpoint (corrected to actual structure!)
-RUNPOD_ENDPOINT="https://api.runpod.ai/v2/{endpoint_id}/run"
-
-# Add your actual RunPod API Key
-API_KEY="your_runpod_api_key_here"
-
-# Lock
-LOCK_FILE="/tmp/bee_detection.lock"
-exec 200>"$LOCK_FILE"
-flock -n 200 || { echo "Script is already running"; exit 1; }
-
-# Init START_TIME
-if [ ! -f "$START_TIME_FILE" ]; then
-    date -Iseconds > "$START_TIME_FILE"
-fi
-START_TIME=$(cat "$START_TIME_FILE")
-
-# Get LAST_RUN
-LAST_RUN=$(cat "$LAST_RUN_FILE" 2>/dev/null || echo "$START_TIME")
-
-# Find New Videos
-NEW_VIDEOS=$(find "$VIDEO_DIR" -type f -newermt "$LAST_RUN" -name '*.mp4')
-PROCESSED=$(cat "$PROCESSED_LOG" 2>/dev/null)
-
-# Filter Unprocessed Videos
-VIDEOS=()
-for VIDEO in $NEW_VIDEOS; do
-    if ! grep -Fx "$VIDEO" <<< "$PROCESSED"; then
-        VIDEOS+=("$(basename "$VIDEO")")
-    fi
-done
-
-# Proceed if New Videos Found
-if [ ${#VIDEOS[@]} -gt 0 ]; then
-    PAYLOAD=$(jq -n \
-        --arg timestamp "$(date -Iseconds)" \
-        --argjson videos "$(printf '%s\n' "${VIDEOS[@]}" | jq -R . | jq -s .)" \
-        '{input: {videos: $videos, timestamp: $timestamp}}')
+export RUNPOD_ENDPOINT="https://api.runpod.ai/v2/{endpoint_id}/run"
 
-    # RunPod Request
-    RESPONSE=$(curl -s -w "%{http_code}" -o /tmp/response.txt \
-        -X POST \
-        -H "Content-Type: application/json" \
-        -H "Authorization: Bearer '"$API_KEY"'" \
-        -d "$PAYLOAD" \
-        "$RUNPOD_ENDPOINT")
+# File holding your actual RunPod API Key
+export RUNPOD_API_KEY_FILE=/home/hivemonitor/.runpod_api_key
 
-    if [ "$RESPONSE" -ne 200 ]; then
-        echo "Error: Push failed with status $RESPONSE"
-        cat /tmp/response.txt
-        exit 1
-    else
-        echo "Push succeeded! Job response:"
-        cat /tmp/response.txt
-    fi
+DISPATCHER="$(dirname "$0")/app/dispatcher.py"
+LEDGER="python3 $(dirname "$0")/app/ledger.py --db $LEDGER_PATH"
 
-    # Mark Videos as Processed
-    for VIDEO in "${VIDEOS[@]}"; do
-        echo "$VIDEO_DIR/$VIDEO" >> "$PROCESSED_LOG"
-    done
+# Import the old processed log into the ledger on first run
+if [ ! -f "$LEDGER_PATH" ] && [ -f "$PROCESSED_LOG" ]; then
+    $LEDGER import "$PROCESSED_LOG"
 fi
 
-# Update LAST_RUN
-date -Iseconds > "$LAST_RUN_FILE"
+exec python3 "$DISPATCHER" run
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+pytest.importorskip("cv2")
+pytest.importorskip("torch")
+pytest.importorskip("ultralytics")
+
+from batching import BatchEngine  # noqa: E402
+from tracking import count_bees, load_tracker_args  # noqa: E402
+from test_tracking import StubDetector, write_video  # noqa: E402
+
+
+class BatchStubDetector(StubDetector):
+    """StubDetector that takes a list of frames, as the fused model does when batching."""
+
+    def predict(self, frames, **kwargs):
+        return [super(BatchStubDetector, self).predict(frame)[0] for frame in frames]
+
+
+@pytest.fixture
+def videos(tmp_path):
+    one = write_video(str(tmp_path / "one.mp4"), [[(20 + i, 30)] for i in range(15)])
+    two = write_video(str(tmp_path / "two.mp4"), [[(20 + i, 30), (70 - i, 65)] for i in range(25)])
+    return one, two
+
+
+def test_results_follow_input_positions_with_repeated_sources(videos):
+    one, two = videos
+    tracker_args = load_tracker_args("bytetrack.yaml")
+    sources = [two, one, two, one, one]
+    engine = BatchEngine(BatchStubDetector(), batch_size=3, max_videos=2, tracker_args=tracker_args)
+
+    tracked = engine.run(sources)
+
+    assert len(tracked) == len(sources)
+    for source, (bee_ids, stats) in zip(sources, tracked):
+        expected, expected_stats = count_bees(StubDetector(), source, tracker_args=tracker_args)
+        assert bee_ids == expected
+        assert stats["frames_processed"] == expected_stats["frames_processed"]
+    assert engine.frames == 25 * 2 + 15 * 3
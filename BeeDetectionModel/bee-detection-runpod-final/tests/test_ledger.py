@@ -0,0 +1,48 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from ledger import Ledger  # noqa: E402
+
+
+def test_filter_unprocessed_skips_queued_and_processed(tmp_path):
+    ledger = Ledger(str(tmp_path / "ledger.sqlite"))
+    ledger.mark(["/v/queued.mp4"], "queued")
+    ledger.mark(["/v/processed.mp4"], "processed")
+    ledger.mark(["/v/failed.mp4"], "failed")
+    paths = ["/v/new.mp4", "/v/queued.mp4", "/v/failed.mp4", "/v/processed.mp4", "/v/later.mp4"]
+
+    assert ledger.filter_unprocessed(paths) == ["/v/new.mp4", "/v/failed.mp4", "/v/later.mp4"]
+
+
+def test_filter_unprocessed_spans_query_batches(tmp_path):
+    ledger = Ledger(str(tmp_path / "ledger.sqlite"))
+    paths = [f"/v/{i}.mp4" for i in range(1200)]
+    ledger.mark(paths[::2], "processed")
+
+    assert ledger.filter_unprocessed(paths) == paths[1::2]
+
+
+def test_mark_upserts_status_and_keeps_digest(tmp_path):
+    ledger = Ledger(str(tmp_path / "ledger.sqlite"))
+    ledger.mark(["/v/a.mp4"], "queued")
+    ledger.mark(["/v/a.mp4"], "processed", {"/v/a.mp4": "abc"})
+    ledger.mark(["/v/a.mp4"], "failed")
+
+    assert ledger.status("/v/a.mp4") == "failed"
+    assert not ledger.is_processed("/v/a.mp4")
+    assert ledger.entries("queued") == []
+    row = ledger._conn.execute("SELECT COUNT(*), digest, queued_at IS NOT NULL FROM videos").fetchone()
+    assert row == (1, "abc", 1)
+
+
+def test_import_log_leaves_existing_rows(tmp_path):
+    ledger = Ledger(str(tmp_path / "ledger.sqlite"))
+    ledger.mark(["/v/a.mp4"], "queued")
+    log = tmp_path / "processed.log"
+    log.write_text("/v/a.mp4\n/v/b.mp4\n\n/v/b.mp4\n")
+
+    assert ledger.import_log(str(log)) == 1
+    assert ledger.status("/v/a.mp4") == "queued"
+    assert ledger.status("/v/b.mp4") == "processed"
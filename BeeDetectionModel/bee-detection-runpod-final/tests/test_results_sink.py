@@ -0,0 +1,68 @@
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+pytest.importorskip("paramiko")
+
+from results_sink import ResultSink  # noqa: E402
+from transport import LocalTransport  # noqa: E402
+
+
+class TornAppendTransport(LocalTransport):
+    """Writes half the data of the first ``failures`` appends, then drops the connection."""
+
+    def __init__(self, failures=1, retries=3):
+        super().__init__(retries=retries)
+        self.failures = failures
+        self.appends = 0
+
+    def _append(self, content, remote_path):
+        self.appends += 1
+        if self.appends <= self.failures:
+            with open(remote_path, "ab") as f:
+                f.write(content[:len(content) // 2])
+            raise EOFError("connection dropped mid-append")
+        return super()._append(content, remote_path)
+
+
+def result(video, count):
+    return {"video": video, "timestamp": "2026-10-17T12:00:00", "bee_count": count, "bee_ids": list(range(count))}
+
+
+def remote_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f.read().splitlines()]
+
+
+def test_torn_append_is_repaired_not_duplicated(tmp_path):
+    remote = str(tmp_path / "remote" / "results.jsonl")
+    transport = TornAppendTransport()
+    sink = ResultSink(transport, remote, str(tmp_path / "results.csv"), flush_every=100, flush_interval=0)
+    records = [result(f"video_{i}.mp4", i) for i in range(10)]
+    for record in records:
+        sink.add(record)
+    sink.close()
+
+    assert remote_lines(remote) == records
+    assert transport.appends == 2
+
+
+def test_failed_flush_is_repaired_by_the_next_one(tmp_path):
+    remote = str(tmp_path / "remote" / "results.jsonl")
+    transport = TornAppendTransport(failures=1, retries=1)
+    sink = ResultSink(transport, remote, str(tmp_path / "results.csv"), flush_every=100, flush_interval=0)
+    first = [result(f"video_{i}.mp4", i) for i in range(4)]
+    for record in first:
+        sink.add(record)
+    with pytest.raises(EOFError):
+        sink.flush()
+
+    later = result("video_9.mp4", 9)
+    sink.add(later)
+    sink.close()
+
+    assert remote_lines(remote) == first + [later]
@@ -0,0 +1,212 @@
+import os
+import sys
+import fractions
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("ultralytics")
+av = pytest.importorskip("av")
+
+import numpy as np  # noqa: E402
+from ultralytics.trackers.basetrack import BaseTrack  # noqa: E402
+
+from decode import DecodeConfig  # noqa: E402
+from tracking import (MAX_REMOVED_TRACKS, FrameSampler, VideoTracker, count_bees, load_tracker_args,  # noqa: E402
+                      make_tracker, tune_tracker)
+
+SIZE = 96
+SQUARE = 10
+FPS = 10
+
+
+class StubBoxes:
+    """The parts of ultralytics' Boxes that VideoTracker and the trackers read."""
+
+    def __init__(self, xywh):
+        self.xywh = np.asarray(xywh, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.full(len(self.xywh), 0.9, dtype=np.float32)
+        self.cls = np.zeros(len(self.xywh), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.xywh)
+
+    def __getitem__(self, index):
+        return StubBoxes(self.xywh[index])
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self
+
+
+class StubResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class StubDetector:
+    """Detects the bright squares drawn by write_video()."""
+
+    def predict(self, frame, **kwargs):
+        mask = (frame[..., 1] > 128).astype(np.uint8)
+        count, _, stats, centroids = cv2.connectedComponentsWithStats(mask)
+        xywh = [(cx, cy, w, h) for (_, _, w, h, area), (cx, cy) in zip(stats[1:], centroids[1:]) if area > 20]
+        return [StubResult(StubBoxes(xywh))]
+
+
+def write_video(path, positions):
+    """Write one frame per entry of ``positions``, a list of square centres."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (SIZE, SIZE))
+    for centres in positions:
+        frame = np.zeros((SIZE, SIZE, 3), dtype=np.uint8)
+        for x, y in centres:
+            cv2.rectangle(frame, (x - SQUARE // 2, y - SQUARE // 2), (x + SQUARE // 2, y + SQUARE // 2),
+                          (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def steady_video(tmp_path):
+    """Two squares drifting slowly, so the tracker follows exactly two bees."""
+    return write_video(str(tmp_path / "steady.mp4"), [[(20 + i, 30), (70 - i, 65)] for i in range(20)])
+
+
+@pytest.fixture
+def flicker_video(tmp_path):
+    """Squares that jump to a new place every frame, so every track is dropped on the next one."""
+    grid = [(x, y) for x in range(12, SIZE, 24) for y in range(12, SIZE, 24)]
+    return write_video(str(tmp_path / "flicker.mp4"), [grid[i % 4::4] for i in range(60)])
+
+
+@pytest.fixture
+def tracker_args():
+    return load_tracker_args("bytetrack.yaml")
+
+
+def test_each_video_gets_its_own_tracker(steady_video, tracker_args):
+    first = VideoTracker(steady_video, tracker_args=tracker_args)
+    second = VideoTracker(steady_video, tracker_args=tracker_args)
+    try:
+        assert first.tracker is not second.tracker
+        assert first.tracker.args is not tracker_args
+    finally:
+        first.close()
+        second.close()
+    assert first.tracker is None and second.tracker is None
+
+
+def test_track_ids_restart_at_one_for_every_video(steady_video, tracker_args):
+    detector = StubDetector()
+    # Another video (or model.track) may have left the class-wide counter anywhere
+    BaseTrack._count = 500
+    for _ in range(3):
+        bee_ids, stats = count_bees(detector, steady_video, tracker_args=tracker_args)
+        assert bee_ids == {1, 2}
+        assert stats["tracks_started"] == 2
+        assert stats["frames_processed"] == 20
+
+
+def test_removed_tracks_stay_bounded_across_videos(flicker_video, tracker_args):
+    detector = StubDetector()
+    args = load_tracker_args("bytetrack.yaml", "track_buffer=2")
+    largest = 0
+    for _ in range(10):
+        video = VideoTracker(flicker_video, tracker_args=args)
+        while (frame := video.next_frame()) is not None:
+            video.update(detector.predict(frame)[0], frame)
+            if video.tracker is not None:
+                largest = max(largest, len(video.tracker.removed_stracks))
+        assert video.tracker is None
+        # Far more tracks are dropped than are kept
+        assert video.stats()["tracks_started"] > 2 * MAX_REMOVED_TRACKS
+    assert largest == MAX_REMOVED_TRACKS
+
+
+def test_tune_tracker_keeps_lost_tracks_for_the_same_stretch_of_video(tracker_args):
+    tracker = make_tracker(tracker_args, 30 / 3)
+    tune_tracker(tracker, 30, 3)
+    assert tracker.max_time_lost == tracker_args.track_buffer // 3
+    assert tracker.args.match_thresh > tracker_args.match_thresh
+
+    tracker = make_tracker(load_tracker_args("bytetrack.yaml", {"max_lost_seconds": 2}), 30 / 3)
+    tune_tracker(tracker, 30, 3)
+    assert tracker.max_time_lost == 20
+
+
+def test_sampled_video_tracks_the_same_bees(steady_video, tracker_args):
+    bee_ids, stats = count_bees(StubDetector(), steady_video, FrameSampler("stride", 2), tracker_args)
+    assert bee_ids == {1, 2}
+    assert stats["frames_processed"] == 10
+
+
+@pytest.fixture
+def gap_video(tmp_path):
+    """H.264 with B-frames and a two-second gap in its timestamps, as when a camera drops frames.
+
+    OpenCV's CAP_PROP_POS_FRAMES seeks by time, so on this file it lands on the wrong frame.
+    """
+    path = str(tmp_path / "gap.mp4")
+    container = av.open(path, "w")
+    stream = container.add_stream("libx264", rate=FPS)
+    stream.width = stream.height = SIZE
+    stream.pix_fmt = "yuv420p"
+    stream.options = {"bf": "3", "g": "15"}
+    time_base = fractions.Fraction(1, 1000)
+    stream.codec_context.time_base = time_base
+    pts = 0
+    for i in range(90):
+        image = np.zeros((SIZE, SIZE, 3), dtype=np.uint8)
+        for x, y in [(5 + i % 86, 20), (90 - (2 * i) % 86, 50), (10 + (3 * i) % 76, 80)]:
+            cv2.rectangle(image, (x - SQUARE // 2, y - SQUARE // 2), (x + SQUARE // 2, y + SQUARE // 2),
+                          (255, 255, 255), -1)
+        frame = av.VideoFrame.from_ndarray(image, format="bgr24")
+        frame.pts = pts
+        frame.time_base = time_base
+        pts += 2000 if i == 30 else 1000 // FPS
+        container.mux(stream.encode(frame))
+    container.mux(stream.encode())
+    container.close()
+    return path
+
+
+def open_source(path, kind):
+    return open(path, "rb") if kind == "stream" else path
+
+
+@pytest.mark.parametrize("kind", ["file", "stream", "threaded"])
+@pytest.mark.parametrize("stop_after", [7, 25, 41, 70])
+def test_resumed_video_matches_an_uninterrupted_run(gap_video, tracker_args, kind, stop_after):
+    detector = StubDetector()
+    decode = DecodeConfig.from_spec("threaded" if kind == "threaded" else "default")
+    whole = VideoTracker(open_source(gap_video, kind), tracker_args=tracker_args, decode=decode)
+    frames = []
+    while (frame := whole.next_frame()) is not None:
+        frames.append(frame.copy())
+        whole.update(detector.predict(frame)[0], frame)
+
+    first = VideoTracker(open_source(gap_video, kind), tracker_args=tracker_args, decode=decode)
+    for _ in range(stop_after):
+        frame = first.next_frame()
+        first.update(detector.predict(frame)[0], frame)
+    state = first.state()
+    first.close()
+
+    resumed = VideoTracker(open_source(gap_video, kind), tracker_args=tracker_args, decode=decode)
+    resumed.restore(state)
+    index = stop_after
+    while (frame := resumed.next_frame()) is not None:
+        # Every frame after the resume is the one the uninterrupted run saw at that position
+        assert np.array_equal(frame, frames[index])
+        index += 1
+        resumed.update(detector.predict(frame)[0], frame)
+
+    assert index == len(frames)
+    assert resumed.bee_ids == whole.bee_ids
+    assert resumed.stats()["frames_processed"] == whole.stats()["frames_processed"]
+    assert resumed.stats()["tracks_started"] == whole.stats()["tracks_started"]
@@ -0,0 +1,101 @@
+import os
+import sys
+import errno
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+pytest.importorskip("paramiko")
+
+from transport import LocalTransport, SSHTransport  # noqa: E402
+
+
+class FlakyTransport(LocalTransport):
+    """Raises the given errors on the first downloads, then copies the file."""
+
+    def __init__(self, errors, retries=3):
+        super().__init__(retries=retries)
+        self.errors = list(errors)
+        self.calls = 0
+
+    def _download(self, remote_path, local_path):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return super()._download(remote_path, local_path)
+
+
+class FakeSession:
+    def __init__(self, active):
+        self.active = active
+        self.closed = False
+
+    def get_transport(self):
+        return self
+
+    def is_active(self):
+        return self.active
+
+    def close(self):
+        self.closed = True
+
+
+class FakeChannel:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def remote_file(tmp_path):
+    path = tmp_path / "remote.mp4"
+    path.write_bytes(b"video")
+    return str(path)
+
+
+def test_dropped_connection_is_retried(remote_file, tmp_path):
+    transport = FlakyTransport([EOFError("connection closed"), ConnectionResetError()])
+
+    assert transport.download(remote_file, str(tmp_path / "local.mp4")) == 5
+    assert transport.calls == 3
+
+
+@pytest.mark.parametrize("error", [OSError(errno.ENOSPC, "No space left on device"), OSError("Failure"),
+                                   FileNotFoundError("missing")])
+def test_other_io_errors_are_not_retried(remote_file, tmp_path, error):
+    transport = FlakyTransport([error])
+
+    with pytest.raises(OSError):
+        transport.download(remote_file, str(tmp_path / "local.mp4"))
+    assert transport.calls == 1
+
+
+def test_invalidate_keeps_a_live_session_and_other_threads_channels():
+    transport = SSHTransport("host", "user")
+    transport._client = session = FakeSession(active=True)
+    other = FakeChannel()
+
+    def open_other_channel():
+        transport._local.sftp = other
+    thread = threading.Thread(target=open_other_channel)
+    thread.start()
+    thread.join()
+    transport._local.sftp = mine = FakeChannel()
+
+    transport._invalidate()
+
+    assert mine.closed and transport._local.sftp is None
+    assert not other.closed
+    assert transport._client is session and not session.closed
+
+
+def test_invalidate_closes_a_dead_session():
+    transport = SSHTransport("host", "user")
+    transport._client = session = FakeSession(active=False)
+
+    transport._invalidate()
+
+    assert session.closed and transport._client is None
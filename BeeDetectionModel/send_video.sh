@@ -4,6 +4,8 @@
 START_TIME_FILE=/var/www/html/ademnea_website/public/bee-detection-model-video-monitoring/start_time.txt
 LAST_RUN_FILE=/var/www/html/ademnea_website/public/bee-detection-model-video-monitoring/last_run.txt
 PROCESSED_LOG=/var/www/html/ademnea_website/public/bee-detection-model-video-monitoring/processed.log
+LEDGER_DB=/var/www/html/ademnea_website/public/bee-detection-model-video-monitoring/processed.sqlite
+LEDGER="python3 $(dirname "$0")/bee-detection-runpod-final/app/ledger.py --db $LEDGER_DB"
 VIDEO_DIR=/var/www/html/ademnea_website/public/hivevideo
 RUNPOD_ENDPOINT=https://api.runpod.ai/v2/qhs9hw3wderytz/run
 API_KEY_FILE=/home/hivemonitor/.runpod_api_key
@@ -24,17 +26,18 @@ START_TIME=$(cat "$START_TIME_FILE")
 # Get last run time (default to start time if not set)
 LAST_RUN=$(cat "$LAST_RUN_FILE" 2>/dev/null || echo "$START_TIME")
 
-# Find new videos since last run, but only after start time
-NEW_VIDEOS=$(find "$VIDEO_DIR" -type f -newermt "$START_TIME" -newermt "$LAST_RUN" -name '*.mp4')
+# Import the old processed log into the ledger on first run
+if [ ! -f "$LEDGER_DB" ] && [ -f "$PROCESSED_LOG" ]; then
+    $LEDGER import "$PROCESSED_LOG"
+fi
 
-# Filter unprocessed videos
-PROCESSED=$(cat "$PROCESSED_LOG" 2>/dev/null)
+# Find new videos since last run, but only after start time, that the ledger has not seen
+PATHS=()
 VIDEOS=()
-for VIDEO in $NEW_VIDEOS; do
-    if ! grep -Fx "$VIDEO" <<< "$PROCESSED"; then
-        VIDEOS+=($(basename "$VIDEO"))
-    fi
-done
+while IFS= read -r VIDEO; do
+    PATHS+=("$VIDEO")
+    VIDEOS+=("$(basename "$VIDEO")")
+done < <(find "$VIDEO_DIR" -type f -newermt "$START_TIME" -newermt "$LAST_RUN" -name '*.mp4' | $LEDGER filter)
 
 # Create JSON payload wrapped in "input" object
 if [ ${#VIDEOS[@]} -gt 0 ]; then
@@ -42,10 +45,8 @@ if [ ${#VIDEOS[@]} -gt 0 ]; then
         '{"input": {"videos": $videos, "timestamp": "'$(date -Iseconds)'"}}')
     # Send to RunPod with API key
     curl -X POST -H "Content-Type: application/json" -H "Authorization: Bearer $API_KEY" -d "$PAYLOAD" "$RUNPOD_ENDPOINT"
-    # Update processed log with full paths
-    for VIDEO in "${VIDEOS[@]}"; do
-        echo "$VIDEO_DIR/$VIDEO" >> "$PROCESSED_LOG"
-    done
+    # Mark the paths find printed (which may be in subdirectories) as queued in the ledger
+    printf '%s\n' "${PATHS[@]}" | $LEDGER mark --status queued
 fi
 
 # Update last run time
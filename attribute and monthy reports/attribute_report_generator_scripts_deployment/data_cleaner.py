@@ -4,6 +4,26 @@
 import pandas as pd
 import numpy as np
 
+def split_record(df, interior, exterior):
+    """
+    Split the 'record' column ('<interior>*2*<exterior>') into numeric interior and
+    exterior columns. '*2*' is read as ',' and the record is split on ','; a
+    record without either is all interior, and anything after a second
+    separator is ignored (csv_extract's split_record and rollups use the same rule).
+    Parquet extracts already hold them as the float columns
+    'record_interior' and 'record_exterior', which are only renamed.
+    """
+    if 'record' not in df.columns and 'record_interior' in df.columns:
+        return df.rename(columns={'record_interior': interior, 'record_exterior': exterior})
+    parts = df['record'].astype(str).str.replace('*2*', ',', regex=False).str.split(',', expand=True)
+    parts = parts.reindex(columns=[0, 1])
+    df[interior] = parts[0]
+    df[exterior] = parts[1]
+    df = df.drop(columns=['record'])
+    df[interior] = pd.to_numeric(df[interior], errors='coerce')
+    df[exterior] = pd.to_numeric(df[exterior], errors='coerce')
+    return df
+
 def clean_humidity_data(df):
     """
     Clean the humidity data:
@@ -12,11 +32,7 @@ def clean_humidity_data(df):
     - Convert new columns to numeric types.
     - Replace values of 2 with NaN.
     """
-    df['record'] = df['record'].str.replace('*2*', ',', regex=False)
-    df[['Interior (%)', 'Exterior (%)']] = df['record'].str.split(',', expand=True)
-    df = df.drop(columns=['record'])
-    df['Interior (%)'] = pd.to_numeric(df['Interior (%)'], errors='coerce')
-    df['Exterior (%)'] = pd.to_numeric(df['Exterior (%)'], errors='coerce')
+    df = split_record(df, 'Interior (%)', 'Exterior (%)')
     df['Interior (%)'] = df['Interior (%)'].replace(2, np.nan)
     df['Exterior (%)'] = df['Exterior (%)'].replace(2, np.nan)
     return df
@@ -29,11 +45,7 @@ def clean_temperature_data(df):
     - Convert new columns to numeric types.
     - Replace values of 2 with NaN.
     """
-    df['record'] = df['record'].str.replace('*2*', ',', regex=False)
-    df[['Interior (°C)', 'Exterior (°C)']] = df['record'].str.split(',', expand=True)
-    df = df.drop(columns=['record'])
-    df['Interior (°C)'] = pd.to_numeric(df['Interior (°C)'], errors='coerce')
-    df['Exterior (°C)'] = pd.to_numeric(df['Exterior (°C)'], errors='coerce')
+    df = split_record(df, 'Interior (°C)', 'Exterior (°C)')
     df['Interior (°C)'] = df['Interior (°C)'].replace(2, np.nan)
     df['Exterior (°C)'] = df['Exterior (°C)'].replace(2, np.nan)
     return df
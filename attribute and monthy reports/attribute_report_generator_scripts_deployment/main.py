@@ -115,10 +115,10 @@ def get_date_range_and_attribute(args):
     parser.add_argument('--year', type=str, help='Year (e.g., 2025) for single month analysis')
     parser.add_argument('--month', type=str, help='Month (e.g., 3 or March) for single month analysis')
     parser.add_argument('--attribute', type=str, help='Attribute to analyze (carbondioxide, humidity, temperature, weight)')
-    parser.add_argument('--co2_file', type=str, help='Path to CO2 CSV file')
-    parser.add_argument('--weight_file', type=str, help='Path to weight CSV file')
-    parser.add_argument('--temp_file', type=str, help='Path to temperature CSV file')
-    parser.add_argument('--humidity_file', type=str, help='Path to humidity CSV file')
+    parser.add_argument('--co2_file', type=str, help='Path to CO2 CSV file or Parquet dataset directory')
+    parser.add_argument('--weight_file', type=str, help='Path to weight CSV file or Parquet dataset directory')
+    parser.add_argument('--temp_file', type=str, help='Path to temperature CSV file or Parquet dataset directory')
+    parser.add_argument('--humidity_file', type=str, help='Path to humidity CSV file or Parquet dataset directory')
     parser.add_argument('--hive_id', type=str, default='hive1', help='Hive identifier (default: hive1)')
     parser.add_argument('--output_dir', type=str, default=BASE_REPORTS_DIR, help='Output directory for reports')
     parser.add_argument('--download_dir', type=str, help='Directory to copy the PDF for download')
@@ -316,22 +316,22 @@ if __name__ == "__main__":
     df_dict = {}
     try:
         if attribute == 'carbondioxide':
-            df_dict['carbondioxide'] = load_data(file_paths['carbondioxide'])
+            df_dict['carbondioxide'] = load_data(file_paths['carbondioxide'], hive_id=hive_id, year_months=year_month_list)
             df_dict['carbondioxide'] = clean_numeric_column(df_dict['carbondioxide'])
             df_dict['carbondioxide'] = remove_nan_values(df_dict['carbondioxide'])
         elif attribute == 'humidity':
-            df_dict['humidity'] = load_data(file_paths['humidity'])
-            df_dict['temperature'] = load_data(file_paths['temperature'])
+            df_dict['humidity'] = load_data(file_paths['humidity'], hive_id=hive_id, year_months=year_month_list)
+            df_dict['temperature'] = load_data(file_paths['temperature'], hive_id=hive_id, year_months=year_month_list)
             df_dict['humidity'] = clean_humidity_data(df_dict['humidity'])
             df_dict['temperature'] = clean_temperature_data(df_dict['temperature'])
             df_dict['humidity'] = remove_nan_values(df_dict['humidity'])
             df_dict['temperature'] = remove_nan_values(df_dict['temperature'])
         elif attribute == 'temperature':
-            df_dict['temperature'] = load_data(file_paths['temperature'])
+            df_dict['temperature'] = load_data(file_paths['temperature'], hive_id=hive_id, year_months=year_month_list)
             df_dict['temperature'] = clean_temperature_data(df_dict['temperature'])
             df_dict['temperature'] = remove_nan_values(df_dict['temperature'])
         elif attribute == 'weight':
-            df_dict['weight'] = load_data(file_paths['weight'])
+            df_dict['weight'] = load_data(file_paths['weight'], hive_id=hive_id, year_months=year_month_list)
             df_dict['weight'] = clean_numeric_column(df_dict['weight'])
             df_dict['weight'] = remove_nan_values(df_dict['weight'])
     except Exception as e:
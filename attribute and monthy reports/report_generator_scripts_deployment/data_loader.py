@@ -1,14 +1,45 @@
 #!/usr/bin/env python3
 
 
+import os
+import re
 import pandas as pd
 
-def load_data(file_path, index_col='created_at'):
+# Partition columns of the Parquet datasets written by csv_extract (hive_id=<id>/year_month=<YYYY-MM>)
+PARTITION_COLUMNS = ['hive_id', 'year_month']
+
+def hive_number(hive_id):
+    """
+    Convert a hive identifier such as 'hive1' or 1 to the numeric hive_id used in the database.
+    """
+    match = re.search(r'\d+', str(hive_id))
+    return int(match.group()) if match else None
+
+def load_parquet(path, hive_id=None, year_months=None):
+    """
+    Load a partitioned Parquet dataset, reading only the partitions of the given
+    hive and (year, month) pairs.
+    """
+    filters = []
+    if hive_id is not None and hive_number(hive_id) is not None:
+        filters.append(('hive_id', '=', hive_number(hive_id)))
+    if year_months:
+        filters.append(('year_month', 'in', [f"{year:04d}-{month:02d}" for year, month in year_months]))
+    df = pd.read_parquet(path, filters=filters or None)
+    return df.drop(columns=[column for column in PARTITION_COLUMNS if column in df.columns])
+
+def load_data(file_path, index_col='created_at', hive_id=None, year_months=None):
     """
-    Load data from a CSV file and set the specified column as the index.
+    Load data from a CSV file, or from a Parquet dataset directory written by
+    csv_extract, and set the specified column as the index.
+    For a Parquet dataset only the partitions of hive_id and the (year, month)
+    pairs in year_months are read; a CSV holds one hive and is read whole.
     Convert the index to datetime and remove duplicate indices.
     """
-    df = pd.read_csv(file_path, index_col=index_col)
+    if os.path.isdir(file_path):
+        df = load_parquet(file_path, hive_id, year_months).set_index(index_col).sort_index()
+    else:
+        df = pd.read_csv(file_path, index_col=index_col)
     df.index = pd.to_datetime(df.index)
     df = df[~df.index.duplicated(keep='first')]  # Remove duplicate indices
-    return df
\ No newline at end of file
+    return df
@@ -126,10 +126,10 @@ def get_date_range(args):
     parser.add_argument('--end_date', type=str, help='End month and year in MM/YYYY format (e.g., 06/2025)')
     parser.add_argument('--year', type=str, help='Year (e.g., 2025) for single month analysis')
     parser.add_argument('--month', type=str, help='Month (e.g., 3 or March) for single month analysis')
-    parser.add_argument('--co2_file', type=str, help='Path to CO2 CSV file')
-    parser.add_argument('--weight_file', type=str, help='Path to weight CSV file')
-    parser.add_argument('--temp_file', type=str, help='Path to temperature CSV file')
-    parser.add_argument('--humidity_file', type=str, help='Path to humidity CSV file')
+    parser.add_argument('--co2_file', type=str, help='Path to CO2 CSV file or Parquet dataset directory')
+    parser.add_argument('--weight_file', type=str, help='Path to weight CSV file or Parquet dataset directory')
+    parser.add_argument('--temp_file', type=str, help='Path to temperature CSV file or Parquet dataset directory')
+    parser.add_argument('--humidity_file', type=str, help='Path to humidity CSV file or Parquet dataset directory')
     parser.add_argument('--hive_id', type=str, default='hive1', help='Hive identifier (default: hive1)')
     parser.add_argument('--output_dir', type=str, default=BASE_REPORTS_DIR, help='Output directory for reports')
     parser.add_argument('--download_dir', type=str, help='Directory to copy the PDF for download')
@@ -306,10 +306,10 @@ if __name__ == "__main__":
 
     # Load data
     try:
-        carbondioxide = load_data(co2_file)
-        humidity = load_data(humidity_file)
-        temperatures = load_data(temp_file)
-        weights = load_data(weight_file)
+        carbondioxide = load_data(co2_file, hive_id=hive_id, year_months=year_month_list)
+        humidity = load_data(humidity_file, hive_id=hive_id, year_months=year_month_list)
+        temperatures = load_data(temp_file, hive_id=hive_id, year_months=year_month_list)
+        weights = load_data(weight_file, hive_id=hive_id, year_months=year_month_list)
     except Exception as e:
         logging.error(f"Failed to load data: {str(e)}")
         sys.exit(1)
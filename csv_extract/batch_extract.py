@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""Extract every sensor table for every hive concurrently over a bounded connection pool.
+
+Each (table, hive) range is split into calendar months. Every month is
+extracted by a worker thread on a pooled connection into a part file, and the
+parts are joined in order into the same <table>_hive<id>.csv the single
+extracts write; with --format parquet each month goes straight into its
+partition of the table's Parquet dataset (--prune also removes the hives'
+partitions outside the range). Reports rows/second per table and
+total wall time, and with --compare the time of the sequential
+one-table-one-connection path.
+
+    python batch_extract.py run --hives 1 2 3 --start 2025-01-01 --end 2025-06-30 --pool-size 4 --compare
+
+Without MySQL, seed a SQLite stand-in and point --sqlite at it:
+    python batch_extract.py seed --sqlite /tmp/sensors.db --hives 1 2 3 --start 2025-01-01 --end 2025-06-30
+    python batch_extract.py run --sqlite /tmp/sensors.db --hives 1 2 3 --start 2025-01-01 --end 2025-06-30 --compare
+"""
+import os
+import json
+import time
+import shutil
+import random
+import sqlite3
+import argparse
+import datetime
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from extract import (BATCH_SIZE, DB_HOST, DB_NAME, DB_PASSWORD, DB_USER, FORMATS, OUTPUT_DIR, TABLES,
+                     default_output, extract, parse_date)
+
+logger = logging.getLogger(__name__)
+
+# Connections (and worker threads) used at once
+POOL_SIZE = int(os.getenv('EXTRACT_POOL_SIZE', '4'))
+
+
+def month_ranges(start, end):
+    """Split [start, end] (dates, inclusive) into (first day, last day) pairs of calendar months."""
+    ranges = []
+    first = start
+    while first <= end:
+        next_month = (first.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+        last = min(end, next_month - datetime.timedelta(days=1))
+        ranges.append((first, last))
+        first = next_month
+    return ranges
+
+
+def mysql_pool(size):
+    from mysql.connector import pooling
+    return pooling.MySQLConnectionPool(pool_name="batch_extract", pool_size=size, host=DB_HOST, user=DB_USER,
+                                       password=DB_PASSWORD, database=DB_NAME)
+
+
+class SqliteCursor:
+    """The subset of a MySQL cursor extract() uses, over sqlite3 (%s placeholders become ?)."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, query, params):
+        self.cursor.execute(query.replace("%s", "?"), params)
+
+    def fetchmany(self, size):
+        return self.cursor.fetchmany(size)
+
+    def close(self):
+        self.cursor.close()
+
+
+class SqliteConnection:
+    # SQL dialect for queries that differ between MySQL and SQLite (see rollup.py)
+    dialect = "sqlite"
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+
+    def cursor(self, buffered=False):
+        return SqliteCursor(self.conn.cursor())
+
+    def close(self):
+        self.conn.close()
+
+
+class SqlitePool:
+    """Stand-in for MySQLConnectionPool over a SQLite file, for runs without a MySQL server."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_connection(self):
+        return SqliteConnection(self.path)
+
+
+def output_path(output_dir, table, hive_id, fmt):
+    return os.path.join(output_dir, os.path.basename(default_output(table, [hive_id], fmt)))
+
+
+def extract_part(pool, table, hive_id, first, last, path, batch_size, fmt="csv"):
+    conn = pool.get_connection()
+    try:
+        started = time.perf_counter()
+        rows = extract(table, [hive_id], first, last, path, batch_size, conn=conn, fmt=fmt)
+        return rows, started, time.perf_counter()
+    finally:
+        # Returns a pooled MySQL connection to the pool
+        conn.close()
+
+
+def join_parts(parts, path):
+    """Concatenate part CSVs (each with the same header) into ``path``, keeping one header."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as out:
+        for i, part in enumerate(parts):
+            with open(part, "rb") as f:
+                header = f.readline()
+                if i == 0:
+                    out.write(header)
+                shutil.copyfileobj(f, out)
+    os.replace(tmp_path, path)
+
+
+def prune_datasets(tables, hive_ids, start, end, output_dir):
+    """Remove the hives' Parquet partitions for months outside ``start`` to ``end``."""
+    from parquet_output import prune_partitions
+    for table in tables:
+        for directory in prune_partitions(output_path(output_dir, table, None, "parquet"), hive_ids, start, end):
+            logger.info("Removed stale partition %s", directory)
+
+
+def run_parallel(pool, tables, hive_ids, start, end, output_dir, pool_size, batch_size=BATCH_SIZE, fmt="csv",
+                 prune=False):
+    """Extract every table for every hive, one month per task; returns per-table stats and wall time."""
+    months = month_ranges(start, end)
+    tasks = [(table, hive_id, first, last) for table in tables for hive_id in hive_ids for first, last in months]
+    # CSV months go to part files that are joined afterwards; Parquet months are partitions of the dataset already
+    parts_dir = tempfile.mkdtemp(prefix="batch_extract-", dir=output_dir) if fmt == "csv" else None
+    started = time.perf_counter()
+
+    def task_output(table, hive_id, first, last):
+        if fmt == "parquet":
+            return output_path(output_dir, table, hive_id, fmt)
+        return os.path.join(parts_dir, f"{table}_{hive_id}_{first}.csv")
+
+    try:
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            futures = {task: executor.submit(extract_part, pool, *task, task_output(*task), batch_size, fmt)
+                       for task in tasks}
+            results = {task: future.result() for task, future in futures.items()}
+        if fmt == "csv":
+            for table in tables:
+                for hive_id in hive_ids:
+                    join_parts([task_output(table, hive_id, first, last) for first, last in months],
+                               output_path(output_dir, table, hive_id, fmt))
+        elif prune:
+            prune_datasets(tables, hive_ids, start, end, output_dir)
+    finally:
+        if parts_dir:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+    wall = time.perf_counter() - started
+
+    stats = {}
+    for table in tables:
+        done = [result for task, result in results.items() if task[0] == table]
+        rows = sum(r[0] for r in done)
+        # A table's throughput is measured over the span its tasks were running
+        span = max(r[2] for r in done) - min(r[1] for r in done)
+        stats[table] = {"rows": rows, "seconds": round(span, 2), "rows_per_second": round(rows / span) if span else 0}
+    return stats, wall
+
+
+def run_sequential(pool, tables, hive_ids, start, end, output_dir, batch_size=BATCH_SIZE, fmt="csv", prune=False):
+    """The old path: one table and hive at a time over one connection, whole range per query."""
+    stats = {}
+    started = time.perf_counter()
+    conn = pool.get_connection()
+    try:
+        for table in tables:
+            table_started = time.perf_counter()
+            rows = sum(extract(table, [hive_id], start, end, output_path(output_dir, table, hive_id, fmt),
+                               batch_size, conn=conn, fmt=fmt, prune=prune)
+                       for hive_id in hive_ids)
+            seconds = time.perf_counter() - table_started
+            stats[table] = {"rows": rows, "seconds": round(seconds, 2),
+                            "rows_per_second": round(rows / seconds) if seconds else 0}
+    finally:
+        conn.close()
+    return stats, time.perf_counter() - started
+
+
+def seed(path, hive_ids, start, end, interval_minutes):
+    """Create the sensor tables in a SQLite file with one reading per hive every ``interval_minutes``.
+
+    Humidity and temperature records are '<interior>*2*<exterior>' strings, as in the live tables.
+    """
+    rng = random.Random(0)
+    conn = sqlite3.connect(path)
+    try:
+        for table in TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+            split = table in ("hive_humidity", "hive_temperatures")
+            conn.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, hive_id INTEGER, record TEXT, "
+                         "created_at TIMESTAMP)")
+            conn.execute(f"CREATE INDEX {table}_hive_created ON {table} (hive_id, created_at)")
+            moment = datetime.datetime.combine(start, datetime.time())
+            stop = datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time())
+            step = datetime.timedelta(minutes=interval_minutes)
+            rows = []
+            while moment < stop:
+                stamp = moment.strftime("%Y-%m-%d %H:%M:%S")
+                rows.extend((hive_id, f"{rng.uniform(10, 90):.2f}*2*{rng.uniform(10, 90):.2f}" if split
+                             else f"{rng.uniform(10, 90):.2f}", stamp) for hive_id in hive_ids)
+                if len(rows) >= 50000:
+                    conn.executemany(f"INSERT INTO {table} (hive_id, record, created_at) VALUES (?, ?, ?)", rows)
+                    rows = []
+                moment += step
+            conn.executemany(f"INSERT INTO {table} (hive_id, record, created_at) VALUES (?, ?, ?)", rows)
+            conn.commit()
+            logger.info("Seeded %s", table)
+    finally:
+        conn.close()
+
+
+def print_stats(label, stats, wall):
+    print(f"{label}: {wall:.1f}s wall")
+    print(f"  {'table':<20}{'rows':>12}{'seconds':>10}{'rows/s':>12}")
+    for table, s in stats.items():
+        print(f"  {table:<20}{s['rows']:>12}{s['seconds']:>10}{s['rows_per_second']:>12}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Parallel multi-table, multi-hive extraction')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='Extract tables for hives over a connection pool')
+    run_parser.add_argument('--tables', nargs='+', choices=TABLES, default=list(TABLES), help='Sensor tables')
+    run_parser.add_argument('--output-dir', default=OUTPUT_DIR, help='Directory for <table>_hive<id>.csv')
+    run_parser.add_argument('--pool-size', type=int, default=POOL_SIZE, help='Connections used at once')
+    run_parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per fetchmany() batch')
+    run_parser.add_argument('--format', choices=FORMATS, default='csv', help='Output format')
+    run_parser.add_argument('--prune', action='store_true',
+                            help='With --format parquet, remove the hives\' partitions outside --start/--end')
+    run_parser.add_argument('--compare', action='store_true', help='Also time the sequential path')
+    run_parser.add_argument('--json', help='Write the timings to this JSON file')
+    seed_parser = commands.add_parser('seed', help='Fill a SQLite stand-in with synthetic readings')
+    seed_parser.add_argument('--interval-minutes', type=float, default=5, help='Minutes between readings')
+    for sub in (run_parser, seed_parser):
+        sub.add_argument('--hives', type=int, nargs='+', default=[1], help='Hive ids')
+        sub.add_argument('--start', type=parse_date, required=True, help='First day (YYYY-MM-DD)')
+        sub.add_argument('--end', type=parse_date, required=True, help='Last day, inclusive (YYYY-MM-DD)')
+        sub.add_argument('--sqlite', required=sub is seed_parser, help='Use this SQLite file instead of MySQL')
+    args = parser.parse_args()
+    if args.end < args.start:
+        parser.error("--end is before --start")
+
+    if args.command == 'run' and args.prune and args.format != 'parquet':
+        parser.error("--prune only applies to --format parquet")
+
+    if args.command == 'seed':
+        seed(args.sqlite, args.hives, args.start, args.end, args.interval_minutes)
+        return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    pool = SqlitePool(args.sqlite) if args.sqlite else mysql_pool(args.pool_size)
+    report = {}
+    stats, wall = run_parallel(pool, args.tables, args.hives, args.start, args.end, args.output_dir,
+                               args.pool_size, args.batch_size, args.format, args.prune)
+    report["parallel"] = {"pool_size": args.pool_size, "wall_s": round(wall, 2), "tables": stats}
+    print_stats(f"parallel (pool of {args.pool_size})", stats, wall)
+    if args.compare:
+        stats, seq_wall = run_sequential(pool, args.tables, args.hives, args.start, args.end, args.output_dir,
+                                         args.batch_size, args.format, args.prune)
+        report["sequential"] = {"wall_s": round(seq_wall, 2), "tables": stats}
+        print_stats("sequential", stats, seq_wall)
+        print(f"speedup: {seq_wall / wall:.2f}x")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
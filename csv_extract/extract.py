@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""Stream sensor readings from the ademnea database to CSV.
+
+Rows are read through an unbuffered cursor and written in fetchmany()
+batches, so memory stays the same whatever the date range. The CSV is
+written to a temporary file and renamed into place once complete.
+
+With --incremental, only rows newer than the last run are queried and
+appended; see Watermarks. With --format parquet, a table is written as a
+Parquet dataset partitioned by hive and month instead (see parquet_output;
+needs pyarrow).
+
+    python extract.py --table hive_humidity --hives 1 --start 2025-01-01 --end 2025-03-31
+    python extract.py --table hive_weights --hives 1 2 3 --start 2025-06-01 --end 2025-06-30 --output weights.csv
+    python extract.py --table hive_carbondioxide --hives 1 --start 2025-01-01 --incremental
+    python extract.py --table hive_humidity --hives 1 2 --start 2025-01-01 --end 2025-06-30 --format parquet
+"""
+import os
+import csv
+import json
+import time
+import argparse
+import datetime
+import logging
+from collections import deque
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+DB_HOST = os.getenv('DB_HOST', 'localhost')
+DB_USER = os.getenv('DB_USER', 'root')
+DB_PASSWORD = os.getenv('DB_PASSWORD', 'W1m3@-d6p@55')
+DB_NAME = os.getenv('DB_NAME', 'ademnea')
+OUTPUT_DIR = os.getenv('CSV_OUTPUT_DIR', '/var/www/html/ademnea_website/MODULES/csv_data')
+# Rows fetched from the server and written per batch
+BATCH_SIZE = int(os.getenv('EXTRACT_BATCH_SIZE', '5000'))
+# Incremental runs re-read this many hours before the watermark to pick up late-arriving rows
+OVERLAP_HOURS = float(os.getenv('EXTRACT_OVERLAP_HOURS', '24'))
+
+# Sensor tables that can be extracted; table names cannot be query parameters, so only these are allowed
+TABLES = ("hive_carbondioxide", "hive_humidity", "hive_temperatures", "hive_weights")
+FORMATS = ("csv", "parquet")
+# Tables whose record holds an interior and an exterior reading, as '<interior>*2*<exterior>'
+SPLIT_TABLES = ("hive_humidity", "hive_temperatures")
+
+
+def connect():
+    return mysql.connector.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
+
+
+def parse_date(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def default_output(table, hive_ids, fmt="csv"):
+    """Output path used by the original per-table scripts, e.g. csv_data/hive_humidity_hive1.csv.
+
+    A Parquet dataset holds every hive, so it is one directory per table, e.g. csv_data/hive_humidity.
+    """
+    if fmt == "parquet":
+        return os.path.join(OUTPUT_DIR, table)
+    return os.path.join(OUTPUT_DIR, f"{table}_hive{'_'.join(str(h) for h in hive_ids)}.csv")
+
+
+def split_record(value):
+    """Interior and exterior parts of a record (strings, or None), split as the report cleaners split them.
+
+    '*2*' is read as ',' and the record is split on ','. A record without either
+    is all interior, and anything after a second separator is ignored.
+    """
+    if value is None:
+        return None, None
+    parts = str(value).replace('*2*', ',').split(',')
+    return parts[0], (parts[1] if len(parts) > 1 else None)
+
+
+def check_table(table):
+    if table not in TABLES:
+        raise ValueError(f"Unknown table '{table}', expected one of {TABLES}")
+
+
+def output_columns(hive_ids, with_hive_id=None):
+    with_hive_id = len(hive_ids) > 1 if with_hive_id is None else with_hive_id
+    return ["record", "created_at"] + (["hive_id"] if with_hive_id else [])
+
+
+def build_query(table, hive_ids, with_hive_id=None):
+    """SELECT for one table and a set of hives over [start, end); hive_id is included for several hives."""
+    check_table(table)
+    columns = output_columns(hive_ids, with_hive_id)
+    placeholders = ", ".join(["%s"] * len(hive_ids))
+    query = (f"SELECT {', '.join(columns)} FROM {table} "
+             f"WHERE created_at >= %s AND created_at < %s AND hive_id IN ({placeholders}) "
+             "ORDER BY created_at ASC")
+    return query, columns
+
+
+def fetch_batches(cursor, batch_size=BATCH_SIZE):
+    while batch := cursor.fetchmany(batch_size):
+        yield batch
+
+
+def close_cursor(cursor):
+    """Close a cursor, logging instead of raising if it fails.
+
+    Closing an unbuffered MySQL cursor that still has unread rows raises,
+    which would hide the error that stopped the read.
+    """
+    try:
+        cursor.close()
+    except Exception as e:
+        logger.warning("Could not close cursor cleanly: %s", e)
+
+
+def write_rows(batches, path, columns, append=False):
+    """Write batches of rows to ``path`` and return the row count.
+
+    A new file is written to a temporary path and renamed into place. When
+    appending to an existing file, a failed write truncates it back to its
+    previous size, so it never ends with a partial batch.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    append = append and os.path.exists(path)
+    target = path if append else f"{path}.tmp"
+    size = os.path.getsize(path) if append else 0
+    rows = 0
+    try:
+        with open(target, 'a' if append else 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile, delimiter=',')
+            if not append:
+                writer.writerow(columns)
+            for batch in batches:
+                writer.writerows(batch)
+                rows += len(batch)
+        if not append:
+            os.replace(target, path)
+    except BaseException:
+        if append:
+            os.truncate(path, size)
+        elif os.path.exists(target):
+            os.remove(target)
+        raise
+    return rows
+
+
+def write_parquet(batches, root, table, batch_size=BATCH_SIZE):
+    """Write batches of (record, created_at, hive_id) rows into a partitioned Parquet dataset."""
+    from parquet_output import PartitionedParquetWriter
+
+    writer = PartitionedParquetWriter(root, table, batch_size)
+    try:
+        for batch in batches:
+            writer.write(batch)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
+
+
+def extract(table, hive_ids, start, end, output=None, batch_size=BATCH_SIZE, conn=None, fmt="csv", prune=False):
+    """Extract ``table`` rows for ``hive_ids`` from ``start`` to ``end`` (dates, both inclusive).
+
+    Writes a CSV, or with ``fmt="parquet"`` the hive/month partitions of a
+    Parquet dataset at ``output`` (each partition written is replaced, so
+    extract whole months). The hives' partitions for other months are kept
+    unless ``prune`` is set, which removes them. Returns the number of rows written. A connection is opened
+    (and closed) unless one is passed in.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {FORMATS}")
+    output = output or default_output(table, hive_ids, fmt)
+    query, columns = build_query(table, hive_ids, with_hive_id=True if fmt == "parquet" else None)
+    params = [start, end + datetime.timedelta(days=1)] + list(hive_ids)
+    own_conn = conn is None
+    conn = conn or connect()
+    started = time.perf_counter()
+    try:
+        # Unbuffered: rows stay on the server until fetchmany() asks for them
+        cur = conn.cursor(buffered=False)
+        try:
+            cur.execute(query, params)
+            if fmt == "parquet":
+                rows = write_parquet(fetch_batches(cur, batch_size), output, table, batch_size)
+            else:
+                rows = write_rows(fetch_batches(cur, batch_size), output, columns)
+        finally:
+            close_cursor(cur)
+    finally:
+        if own_conn:
+            conn.close()
+    logger.info("Extracted %d rows from %s (hives %s, %s to %s) to %s in %.1fs", rows, table,
+                ",".join(str(h) for h in hive_ids), start, end, output, time.perf_counter() - started)
+    if prune and fmt == "parquet":
+        from parquet_output import prune_partitions
+        for directory in prune_partitions(output, hive_ids, start, end):
+            logger.info("Removed stale partition %s", directory)
+    return rows
+
+
+class Watermarks:
+    """Per-hive high-watermarks of an incremental extract, kept next to its CSV as <output>.watermark.json.
+
+    A watermark is the newest (created_at, id) written for a hive plus the ids
+    written within the overlap window before it. Each run re-reads from the
+    watermark minus the overlap and skips those ids, so rows that arrive late
+    (but within the window) are appended and nothing is written twice.
+    """
+
+    def __init__(self, output):
+        self.path = f"{output}.watermark.json"
+        self.hives = {}
+        # Without the CSV the watermarks no longer describe what was written
+        if os.path.exists(self.path) and os.path.exists(output):
+            with open(self.path) as f:
+                self.hives = json.load(f)
+
+    def get(self, hive_id):
+        """Return (created_at, id, seen ids) for a hive, or None before its first run."""
+        entry = self.hives.get(str(hive_id))
+        if entry is None:
+            return None
+        return datetime.datetime.fromisoformat(entry["created_at"]), entry["id"], set(entry["seen"])
+
+    def set(self, hive_id, created_at, row_id, seen):
+        self.hives[str(hive_id)] = {"created_at": created_at.isoformat(sep=" "), "id": row_id, "seen": sorted(seen)}
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.hives, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def build_incremental_query(table, with_hive_id):
+    """SELECT one hive's rows from a timestamp on, oldest first; the id comes first and is not written."""
+    check_table(table)
+    columns = ["id", "record", "created_at"] + (["hive_id"] if with_hive_id else [])
+    return (f"SELECT {', '.join(columns)} FROM {table} WHERE hive_id = %s AND created_at >= %s "
+            "ORDER BY created_at ASC, id ASC")
+
+
+def new_rows(cursor, mark, overlap, batch_size=BATCH_SIZE):
+    """Yield batches of rows whose id is not in ``mark["seen"]``, moving ``mark`` to the newest row read.
+
+    Rows must arrive ordered by (created_at, id). Only the ids inside the
+    overlap window of the newest row are kept for the next watermark.
+    """
+    window = deque()
+    for batch in fetch_batches(cursor, batch_size):
+        rows = []
+        for row_id, *row in batch:
+            created_at = row[1]
+            if (created_at, row_id) > (mark["created_at"], mark["id"]):
+                mark["created_at"], mark["id"] = created_at, row_id
+            window.append((created_at, row_id))
+            if row_id not in mark["seen"]:
+                rows.append(row)
+        while window and window[0][0] < mark["created_at"] - overlap:
+            window.popleft()
+        if rows:
+            yield rows
+    mark["seen"] = {row_id for _, row_id in window}
+
+
+def extract_incremental(table, hive_ids, start=None, output=None, overlap_hours=OVERLAP_HOURS,
+                        batch_size=BATCH_SIZE, conn=None):
+    """Append rows newer than each hive's watermark to the CSV and return the number of rows appended.
+
+    ``start`` (a date) is only used for hives without a watermark yet. A
+    hive's watermark is saved only after its rows have been written. When no
+    hive in the file has a watermark (the first incremental run, possibly over
+    a CSV from a full extract), the CSV is rewritten from ``start`` instead of
+    appended to, so rows already in it are not duplicated.
+    """
+    output = output or default_output(table, hive_ids)
+    columns = output_columns(hive_ids)
+    query = build_incremental_query(table, len(hive_ids) > 1)
+    overlap = datetime.timedelta(hours=overlap_hours)
+    marks = Watermarks(output)
+    # Several hives can share one CSV: the first hive written replaces it, the others append
+    rewrite = not marks.hives
+    own_conn = conn is None
+    conn = conn or connect()
+    total = 0
+    try:
+        for hive_id in hive_ids:
+            saved = marks.get(hive_id)
+            if saved is None and start is None:
+                raise ValueError(f"No watermark for {table} hive {hive_id} yet; a start date is needed")
+            if saved is None:
+                mark = {"created_at": datetime.datetime.combine(start, datetime.time()), "id": 0, "seen": set()}
+                since = mark["created_at"]
+            else:
+                mark = {"created_at": saved[0], "id": saved[1], "seen": saved[2]}
+                since = saved[0] - overlap
+            started = time.perf_counter()
+            cur = conn.cursor(buffered=False)
+            try:
+                cur.execute(query, (hive_id, since))
+                rows = write_rows(new_rows(cur, mark, overlap, batch_size), output, columns, append=not rewrite)
+            finally:
+                close_cursor(cur)
+            rewrite = False
+            if saved is not None or mark["id"]:
+                marks.set(hive_id, mark["created_at"], mark["id"], mark["seen"])
+                marks.save()
+            total += rows
+            logger.info("Wrote %d rows from %s hive %d since %s to %s in %.1fs (watermark %s)", rows, table,
+                        hive_id, since, output, time.perf_counter() - started, mark["created_at"])
+    finally:
+        if own_conn:
+            conn.close()
+    return total
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Extract sensor readings to CSV')
+    parser.add_argument('--table', required=True, choices=TABLES, help='Sensor table')
+    parser.add_argument('--hives', type=int, nargs='+', default=[1], help='Hive ids')
+    parser.add_argument('--start', type=parse_date, help='First day (YYYY-MM-DD); with --incremental, first run only')
+    parser.add_argument('--end', type=parse_date, help='Last day, inclusive (YYYY-MM-DD)')
+    parser.add_argument('--output', help=f'CSV path (default {OUTPUT_DIR}/<table>_hive<ids>.csv) or, '
+                                         f'for Parquet, dataset directory (default {OUTPUT_DIR}/<table>)')
+    parser.add_argument('--format', choices=FORMATS, default='csv', help='Output format')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per fetchmany() batch')
+    parser.add_argument('--prune', action='store_true',
+                        help='With --format parquet, remove the hives\' partitions outside --start/--end')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Append only rows newer than the last run (watermarks in <output>.watermark.json)')
+    parser.add_argument('--overlap-hours', type=float, default=OVERLAP_HOURS,
+                        help='With --incremental, re-read this far before the watermark for late rows')
+    args = parser.parse_args()
+    if args.incremental:
+        if args.end:
+            parser.error("--end cannot be used with --incremental")
+        if args.format != 'csv':
+            parser.error("--incremental only writes CSV")
+        extract_incremental(args.table, args.hives, args.start, args.output, args.overlap_hours, args.batch_size)
+        return
+    if not args.start or not args.end:
+        parser.error("--start and --end are required without --incremental")
+    if args.end < args.start:
+        parser.error("--end is before --start")
+    if args.prune and args.format != 'parquet':
+        parser.error("--prune only applies to --format parquet")
+    extract(args.table, args.hives, args.start, args.end, args.output, args.batch_size, fmt=args.format,
+            prune=args.prune)
+
+
+if __name__ == '__main__':
+    main()
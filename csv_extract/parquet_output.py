@@ -0,0 +1,158 @@
+"""Partitioned Parquet output for the extractors.
+
+A table is written as a dataset directory partitioned by hive and month:
+
+    <root>/hive_id=<id>/year_month=<YYYY-MM>/part-0.parquet
+
+with a typed ``created_at`` timestamp and float readings. Humidity and
+temperature records ("interior*2*exterior" strings) are split into
+``record_interior`` and ``record_exterior``; the other tables keep one
+``record`` column. pandas.read_parquet(root, filters=...) reads back only the
+partitions asked for.
+
+An extract replaces the partitions it writes and leaves the others alone, so
+after re-extracting a narrower range the dataset still holds earlier months;
+prune_partitions() (--prune on the command line) removes them.
+"""
+import os
+import shutil
+import datetime
+import tempfile
+import pyarrow as pa
+import pyarrow.parquet as pq
+from extract import SPLIT_TABLES, split_record
+
+PART_NAME = "part-0.parquet"
+
+
+def table_schema(table):
+    readings = ["record_interior", "record_exterior"] if table in SPLIT_TABLES else ["record"]
+    return pa.schema([("created_at", pa.timestamp("s"))] + [(name, pa.float64()) for name in readings])
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def month_keys(start, end):
+    """YYYY-MM of every month from ``start`` to ``end`` (dates), as in the year_month partitions."""
+    keys = []
+    month = start.replace(day=1)
+    while month <= end:
+        keys.append(month.strftime("%Y-%m"))
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+    return keys
+
+
+def prune_partitions(root, hive_ids, start, end):
+    """Remove the hives' partitions for months outside ``start`` to ``end``; returns the removed directories."""
+    keep = {f"year_month={key}" for key in month_keys(start, end)}
+    removed = []
+    for hive_id in hive_ids:
+        hive_dir = os.path.join(root, f"hive_id={hive_id}")
+        if not os.path.isdir(hive_dir):
+            continue
+        for name in sorted(os.listdir(hive_dir)):
+            directory = os.path.join(hive_dir, name)
+            if name.startswith("year_month=") and name not in keep and os.path.isdir(directory):
+                shutil.rmtree(directory)
+                removed.append(directory)
+    return removed
+
+
+class PartitionedParquetWriter:
+    """Streams (record, created_at, hive_id) rows into one Parquet file per hive and month.
+
+    Rows are buffered per partition and written as row groups of
+    ``row_group_size``. Rows must be ordered by created_at within each hive,
+    so a hive's partition is finished as soon as a later month appears. Files
+    are written to a hidden staging directory next to ``root``, so readers of
+    the dataset never list them, even after a crash; close() moves each into
+    place, replacing that partition's previous contents, and abort() discards
+    them.
+    """
+
+    def __init__(self, root, table, row_group_size=5000):
+        self.root = root
+        self.table = table
+        self.split = table in SPLIT_TABLES
+        self.schema = table_schema(table)
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._open = {}
+        self._finished = []
+        self._staging = None
+
+    def partition_dir(self, hive_id, year_month):
+        return os.path.join(self.root, f"hive_id={hive_id}", f"year_month={year_month}")
+
+    def write(self, batch):
+        for record, created_at, hive_id in batch:
+            key = (hive_id, created_at.strftime("%Y-%m"))
+            part = self._open.get(key)
+            if part is None:
+                for other in [k for k in self._open if k[0] == hive_id]:
+                    self._finish(other)
+                part = self._start(key)
+            part["created_at"].append(created_at)
+            if self.split:
+                interior, exterior = split_record(record)
+                part["record_interior"].append(to_float(interior))
+                part["record_exterior"].append(to_float(exterior))
+            else:
+                part["record"].append(to_float(record))
+            if len(part["created_at"]) >= self.row_group_size:
+                self._flush(part)
+        self.rows += len(batch)
+
+    def _start(self, key):
+        if self._staging is None:
+            parent, name = os.path.split(os.path.abspath(self.root))
+            os.makedirs(parent, exist_ok=True)
+            # Same filesystem as root, so close() can os.replace the files into place
+            self._staging = tempfile.mkdtemp(prefix=f".{name}-", suffix=".tmp", dir=parent)
+        path = os.path.join(self.partition_dir(*key), PART_NAME)
+        staged = os.path.join(self._staging, os.path.relpath(path, self.root))
+        os.makedirs(os.path.dirname(staged), exist_ok=True)
+        part = {"path": path, "staged": staged, "writer": pq.ParquetWriter(staged, self.schema)}
+        part.update({name: [] for name in self.schema.names})
+        self._open[key] = part
+        return part
+
+    def _flush(self, part):
+        if part["created_at"]:
+            part["writer"].write_table(pa.table({name: part[name] for name in self.schema.names}, schema=self.schema))
+            for name in self.schema.names:
+                part[name] = []
+
+    def _finish(self, key):
+        part = self._open.pop(key)
+        self._flush(part)
+        part["writer"].close()
+        self._finished.append(part)
+
+    def close(self):
+        """Finish every partition and move the files into place; returns the number of rows written."""
+        for key in list(self._open):
+            self._finish(key)
+        for part in self._finished:
+            os.makedirs(os.path.dirname(part["path"]), exist_ok=True)
+            os.replace(part["staged"], part["path"])
+        self._finished = []
+        self._remove_staging()
+        return self.rows
+
+    def abort(self):
+        for part in self._open.values():
+            part["writer"].close()
+        self._open = {}
+        self._finished = []
+        self._remove_staging()
+
+    def _remove_staging(self):
+        if self._staging is not None:
+            shutil.rmtree(self._staging, ignore_errors=True)
+            self._staging = None
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Hourly and daily sensor rollups aggregated in the database.
+
+Instead of exporting every raw reading and aggregating in pandas, the
+GROUP BY runs in MySQL and only one row per time bucket is written:
+<table>_hive<id>_<resolution>.csv with the mean, min, max and count of each
+reading. Records are split and cleaned as the reports' data_cleaner does:
+readings of 2 (the sensors' error value) are left out, and a humidity or
+temperature row counts only if both its interior and exterior readings are
+valid. Raw export (extract.py) is unchanged for anomaly work.
+
+    python rollup.py run --hives 1 2 --start 2025-01-01 --end 2025-06-30 --resolutions hourly daily
+    python rollup.py compare --hives 1 --start 2025-01-01 --end 2025-03-31
+
+compare times both paths (raw export cleaned by the reports' data_cleaner
++ pandas aggregation vs SQL rollup + load), reports their export sizes and
+the largest difference in each of mean, min, max and count between them.
+Like batch_extract.py, both subcommands take --sqlite to run against a SQLite
+stand-in.
+
+The monthly reports do not read rollups yet: their analyzers use medians,
+standard deviations and day/night splits of the raw readings, which mean,
+min, max and count per bucket cannot reproduce. compare therefore measures
+the extract and aggregation stages only, not a report run.
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import datetime
+import logging
+import tempfile
+from extract import (OUTPUT_DIR, SPLIT_TABLES, TABLES, check_table, close_cursor, connect, extract, fetch_batches,
+                     parse_date, write_rows)
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = ("hourly", "daily")
+AGGREGATES = ("mean", "min", "max", "count")
+# The reports' data_cleaner.py, whose cleaning compare checks the rollups against
+REPORTS_DIR = os.getenv('REPORTS_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                    'attribute and monthy reports',
+                                                    'attribute_report_generator_scripts_deployment'))
+
+# Time bucket of a reading per dialect; no '%' formats on MySQL, where '%' marks query parameters
+BUCKETS = {
+    "mysql": {"hourly": "DATE_ADD(DATE(created_at), INTERVAL HOUR(created_at) HOUR)",
+              "daily": "DATE(created_at)"},
+    "sqlite": {"hourly": "strftime('%Y-%m-%d %H:00:00', created_at)", "daily": "date(created_at)"},
+}
+# Numeric value of a record, or NULL for empty and non-numeric ones (which pandas' to_numeric makes NaN).
+# SQLite has no REGEXP, so its check only rejects characters a number cannot contain.
+NUMBER = {
+    "mysql": "CASE WHEN {0} REGEXP '^[-+]?([0-9]+[.]?[0-9]*|[.][0-9]+)([eE][-+]?[0-9]+)?$' "
+             "THEN CAST({0} AS DECIMAL(12,4)) END",
+    "sqlite": "CASE WHEN {0} GLOB '*[0-9]*' AND NOT {0} GLOB '*[^0-9.eE+-]*' THEN CAST({0} AS REAL) END",
+}
+# Interior and exterior parts of a record, split as extract.split_record() and the report cleaners split it:
+# '*2*' is read as ',', the interior is everything before the first ',' (the whole record if there is none) and
+# the exterior runs to the next ',' (NULL without a separator)
+SEPARATED = "REPLACE(record, '*2*', ',')"
+_REST = f"substr({SEPARATED}, instr({SEPARATED}, ',') + 1)"
+PARTS = {
+    "mysql": (f"SUBSTRING_INDEX({SEPARATED}, ',', 1)",
+              f"CASE WHEN LOCATE(',', {SEPARATED}) > 0 "
+              f"THEN SUBSTRING_INDEX(SUBSTRING_INDEX({SEPARATED}, ',', 2), ',', -1) END"),
+    "sqlite": (f"CASE WHEN instr({SEPARATED}, ',') > 0 THEN substr({SEPARATED}, 1, instr({SEPARATED}, ',') - 1) "
+               f"ELSE {SEPARATED} END",
+               f"CASE WHEN instr({SEPARATED}, ',') > 0 THEN CASE WHEN instr({_REST}, ',') > 0 "
+               f"THEN substr({_REST}, 1, instr({_REST}, ',') - 1) ELSE {_REST} END END"),
+}
+# Sensor error value excluded from the aggregates, as the report cleaners do
+ERROR_VALUE = 2
+
+
+def readings(table):
+    return ["interior", "exterior"] if table in SPLIT_TABLES else ["record"]
+
+
+def rollup_columns(table):
+    return ["bucket"] + [f"{name}_{agg}" for name in readings(table) for agg in AGGREGATES]
+
+
+def build_rollup_query(table, resolution, dialect="mysql"):
+    """GROUP BY time bucket for one hive over [start, end), skipping error values.
+
+    Like the reports, which drop every row with a missing value after cleaning,
+    a row counts only if all of its readings are valid.
+    """
+    check_table(table)
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution '{resolution}', expected one of {RESOLUTIONS}")
+    sources = PARTS[dialect] if table in SPLIT_TABLES else ("record",)
+    sources = [f"NULLIF(TRIM({source}), '')" for source in sources]
+    values = [f"NULLIF({NUMBER[dialect].format(source)}, {ERROR_VALUE}) AS {name}"
+              for source, name in zip(sources, readings(table))]
+    aggregates = [f"ROUND(AVG({name}), 4), MIN({name}), MAX({name}), COUNT({name})" for name in readings(table)]
+    return (f"SELECT bucket, {', '.join(aggregates)} FROM ("
+            f"SELECT {BUCKETS[dialect][resolution]} AS bucket, {', '.join(values)} FROM {table} "
+            "WHERE hive_id = %s AND created_at >= %s AND created_at < %s) AS readings "
+            f"WHERE {' AND '.join(f'{name} IS NOT NULL' for name in readings(table))} "
+            "GROUP BY bucket ORDER BY bucket")
+
+
+def default_rollup_output(table, hive_id, resolution, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"{table}_hive{hive_id}_{resolution}.csv")
+
+
+def rollup(table, hive_id, start, end, resolution, output=None, conn=None):
+    """Write the ``resolution`` rollup of one hive's readings from ``start`` to ``end`` (dates, inclusive).
+
+    Returns the number of buckets written.
+    """
+    output = output or default_rollup_output(table, hive_id, resolution)
+    own_conn = conn is None
+    conn = conn or connect()
+    query = build_rollup_query(table, resolution, getattr(conn, "dialect", "mysql"))
+    started = time.perf_counter()
+    try:
+        cur = conn.cursor(buffered=False)
+        try:
+            cur.execute(query, (hive_id, start, end + datetime.timedelta(days=1)))
+            rows = write_rows(fetch_batches(cur), output, rollup_columns(table))
+        finally:
+            close_cursor(cur)
+    finally:
+        if own_conn:
+            conn.close()
+    logger.info("Wrote %d %s buckets of %s hive %d to %s in %.1fs", rows, resolution, table, hive_id, output,
+                time.perf_counter() - started)
+    return rows
+
+
+def open_connection(sqlite_path):
+    if sqlite_path:
+        from batch_extract import SqlitePool
+        return SqlitePool(sqlite_path).get_connection()
+    return connect()
+
+
+def clean_like_reports(path, table):
+    """Load a raw CSV export and clean it with the reports' own data_cleaner functions."""
+    import sys
+    import pandas as pd
+
+    if REPORTS_DIR not in sys.path:
+        sys.path.insert(0, REPORTS_DIR)
+    from data_cleaner import clean_humidity_data, clean_numeric_column, clean_temperature_data, remove_nan_values
+
+    df = pd.read_csv(path, parse_dates=['created_at'], index_col='created_at')
+    if table in SPLIT_TABLES:
+        df = clean_humidity_data(df) if table == 'hive_humidity' else clean_temperature_data(df)
+        df.columns = readings(table)
+    else:
+        # The reports expect a numeric column here; a non-numeric record is a missing reading
+        df['record'] = pd.to_numeric(df['record'], errors='coerce')
+        df = clean_numeric_column(df)
+    return remove_nan_values(df)
+
+
+def aggregate_raw(path, table, resolution):
+    """The pandas path: load a raw CSV export, clean it as the reports do and aggregate per bucket."""
+    df = clean_like_reports(path, table)
+    out = df.resample('h' if resolution == 'hourly' else 'D').agg(['mean', 'min', 'max', 'count'])
+    out.columns = [f"{name}_{agg}" for name, agg in out.columns]
+    # GROUP BY only returns buckets that have readings
+    return out[out[[c for c in out.columns if c.endswith('_count')]].sum(axis=1) > 0]
+
+
+def compare(args):
+    """Time raw export + pandas aggregation against SQL rollups for each table and hive."""
+    import pandas as pd
+
+    workdir = tempfile.mkdtemp(prefix="rollup-compare-")
+    conn = open_connection(args.sqlite)
+    report = []
+    try:
+        for table in args.tables:
+            for hive_id in args.hives:
+                raw_path = os.path.join(workdir, f"{table}_hive{hive_id}.csv")
+                started = time.perf_counter()
+                extract(table, [hive_id], args.start, args.end, raw_path, conn=conn)
+                raw = {resolution: aggregate_raw(raw_path, table, resolution) for resolution in args.resolutions}
+                raw_seconds = time.perf_counter() - started
+                raw_bytes = os.path.getsize(raw_path)
+
+                started = time.perf_counter()
+                rolled = {}
+                rollup_bytes = 0
+                for resolution in args.resolutions:
+                    path = default_rollup_output(table, hive_id, resolution, workdir)
+                    rollup(table, hive_id, args.start, args.end, resolution, path, conn=conn)
+                    rolled[resolution] = pd.read_csv(path, parse_dates=['bucket'], index_col='bucket')
+                    rollup_bytes += os.path.getsize(path)
+                rollup_seconds = time.perf_counter() - started
+
+                diffs = {agg: 0.0 for agg in AGGREGATES}
+                for resolution in args.resolutions:
+                    joined = raw[resolution].join(rolled[resolution], rsuffix='_sql', how='outer')
+                    for column in rolled[resolution].columns:
+                        raw_values, sql_values = joined[column], joined[f"{column}_sql"]
+                        agg = column.rsplit('_', 1)[1]
+                        if agg == 'count':
+                            # A bucket only one side has counts as zero readings on the other
+                            raw_values, sql_values = raw_values.fillna(0), sql_values.fillna(0)
+                        diff = (raw_values - sql_values).abs().max()
+                        diffs[agg] = max(diffs[agg], float(diff) if diff == diff else 0.0)
+                report.append({"table": table, "hive_id": hive_id, "raw_bytes": raw_bytes,
+                               "rollup_bytes": rollup_bytes, "raw_s": round(raw_seconds, 3),
+                               "rollup_s": round(rollup_seconds, 3),
+                               **{f"max_{agg}_diff": round(diffs[agg], 4) for agg in AGGREGATES}})
+    finally:
+        conn.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'table':<20}{'hive':>5}{'raw KiB':>10}{'rollup KiB':>12}{'raw s':>9}{'rollup s':>10}"
+          + "".join(f"{agg + ' diff':>12}" for agg in AGGREGATES))
+    for r in report:
+        print(f"{r['table']:<20}{r['hive_id']:>5}{r['raw_bytes'] / 1024:>10.0f}{r['rollup_bytes'] / 1024:>12.0f}"
+              f"{r['raw_s']:>9}{r['rollup_s']:>10}" + "".join(f"{r[f'max_{agg}_diff']:>12}" for agg in AGGREGATES))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Hourly/daily sensor rollups aggregated in the database')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='Write rollup CSVs for tables and hives')
+    run_parser.add_argument('--output-dir', default=OUTPUT_DIR, help='Directory for <table>_hive<id>_<res>.csv')
+    compare_parser = commands.add_parser('compare', help='Compare export size and time with the raw path')
+    compare_parser.add_argument('--json', help='Write the comparison to this JSON file')
+    for sub in (run_parser, compare_parser):
+        sub.add_argument('--tables', nargs='+', choices=TABLES, default=list(TABLES), help='Sensor tables')
+        sub.add_argument('--hives', type=int, nargs='+', default=[1], help='Hive ids')
+        sub.add_argument('--start', type=parse_date, required=True, help='First day (YYYY-MM-DD)')
+        sub.add_argument('--end', type=parse_date, required=True, help='Last day, inclusive (YYYY-MM-DD)')
+        sub.add_argument('--resolutions', nargs='+', choices=RESOLUTIONS, default=list(RESOLUTIONS))
+        sub.add_argument('--sqlite', help='Use this SQLite file instead of MySQL')
+    args = parser.parse_args()
+    if args.end < args.start:
+        parser.error("--end is before --start")
+
+    if args.command == 'compare':
+        compare(args)
+        return
+    conn = open_connection(args.sqlite)
+    try:
+        for table in args.tables:
+            for hive_id in args.hives:
+                for resolution in args.resolutions:
+                    rollup(table, hive_id, args.start, args.end, resolution,
+                           default_rollup_output(table, hive_id, resolution, args.output_dir), conn=conn)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import os
+import csv
+import sys
+import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("mysql.connector")
+
+from batch_extract import SqliteConnection, seed  # noqa: E402
+from extract import Watermarks, extract_incremental  # noqa: E402
+
+START = datetime.date(2025, 1, 1)
+END = datetime.date(2025, 1, 2)
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "sensors.db")
+    seed(path, [1, 2], START, END, interval_minutes=60)
+    return path
+
+
+def run(db, output, hive_ids=(1,), start=START):
+    conn = SqliteConnection(db)
+    try:
+        return extract_incremental("hive_weights", list(hive_ids), start, output, overlap_hours=24, conn=conn)
+    finally:
+        conn.close()
+
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+
+def insert(db, hive_id, record, created_at):
+    conn = SqliteConnection(db).conn
+    conn.execute("INSERT INTO hive_weights (hive_id, record, created_at) VALUES (?, ?, ?)",
+                 (hive_id, record, created_at))
+    conn.commit()
+    conn.close()
+
+
+def test_first_run_rewrites_an_existing_csv(db, tmp_path):
+    output = str(tmp_path / "weights.csv")
+    # A CSV left by a full extract; the first incremental run must not append to it
+    with open(output, "w") as f:
+        f.write("record,created_at\n1.00,2025-01-01 00:00:00\n")
+
+    assert run(db, output) == 48
+    rows = read_rows(output)
+    assert rows[0] == ["record", "created_at"]
+    assert len(rows) == 49
+    assert Watermarks(output).get(1)[0] == datetime.datetime(2025, 1, 2, 23, 0)
+
+
+def test_unchanged_rerun_writes_nothing(db, tmp_path):
+    output = str(tmp_path / "weights.csv")
+    run(db, output)
+    before = read_rows(output)
+
+    assert run(db, output) == 0
+    assert read_rows(output) == before
+
+
+def test_late_row_inside_the_overlap_is_appended_once(db, tmp_path):
+    output = str(tmp_path / "weights.csv")
+    run(db, output)
+    # Arrives after the run, but is timestamped before the watermark
+    insert(db, 1, "42.00", "2025-01-02 12:30:00")
+
+    assert run(db, output) == 1
+    assert read_rows(output)[-1] == ["42.00", "2025-01-02 12:30:00"]
+    assert run(db, output) == 0
+    assert sum(row[0] == "42.00" for row in read_rows(output)) == 1
+
+
+def test_several_hives_share_one_csv(db, tmp_path):
+    output = str(tmp_path / "weights.csv")
+
+    assert run(db, output, hive_ids=(1, 2)) == 96
+    insert(db, 2, "43.00", "2025-01-03 00:00:00")
+
+    assert run(db, output, hive_ids=(1, 2)) == 1
+    assert read_rows(output)[-1] == ["43.00", "2025-01-03 00:00:00", "2"]